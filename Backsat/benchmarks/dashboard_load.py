@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Dashboard load test: N simulated Socket.IO clients against a running node.
+
+Start a node first (python run.py --mode production), then run this from
+the Backsat directory. Each client connects, waits for its network
+snapshot and sends latency probes; one client also posts test chat
+messages, which the server fans out to every client. Reports, as
+p50 / p90 / p99 / max:
+  - connect: time until the client's first network_status arrived
+  - probe: round trip of a latency_probe acknowledgement
+  - fan-out: time from posting a message until each client received it
+
+  python benchmarks/dashboard_load.py [--clients 50 200] [--url http://localhost:3030]
+
+Needs the python-socketio client (installed with flask-socketio) and
+requests; websocket-client enables the websocket transport.
+"""
+import argparse
+import threading
+import time
+import socketio
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float('nan')
+
+class LoadClient:
+    def __init__(self, url, transports):
+        self.url = url
+        self.transports = transports
+        self.sio = socketio.Client(reconnection=False)
+        self.snapshot = threading.Event()
+        self.connect_time = None
+        self.probes = []
+        self.fanout = {}  # {seq: seconds}
+        self.sio.on('network_status', self._on_snapshot)
+        self.sio.on('message', self._on_message)
+
+    def _on_snapshot(self, data):
+        if self.connect_time is None:
+            self.connect_time = time.time() - self.started
+        self.snapshot.set()
+
+    def _on_message(self, data):
+        if isinstance(data, dict) and data.get('type') == 'loadtest':
+            self.fanout[data['seq']] = time.time() - data['sent']
+
+    def connect(self):
+        self.started = time.time()
+        self.sio.connect(self.url, transports=self.transports, wait_timeout=30)
+
+    def probe(self):
+        started = time.perf_counter()
+        self.sio.call('latency_probe', {'n': len(self.probes)}, timeout=30)
+        self.probes.append(time.perf_counter() - started)
+
+    def close(self):
+        self.sio.disconnect()
+
+def run(url, count, probes, messages, interval, transports):
+    clients = [LoadClient(url, transports) for _ in range(count)]
+    failed = 0
+
+    def connect(client):
+        nonlocal failed
+        try:
+            client.connect()
+        except Exception:
+            failed += 1
+
+    threads = [threading.Thread(target=connect, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    clients = [client for client in clients if client.sio.connected]
+    for client in clients:
+        client.snapshot.wait(30)
+
+    def probe(client):
+        for _ in range(probes):
+            try:
+                client.probe()
+            except Exception:
+                pass
+            time.sleep(interval)
+
+    threads = [threading.Thread(target=probe, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    if clients:
+        for seq in range(messages):
+            clients[0].sio.emit('message', {'type': 'loadtest', 'seq': seq, 'sent': time.time()})
+            time.sleep(interval)
+    for thread in threads:
+        thread.join()
+    time.sleep(2)  # Let the last fan-out arrive
+
+    connects = [client.connect_time for client in clients if client.connect_time is not None]
+    rtts = [rtt for client in clients for rtt in client.probes]
+    fanout = [latency for client in clients for latency in client.fanout.values()]
+    missing = len(clients) * messages - len(fanout)
+    for client in clients:
+        client.close()
+    return {
+        'clients': count,
+        'connected': len(clients),
+        'failed': failed,
+        'connect': connects,
+        'probe': rtts,
+        'fanout': fanout,
+        'missing': missing
+    }
+
+def summary(values):
+    ms = [v * 1000 for v in values]
+    return (f"{percentile(ms, 0.5):>7.1f} {percentile(ms, 0.9):>7.1f} "
+            f"{percentile(ms, 0.99):>7.1f} {max(ms) if ms else float('nan'):>7.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:3030')
+    parser.add_argument('--clients', type=int, nargs='+', default=[10, 50, 100, 200])
+    parser.add_argument('--probes', type=int, default=20, help='latency probes per client')
+    parser.add_argument('--messages', type=int, default=20, help='fan-out messages per run')
+    parser.add_argument('--interval', type=float, default=0.25, help='seconds between probes/messages')
+    parser.add_argument('--transport', choices=['websocket', 'polling', 'any'], default='any')
+    args = parser.parse_args()
+    transports = None if args.transport == 'any' else [args.transport]
+
+    print(f"{'clients':>7} {'ok':>5}  {'':>7}{'p50':>7} {'p90':>7} {'p99':>7} {'max':>7}  (ms)")
+    for count in args.clients:
+        r = run(args.url, count, args.probes, args.messages, args.interval, transports)
+        print(f"{r['clients']:>7} {r['connected']:>5}  {'connect':>7}{summary(r['connect'])}")
+        print(f"{'':>14}{'probe':>7}{summary(r['probe'])}")
+        print(f"{'':>14}{'fan-out':>7}{summary(r['fanout'])}"
+              + (f"  ({r['missing']} missing)" if r['missing'] else "")
+              + (f"  ({r['failed']} failed to connect)" if r['failed'] else ""))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Loopback file transfer throughput at various packet loss rates.
+
+Two MeshNetwork nodes on 127.0.0.1 transfer a random file; every datagram
+either node sends is dropped with the given probability.
+
+Run from the Backsat directory:  python benchmarks/file_transfer.py [size_mb]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.backsat.network.mesh import MeshNetwork
+
+LOSS_RATES = (0.0, 0.01, 0.05, 0.1, 0.2)
+TIMEOUT = 300
+
+class LossyMesh(MeshNetwork):
+    loss = 0.0
+    # Peers are wired up by hand below; never expire them
+    NODE_TIMEOUT = 3600
+    MIN_NODE_TIMEOUT = 3600
+
+    def _sendto(self, data, addr, *args):
+        if random.random() >= self.loss:
+            super()._sendto(data, addr, *args)
+
+def connect(node, peer):
+    """Make peer a direct neighbour of node without waiting for beacons"""
+    beacon = {'type': 'discovery', 'node_id': peer.node_id, 'port': peer.port,
+              'codecs': ['bin1', 'json'], 'pubkey': peer.sessions.public_key}
+    node.engine.call_soon(node._handle_message, beacon, ('127.0.0.1', peer.port))
+
+def run(size, loss, workdir):
+    random.seed(1)
+    LossyMesh.loss = loss
+    sender = LossyMesh(start_port=7000, node_id='bench_tx',
+                       download_dir=os.path.join(workdir, 'tx'))
+    receiver = LossyMesh(start_port=7000, node_id='bench_rx',
+                         download_dir=os.path.join(workdir, f'rx-{loss}'))
+    try:
+        sender.start()
+        receiver.start()
+        connect(sender, receiver)
+        connect(receiver, sender)
+        time.sleep(0.1)
+
+        path = os.path.join(workdir, 'payload.bin')
+        transfer_id = sender.send_file(receiver.node_id, path)
+        started = time.time()
+        while time.time() - started < TIMEOUT:
+            status = {t['id']: t for t in sender.get_transfer_status()}.get(transfer_id)
+            if status and status['state'] in ('done', 'failed'):
+                break
+            time.sleep(0.01)
+        elapsed = time.time() - started
+        received = os.path.join(workdir, f'rx-{loss}', 'payload.bin')
+        ok = os.path.exists(received) and os.path.getsize(received) == size
+        return elapsed, ok, status
+    finally:
+        sender.stop()
+        receiver.stop()
+
+def main(size_mb=4.0):
+    size = int(size_mb * 1024 * 1024)
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(workdir, 'payload.bin'), 'wb') as f:
+            f.write(os.urandom(size))
+        print(f"{'loss':>6} {'time':>9} {'MB/s':>8} {'retransmits':>12}  result")
+        for loss in LOSS_RATES:
+            elapsed, ok, status = run(size, loss, workdir)
+            print(f"{loss:>6.0%} {elapsed:>8.2f}s {size / elapsed / 1e6:>8.2f} "
+                  f"{status['retransmits'] if status else '-':>12}  {'ok' if ok else 'FAILED'}")
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 4.0)
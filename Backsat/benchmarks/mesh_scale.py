@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""Mesh behaviour at 100-1000 nodes on the in-process simulator.
+
+Nodes are scattered over a square sized for a target average number of
+radio neighbours. For each size this reports:
+  - beacon convergence: virtual time until nodes know all their radio
+    neighbours (median / 95th percentile / all)
+  - delivery ratio of flooded messages, against every other node and
+    against the nodes within the router's TTL in the radio graph
+  - CPU time per node per simulated second and bytes sent per node
+  - beacons per node per minute, and peers wrongly expired (no node ever
+    leaves, so every 'left' event is a false timeout)
+
+Run from the Backsat directory:
+  python benchmarks/mesh_scale.py [--nodes 100 250 500 1000] [--loss 0.05]
+"""
+import argparse
+import logging
+import math
+import os
+import random
+import sys
+from collections import deque
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.backsat.network.sim import SimNetwork
+from src.backsat.network.spatial import KM_PER_DEGREE
+
+RADIO_RANGE_KM = 1.0
+BOOT_WINDOW = 5.0  # Nodes power up at random moments within this many seconds
+ORIGIN = (45.0, 9.0)
+
+def scatter(rng, count, degree):
+    """count positions in a square where a node has ~degree neighbours in range"""
+    side_km = math.sqrt(count * math.pi * RADIO_RANGE_KM ** 2 / degree)
+    side_lat = side_km / KM_PER_DEGREE
+    side_lon = side_lat / math.cos(math.radians(ORIGIN[0]))
+    return [(ORIGIN[0] + rng.random() * side_lat, ORIGIN[1] + rng.random() * side_lon)
+            for _ in range(count)]
+
+def radio_graph(sim, nodes):
+    """Ground truth: node_id -> set of node_ids within radio range"""
+    by_ip = {mesh.transport.ip: mesh for mesh in nodes}
+    graph = {}
+    for mesh in nodes:
+        point = sim.positions.get(mesh.transport.ip)
+        graph[mesh.node_id] = {by_ip[ip].node_id for ip, _ in sim.positions.within(point, RADIO_RANGE_KM)
+                               if ip != mesh.transport.ip}
+    return graph
+
+def within_hops(graph, source, hops):
+    seen = {source}
+    frontier = deque([(source, 0)])
+    while frontier:
+        node, depth = frontier.popleft()
+        if depth == hops:
+            continue
+        for peer in graph[node]:
+            if peer not in seen:
+                seen.add(peer)
+                frontier.append((peer, depth + 1))
+    return seen - {source}
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float('nan')
+
+def run(count, degree=12, loss=0.0, messages=20, duration=60.0, seed=1):
+    rng = random.Random(seed)
+    sim = SimNetwork(seed=seed, loss=loss, radio_range_km=RADIO_RANGE_KM)
+    nodes = [sim.add_node(lat, lon, node_id=f'sim-{i:04d}', max_range_km=RADIO_RANGE_KM)
+             for i, (lat, lon) in enumerate(scatter(rng, count, degree))]
+    graph = radio_graph(sim, nodes)
+
+    converged_at = {}
+    known = {mesh.node_id: set() for mesh in nodes}
+    false_leaves = [0]
+
+    def watch(mesh):
+        expected = graph[mesh.node_id]
+
+        def on_change(event, node_id):
+            if event == 'left':
+                false_leaves[0] += 1
+            elif event == 'joined' and node_id in expected:
+                known[mesh.node_id].add(node_id)
+                if len(known[mesh.node_id]) == len(expected):
+                    converged_at.setdefault(mesh.node_id, sim.now())
+        if not expected:
+            converged_at[mesh.node_id] = 0.0
+        mesh.add_change_listener(on_change)
+
+    deliveries = {}
+
+    def counter(mesh):
+        def on_message(payload, envelope):
+            deliveries.setdefault(payload['seq'], set()).add(mesh.node_id)
+        mesh.add_message_handler(on_message)
+
+    for mesh in nodes:
+        watch(mesh)
+        counter(mesh)
+        sim.schedule(rng.uniform(0, BOOT_WINDOW), None, mesh.start)
+
+    # Discovery phase, then floods from random sources
+    sim.run(duration / 2)
+    sources = {}
+    for seq in range(messages):
+        source = rng.choice(nodes)
+        sources[seq] = source
+        sim.schedule(rng.uniform(0, duration / 4), None, source.router.send,
+                     {'type': 'chat', 'seq': seq})
+    sim.run(duration / 2)
+
+    ttl = nodes[0].router.ttl
+    reachable = delivered = 0
+    for seq, source in sources.items():
+        got = deliveries.get(seq, set()) - {source.node_id}
+        in_reach = within_hops(graph, source.node_id, ttl)
+        reachable += len(in_reach)
+        delivered += len(got & in_reach)
+    everyone = sum(len(deliveries.get(seq, set()) - {source.node_id}) for seq, source in sources.items())
+
+    times = list(converged_at.values())
+    stats = sim.get_stats()
+    cpu = sum(mesh.engine.cpu_time for mesh in nodes)
+    beacons = sum(mesh.beacons.sent for mesh in nodes)
+    for mesh in nodes:
+        mesh.stop()
+    return {
+        'nodes': count,
+        'avg_degree': sum(len(peers) for peers in graph.values()) / count,
+        'converged': len(times) / count,
+        'conv_p50': percentile(times, 0.5),
+        'conv_p95': percentile(times, 0.95),
+        'conv_all': max(times) if len(times) == count else float('nan'),
+        'delivery_all': everyone / (messages * (count - 1)),
+        'delivery_reach': delivered / reachable if reachable else float('nan'),
+        'cpu_ms_per_node_s': cpu / count / stats['time'] * 1000,
+        'kb_per_node': stats['bytes_sent'] / count / 1024,
+        'beacons_per_min': beacons / count / stats['time'] * 60,
+        'false_leaves': false_leaves[0],
+        'errors': stats['errors']
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--nodes', type=int, nargs='+', default=[100, 250, 500, 1000])
+    parser.add_argument('--degree', type=int, default=12, help='target average radio neighbours')
+    parser.add_argument('--loss', type=float, default=0.0)
+    parser.add_argument('--messages', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=60.0, help='simulated seconds')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{'nodes':>6} {'degree':>7} {'conv p50':>9} {'conv p95':>9} {'conv all':>9} "
+          f"{'deliv all':>10} {'deliv ttl':>10} {'cpu ms/s':>9} {'KB/node':>8} {'bcn/min':>8} {'left':>5}")
+    for count in args.nodes:
+        r = run(count, args.degree, args.loss, args.messages, args.duration, args.seed)
+        print(f"{r['nodes']:>6} {r['avg_degree']:>7.1f} {r['conv_p50']:>8.2f}s {r['conv_p95']:>8.2f}s "
+              f"{r['conv_all']:>8.2f}s {r['delivery_all']:>10.1%} {r['delivery_reach']:>10.1%} "
+              f"{r['cpu_ms_per_node_s']:>9.3f} {r['kb_per_node']:>8.1f} "
+              f"{r['beacons_per_min']:>8.1f} {r['false_leaves']:>5}"
+              + (f"  ({r['errors']} errors)" if r['errors'] else ""))
+
+if __name__ == '__main__':
+    main()
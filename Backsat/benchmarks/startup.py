@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Startup time and memory of a headless relay versus the full dashboard node.
+
+Each case runs in a fresh interpreter, several times, and reports the
+median of:
+  - import: seconds to import the entry point's modules
+  - ready: seconds from interpreter start until the mesh is running
+  - rss: peak resident memory (MB) once running
+  - modules: entries in sys.modules
+
+Run from the Backsat directory (the dashboard case needs the web stack
+installed and the dashboard libraries vendored; the relay case only the
+mesh's own dependencies):
+
+  python benchmarks/startup.py [--runs 5] [--link-mode broadcast]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+PRELUDE = """
+import time
+started = time.perf_counter()
+import json, os, resource, sys, tempfile
+"""
+
+REPORT = """
+ready = time.perf_counter() - started
+print(json.dumps({'import': imported, 'ready': ready, 'modules': len(sys.modules),
+                  'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+CASES = {
+    'mesh-only': """
+from src.backsat.utils.logger import configure
+configure(rich=False)
+from src.backsat.core.relay import MeshRelay
+imported = time.perf_counter() - started
+relay = MeshRelay(link_mode=LINK_MODE, history_dir=tempfile.mkdtemp())
+relay.mesh.start()
+""",
+    'dashboard': """
+from src.backsat.core.backsat import BackSat
+imported = time.perf_counter() - started
+backsat = BackSat(server_mode='production')
+backsat.mesh.start()
+""",
+}
+
+def run_case(name, link_mode):
+    code = PRELUDE + CASES[name].replace('LINK_MODE', repr(link_mode)) + REPORT
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True,
+                            text=True, timeout=120)
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'no output')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--link-mode', choices=['broadcast', 'multicast'], default='broadcast')
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    args = parser.parse_args()
+
+    print(f"{'case':>10} {'import s':>9} {'ready s':>8} {'rss MB':>7} {'modules':>8}")
+    for name in args.cases:
+        try:
+            runs = [run_case(name, args.link_mode) for _ in range(args.runs)]
+        except Exception as e:
+            print(f"{name:>10}  failed: {e}")
+            continue
+        median = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        print(f"{name:>10} {median['import']:>9.3f} {median['ready']:>8.3f} "
+              f"{median['rss']:>7.1f} {median['modules']:>8.0f}")
+
+if __name__ == '__main__':
+    main()
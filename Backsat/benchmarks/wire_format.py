@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Compare the legacy JSON encoding with the binary wire format, and
+Fernet with per-peer session encryption.
+
+Run from the Backsat directory:  python benchmarks/wire_format.py
+"""
+import json
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cryptography.fernet import Fernet
+from src.backsat.network.crypto import SessionKeys
+from src.backsat.network.wire import WireCodec
+
+NODE_ID = 'node_backsat-pi-07_1718000000'
+LOCATION = {'lat': 45.4642035, 'lon': 9.1899815}
+CHAT = {'type': 'chat', 'user': 'rescue-team-2', 'text': 'Water point moved to the north gate'}
+
+def legacy_beacon(location):
+    return json.dumps({
+        'type': 'discovery',
+        'node_id': NODE_ID,
+        'port': 5000,
+        'timestamp': time.time(),
+        'location': location
+    }).encode()
+
+def bench(label, encode, decode, number):
+    data = encode()
+    enc_us = timeit.timeit(encode, number=number) / number * 1e6
+    dec_us = timeit.timeit(lambda: decode(data), number=number) / number * 1e6
+    print(f"{label:<34} {len(data):>6} B {enc_us:>9.2f} us {dec_us:>9.2f} us")
+
+def main(number=50000):
+    sender = WireCodec(NODE_ID)
+    receiver = WireCodec('node_receiver_1718000001')
+    receiver.learn(NODE_ID)
+    now = time.time()
+
+    print(f"{'payload':<34} {'bytes':>8} {'encode':>12} {'decode':>12}")
+    for location in (None, LOCATION):
+        suffix = 'with location' if location else 'no location'
+        bench(f"json beacon ({suffix})", lambda: legacy_beacon(location), json.loads, number)
+        bench(f"binary beacon+name ({suffix})",
+              lambda: sender.encode_beacon(5000, now, location, include_name=True),
+              receiver.decode, number)
+        bench(f"binary beacon ({suffix})",
+              lambda: sender.encode_beacon(5000, now, location, include_name=False),
+              receiver.decode, number)
+    bench("json chat message", lambda: json.dumps(CHAT).encode(), json.loads, number)
+    bench("binary chat message", lambda: sender.encode_message(CHAT), receiver.decode, number)
+
+    frame = sender.encode_message(CHAT)
+    fernet = Fernet(Fernet.generate_key())
+    bench("  sealed: fernet", lambda: fernet.encrypt(frame), fernet.decrypt, number)
+    tx_keys = SessionKeys(NODE_ID)
+    rx_keys = SessionKeys('node_receiver_1718000001')
+    tx_keys.learn('node_receiver_1718000001', rx_keys.public_key)
+    rx_keys.learn(NODE_ID, tx_keys.public_key)
+    bench("  sealed: chacha20-poly1305 session",
+          lambda: tx_keys.seal('node_receiver_1718000001', frame), rx_keys.open, number)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
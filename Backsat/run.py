@@ -1,6 +1,26 @@
 #!/usr/bin/env python3
-from src.backsat.core.backsat import BackSat
+import argparse
+import os
+
+MODES = ('dev', 'production', 'mesh-only')
 
 if __name__ == "__main__":
-    backsat = BackSat()
-    backsat.run() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="BackSat node and dashboard")
+    parser.add_argument('--mode', choices=MODES,
+                        help="server mode (default: $BACKSAT_SERVER_MODE or dev); "
+                             "mesh-only runs a headless relay without the dashboard")
+    parser.add_argument('--link-mode', choices=('multicast', 'broadcast'),
+                        help="mesh discovery (default: $BACKSAT_LINK_MODE or multicast; "
+                             "multicast falls back to broadcast without netifaces)")
+    args = parser.parse_args()
+    mode = args.mode or os.environ.get('BACKSAT_SERVER_MODE', 'dev')
+    # Import only what the mode needs: a relay never loads the web stack
+    if mode == 'mesh-only':
+        from src.backsat.utils.logger import configure
+        configure(rich=False)
+        from src.backsat.core.relay import MeshRelay
+        MeshRelay(link_mode=args.link_mode).run()
+    else:
+        from src.backsat.core.backsat import BackSat
+        backsat = BackSat(server_mode=mode, link_mode=args.link_mode)
+        backsat.run()
@@ -0,0 +1,214 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+from rich.console import Console
+
+console = Console()
+
+ASSET_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), 'web'))
+VENDOR_DIR = os.path.join(ASSET_DIR, 'vendor')
+DIST_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), 'static', 'dist'))
+
+# Pinned third-party libraries, fetched once into web/vendor/: {name: (url, sha256)}.
+# A download whose digest differs from its pin is rejected. A library without a
+# pin yet (None) is accepted, and the digest it came with is logged so it can
+# be reviewed and pinned here.
+VENDOR = {
+    'tailwind.min.css': ('https://cdn.jsdelivr.net/npm/tailwindcss@2.2.19/dist/tailwind.min.css', None),
+    'socket.io.min.js': ('https://cdn.jsdelivr.net/npm/socket.io-client@4.7.2/dist/socket.io.min.js',
+                         '83df4abc7eec941f1d29ae254e80bac0bb82d398fbe2e8ee4ea2a7efc8e704f1'),
+    'chart.umd.js': ('https://cdn.jsdelivr.net/npm/chart.js@4.4.0/dist/chart.umd.js', None)
+}
+
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))  # In order of preference
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def fetch_vendor(force=False):
+    """Download the pinned libraries into web/vendor/ (needs a connection).
+
+    Raises RuntimeError, before writing anything, for a download that
+    doesn't match its pinned SHA-256.
+    """
+    import urllib.request
+    os.makedirs(VENDOR_DIR, exist_ok=True)
+    for name, (url, pinned) in VENDOR.items():
+        path = os.path.join(VENDOR_DIR, name)
+        if os.path.exists(path) and not force:
+            continue
+        with urllib.request.urlopen(url, timeout=30) as response:
+            data = response.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if pinned is None:
+            console.log(f"[yellow]{name} has no pinned hash; fetched sha256 {digest}[/yellow]")
+        elif digest != pinned:
+            raise RuntimeError(f"{name} from {url} has sha256 {digest}, expected {pinned}")
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+        console.log(f"[green]Vendored {name} ({len(data) // 1024} KB)[/green]")
+
+def _sources():
+    """{logical name: source path} for every asset that exists"""
+    sources = {}
+    for directory in (ASSET_DIR, VENDOR_DIR):
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path) and not name.startswith('.') and not name.endswith('.tmp'):
+                sources[name] = path
+    return sources
+
+def _digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _fingerprint(name, digest):
+    root, ext = os.path.splitext(name)
+    if root.endswith('.min'):
+        root, ext = root[:-4], '.min' + ext
+    return f"{root}.{digest[:10]}{ext}"
+
+def build():
+    """Fingerprint and precompress every source into static/dist/; returns the manifest"""
+    os.makedirs(DIST_DIR, exist_ok=True)
+    files = {}
+    for name, path in _sources().items():
+        digest = _digest(path)
+        built = _fingerprint(name, digest)
+        target = os.path.join(DIST_DIR, built)
+        if not os.path.exists(target):
+            with open(path, 'rb') as f:
+                data = f.read()
+            with open(target, 'wb') as f:
+                f.write(data)
+            # mtime=0 keeps the .gz byte-identical across builds
+            with open(target + '.gz', 'wb') as f:
+                f.write(gzip.compress(data, 9, mtime=0))
+            if brotli is not None:
+                with open(target + '.br', 'wb') as f:
+                    f.write(brotli.compress(data, quality=11))
+        files[name] = {'file': built, 'source': digest}
+    version = hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()[:10]
+    manifest = {'version': version, 'files': files}
+    with open(os.path.join(DIST_DIR, 'manifest.json.tmp'), 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(os.path.join(DIST_DIR, 'manifest.json.tmp'), os.path.join(DIST_DIR, 'manifest.json'))
+
+    # Outputs of older builds are dead weight on the SD card
+    keep = {entry['file'] for entry in files.values()}
+    for name in os.listdir(DIST_DIR):
+        base = name[:-3] if name.endswith(('.gz', '.br')) else name
+        if base != 'manifest.json' and base not in keep:
+            os.remove(os.path.join(DIST_DIR, name))
+    return manifest
+
+class AssetBundle:
+    """Dashboard JS/CSS served from the node, fingerprinted and precompressed.
+
+    Sources live in web/ (first-party) and web/vendor/ (third-party
+    libraries fetched once from VENDOR). A build copies each one to
+    static/dist/ as name.<hash>.ext with .gz and .br siblings and records
+    the mapping in static/dist/manifest.json; load() rebuilds when a source
+    changed. A node is meant to work offline: load() fetches missing
+    libraries once (a fresh checkout run while online), and refuses to
+    start when that fails instead of quietly pointing the dashboard at a
+    CDN; allow_cdn=True (BACKSAT_ALLOW_CDN=1) permits that for development.
+    To fetch the libraries and build ahead of time, run from the Backsat
+    directory:
+
+      python -m src.backsat.core.assets [--fetch]
+    """
+
+    URL_PREFIX = '/assets/'
+    MAX_AGE = 365 * 24 * 3600  # Fingerprinted: safe to cache for a year
+
+    def __init__(self, allow_cdn=False):
+        self.allow_cdn = allow_cdn
+        self.manifest = {'version': None, 'files': {}}
+        self._by_file = {}  # {fingerprinted name: logical name}
+
+    def load(self, rebuild=True):
+        """Read the manifest, fetching missing libraries and rebuilding first if any source changed"""
+        if rebuild and not self.allow_cdn and not self._vendored():
+            try:
+                fetch_vendor()
+            except Exception as e:  # Offline, or a download failed its pin: reported below
+                console.log(f"[red]Could not fetch dashboard libraries: {e}[/red]")
+        manifest = None
+        try:
+            with open(os.path.join(DIST_DIR, 'manifest.json')) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if rebuild and (manifest is None or self._stale(manifest)):
+            manifest = build()
+            console.log(f"[blue]Built dashboard assets ({manifest['version']})[/blue]")
+        self.manifest = manifest or {'version': None, 'files': {}}
+        self._by_file = {entry['file']: name for name, entry in self.manifest['files'].items()}
+        missing = [name for name in VENDOR if name not in self.manifest['files']]
+        if missing and not self.allow_cdn:
+            raise RuntimeError(f"Dashboard libraries not vendored: {', '.join(missing)}. Run "
+                               f"python -m src.backsat.core.assets --fetch while online "
+                               f"(or set BACKSAT_ALLOW_CDN=1 to load them from CDNs)")
+        if missing:
+            console.log(f"[yellow]Not vendored, loading from CDN: {', '.join(missing)}[/yellow]")
+        return self
+
+    @staticmethod
+    def _vendored():
+        return all(os.path.exists(os.path.join(VENDOR_DIR, name)) for name in VENDOR)
+
+    def _stale(self, manifest):
+        sources = _sources()
+        files = manifest.get('files', {})
+        if set(sources) != set(files):
+            return True
+        return any(_digest(path) != files[name]['source'] or
+                   not os.path.exists(os.path.join(DIST_DIR, files[name]['file']))
+                   for name, path in sources.items())
+
+    @property
+    def version(self):
+        return self.manifest['version']
+
+    def url(self, name):
+        """Fingerprinted URL for an asset (its CDN URL only when allow_cdn and not vendored)"""
+        entry = self.manifest['files'].get(name)
+        if entry is not None:
+            return self.URL_PREFIX + entry['file']
+        if name in VENDOR and self.allow_cdn:
+            return VENDOR[name][0]
+        raise KeyError(f"Unknown asset: {name}")
+
+    def urls(self):
+        """Every local asset URL, for the service worker's precache"""
+        return [self.URL_PREFIX + entry['file'] for entry in self.manifest['files'].values()]
+
+    def resolve(self, filename, accepted=()):
+        """(path, mimetype, content encoding or None) for a built file, or None"""
+        name = self._by_file.get(filename)
+        if name is None:
+            return None
+        path = os.path.join(DIST_DIR, filename)
+        mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        for encoding, suffix in ENCODINGS:
+            if encoding in accepted and os.path.exists(path + suffix):
+                return path + suffix, mimetype, encoding
+        return path, mimetype, None
+
+if __name__ == '__main__':
+    if '--fetch' in sys.argv[1:]:
+        fetch_vendor(force='--force' in sys.argv[1:])
+    manifest = build()
+    for name, entry in sorted(manifest['files'].items()):
+        console.print(f"{name:24} -> {entry['file']}")
+    if brotli is None:
+        console.print("[yellow]brotli is not installed: built .gz variants only[/yellow]")
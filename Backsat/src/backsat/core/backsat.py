@@ -2,24 +2,38 @@
 import os
 import sys
 import json
-import psutil
-import qrcode
-import socket
-import webbrowser
+import time
 from threading import Thread
 from datetime import datetime
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, g, render_template, jsonify, request, send_file
 from flask_socketio import SocketIO
 from rich.console import Console
 from rich.panel import Panel
 from ..network.mesh import MeshNetwork
+from ..network.history import clean_digest
+from ..utils.metrics import MetricsRegistry
+from ..utils.profiler import SamplingProfiler
 from .survival import SurvivalTools
+from .publisher import DashboardPublisher
+from .qrcache import QRCodeCache
+from .server import pick_async_mode, ResponseCompressor, ClientOutbox
+from .assets import AssetBundle
+from .telemetry import TelemetrySampler, FIELDS as TELEMETRY_FIELDS
 
 # Initialize colorful logger
 console = Console()
 
 class BackSat:
-    def __init__(self):
+    TAIL_POLL = 0.5  # Seconds between log tail polls under green threads
+    HISTORY_REPLAY = 100  # Messages per channel replayed to a (re)connecting client
+
+    def __init__(self, server_mode=None, link_mode=None):
+        # 'dev': Werkzeug, threads, debug; 'production': eventlet/gevent, debug off
+        self.server_mode = server_mode or os.environ.get('BACKSAT_SERVER_MODE', 'dev')
+        # 'multicast' falls back to 'broadcast' when netifaces isn't installed
+        link_mode = link_mode or os.environ.get('BACKSAT_LINK_MODE', 'multicast')
+        self.async_mode = pick_async_mode(self.server_mode)
+        self.debug = self.server_mode == 'dev'
         template_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'templates'))
         static_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'static'))
         
@@ -31,20 +45,84 @@ class BackSat:
                         static_folder=static_dir)
                         
         # Disable Flask's reloader when in debug mode
-        self.app.config['DEBUG'] = True
+        self.app.config['DEBUG'] = self.debug
         self.app.config['USE_RELOADER'] = False
+        self.metrics = MetricsRegistry()
+        self._instrument_requests()
+        self.compressor = ResponseCompressor(self.app)
+        self.assets = AssetBundle(allow_cdn=os.environ.get('BACKSAT_ALLOW_CDN') == '1').load()
+        self.app.add_template_global(self.assets.url, 'asset_url')
         
-        self.socketio = SocketIO(self.app, cors_allowed_origins="*", async_mode='threading')
-        self.mesh = MeshNetwork(max_range_km=3)
+        self.socketio = SocketIO(self.app, cors_allowed_origins="*", async_mode=self.async_mode)
+        self.outbox = ClientOutbox(self.socketio, on_overflow=self._resync_client,
+                                   metrics=self.metrics)
+        # One sampler feeds the dashboard, /metrics and (unless disabled) our beacons
+        self.telemetry = TelemetrySampler(
+            interval=float(os.environ.get('BACKSAT_TELEMETRY_INTERVAL', TelemetrySampler.INTERVAL)),
+            on_sample=self._on_telemetry, metrics=self.metrics)
+        beacon_telemetry = os.environ.get('BACKSAT_BEACON_TELEMETRY', '1') != '0'
+        self.mesh = MeshNetwork(max_range_km=3, link_mode=link_mode, history_dir=os.path.join(
+            os.path.dirname(__file__), 'data', 'history'), metrics=self.metrics,
+            telemetry=self.telemetry.compact if beacon_telemetry else None)
+        # Opt-in: BACKSAT_PROFILE=1 or the dashboard toggle
+        self.profiler = SamplingProfiler()
         self.survival = SurvivalTools()
+        self.port = 3030
+        self.qr_codes = QRCodeCache(self.port)
         self.connected_clients = set()
+        self.publisher = DashboardPublisher(self.socketio, self.mesh, self.connected_clients,
+                                            emit=self.outbox.emit)
+        self.mesh.add_message_handler(self._on_mesh_message)
         self.setup_routes()
         self.setup_websocket_handlers()
         
+    def _instrument_requests(self):
+        http_seconds = self.metrics.histogram('http_request_seconds', "Time to serve one HTTP request")
+
+        @self.app.before_request
+        def start_timer():
+            g.started = time.perf_counter()
+
+        @self.app.after_request
+        def observe(response):
+            started = g.pop('started', None)
+            if started is not None:
+                http_seconds.observe(time.perf_counter() - started)
+            return response
+
     def setup_routes(self):
         @self.app.route('/')
         def index():
-            return render_template('index.html')
+            response = Response(render_template('index.html'), mimetype='text/html')
+            # Always revalidate: the page names the current asset fingerprints
+            response.add_etag()
+            response.headers['Cache-Control'] = 'no-cache'
+            return response.make_conditional(request)
+
+        @self.app.route('/assets/<filename>')
+        def get_asset(filename):
+            """Fingerprinted dashboard assets, precompressed when the client accepts it"""
+            resolved = self.assets.resolve(filename, request.accept_encodings)
+            if resolved is None:
+                return jsonify({'error': 'Not found'}), 404
+            path, mimetype, encoding = resolved
+            response = send_file(path, mimetype=mimetype, max_age=AssetBundle.MAX_AGE,
+                                 etag=f'{filename}-{encoding or "identity"}')
+            response.cache_control.immutable = True
+            response.vary.add('Accept-Encoding')
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+            return response
+
+        @self.app.route('/sw.js')
+        def service_worker():
+            """Service worker precaching the current asset build"""
+            response = Response(render_template('sw.js', version=self.assets.version,
+                                                urls=self.assets.urls(),
+                                                prefix=AssetBundle.URL_PREFIX),
+                                mimetype='application/javascript')
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
             
         @self.app.route('/status')
         def status():
@@ -53,30 +131,72 @@ class BackSat:
             return jsonify({
                 'status': 'connected' if mesh_status['active_nodes'] > 0 else 'connecting',
                 'nodes': mesh_status['nodes'],
-                'clients': len(self.connected_clients)
+                'clients': len(self.connected_clients),
+                'send_queues': self.outbox.get_stats()
             })
             
+        @self.app.route('/metrics')
+        def metrics():
+            """Mesh and dashboard metrics in the Prometheus text format"""
+            return Response(self.metrics.render(),
+                            content_type='text/plain; version=0.0.4; charset=utf-8')
+
+        @self.app.route('/debug/profile')
+        def get_profile():
+            """Sampling profiler results: top functions, or ?format=folded for flame graphs"""
+            if not self.debug:
+                return jsonify({'error': 'Not found'}), 404
+            if request.args.get('format') == 'folded':
+                return Response(self.profiler.folded(), mimetype='text/plain')
+            return jsonify(self._profile_report(request.args.get('limit', 25, type=int)))
+
+        @self.app.route('/api/telemetry')
+        def get_telemetry():
+            """Sampled system telemetry: ?since=<ts>&fields=cpu,memory&max_points="""
+            fields = request.args.get('fields')
+            return jsonify({
+                'interval': self.telemetry.interval,
+                'fields': list(TELEMETRY_FIELDS),
+                'samples': self.telemetry.history(
+                    since=request.args.get('since', type=float),
+                    fields=fields.split(',') if fields else None,
+                    max_points=request.args.get('max_points', type=int))
+            })
+
         @self.app.route('/qr')
         def get_qr():
-            """Generate QR code for quick connection"""
-            hostname = socket.gethostname()
+            """Quick-connect info; the images themselves are served from memory"""
+            _, _, etag = self.qr_codes.get('png')
+            return jsonify({
+                'url': self.qr_codes.url(),
+                'qr_url': f'/qr.png?v={etag[:12]}',
+                'qr_svg_url': f'/qr.svg?v={etag[:12]}'
+            })
+
+        @self.app.route('/qr.<fmt>')
+        def get_qr_image(fmt):
+            """Serve the cached QR code as PNG or SVG"""
             try:
-                ip = socket.gethostbyname(hostname)
-            except:
-                ip = '127.0.0.1'  # Fallback to localhost
-            url = f"http://{ip}:3030"
-            
-            # Generate QR code
-            qr = qrcode.QRCode(version=1, box_size=10, border=5)
-            qr.add_data(url)
-            qr.make(fit=True)
-            qr_image = qr.make_image(fill_color="black", back_color="white")
+                data, mimetype, etag = self.qr_codes.get(fmt)
+            except ValueError:
+                return jsonify({'error': f'Unsupported format: {fmt}'}), 404
+            response = Response(data, mimetype=mimetype)
+            response.set_etag(etag)
+            # Short max-age: the address can change, revalidation is cheap
+            response.headers['Cache-Control'] = 'public, max-age=60'
+            return response.make_conditional(request)
             
-            # Save temporarily
-            temp_path = os.path.join(self.app.static_folder, 'qr.png')
-            qr_image.save(temp_path)
-            
-            return jsonify({'qr_url': '/static/qr.png'})
+        @self.app.route('/api/nodes/nearby')
+        def get_nearby_nodes():
+            """Peers within radius_km (default: mesh range) or the k nearest"""
+            try:
+                k = request.args.get('k', type=int)
+                if k is not None:
+                    return jsonify({'nodes': self.mesh.get_nearest_nodes(k)})
+                radius_km = request.args.get('radius_km', self.mesh.max_range_km, type=float)
+                return jsonify({'nodes': self.mesh.get_nodes_within(radius_km)})
+            except Exception as e:
+                return jsonify({'error': str(e)}), 400
             
         @self.app.route('/api/first-aid')
         def get_first_aid():
@@ -90,31 +210,109 @@ class BackSat:
             
         @self.app.route('/api/emergency/logs')
         def get_emergency_logs():
-            return jsonify(self.survival.get_emergency_logs())
+            """Paged emergency log: ?since=&until=&type=&lat=&lon=&radius_km=&cursor=&limit=&order=
+
+            Returns {'logs': [...], 'next_cursor': id or None}. Without cursor
+            and limit it returns the pre-paging shape instead: a bare list
+            of every matching event, oldest first.
+            """
+            args = request.args
+            near = None
+            if 'lat' in args and 'lon' in args:
+                near = (args.get('lat', type=float), args.get('lon', type=float),
+                        args.get('radius_km', 5.0, type=float))
+                if None in near or not (-90 <= near[0] <= 90 and -180 <= near[1] <= 180
+                                        and 0 < near[2] <= 20000):
+                    return jsonify({'error': 'lat, lon and radius_km must be valid coordinates'}), 400
+            filters = {'since': args.get('since', type=float), 'until': args.get('until', type=float),
+                       'event_type': args.get('type'), 'near': near}
+            if 'cursor' not in args and 'limit' not in args:
+                return jsonify(self.survival.get_all_emergency_logs(**filters))
+            return jsonify(self.survival.get_emergency_logs(
+                **filters,
+                cursor=args.get('cursor', type=int),
+                limit=args.get('limit', 100, type=int),
+                newest_first=args.get('order', 'desc') != 'asc'))
+
+        @self.app.route('/api/emergency/logs/tail')
+        def tail_emergency_logs():
+            """Long-poll for new emergency events: ?after=<id>&wait=<seconds>"""
+            return jsonify(self._tail_emergency_logs(
+                after_id=request.args.get('after', 0, type=int),
+                limit=request.args.get('limit', 100, type=int),
+                wait=min(request.args.get('wait', 0, type=float), 30)))
             
     def setup_websocket_handlers(self):
         @self.socketio.on('connect')
         def handle_connect():
             client_id = request.sid
             self.connected_clients.add(client_id)
-            console.log(f"[green]New client connected! ID: {client_id}[/green]")
-            # Send initial status
-            self._emit_system_status()
-            self._emit_network_status()
+            self.outbox.add(client_id)
+            self.publisher.clients_changed()
+            if self.debug:
+                console.log(f"[green]New client connected! ID: {client_id}[/green]")
+            # Send a one-off snapshot; deltas keep it current afterwards
+            self._resync_client(client_id)
             
         @self.socketio.on('disconnect')
         def handle_disconnect():
             client_id = request.sid
             self.connected_clients.discard(client_id)
-            console.log(f"[yellow]Client disconnected! ID: {client_id}[/yellow]")
+            self.outbox.remove(client_id)
+            self.publisher.clients_changed()
+            if self.debug:
+                console.log(f"[yellow]Client disconnected! ID: {client_id}[/yellow]")
+            
+        @self.socketio.on('latency_probe')
+        def handle_latency_probe(data):
+            """Echo back through the ack, for round-trip measurements"""
+            return data
             
         @self.socketio.on('message')
         def handle_message(data):
-            console.log(f"[blue]Message received: {data}[/blue]")
-            # Broadcast to mesh network
+            if self.debug:
+                console.log(f"[blue]Message received: {data}[/blue]")
+            # Keep and route across the mesh (multi-hop)
             if data['type'] == 'chat':
-                self.mesh.broadcast_message(data)
-            self.socketio.emit('message', data, broadcast=True)
+                if not isinstance(data.get('text'), str):
+                    return
+                # The sender is always this node, whatever the client claims
+                data = self.mesh.publish('chat', {'type': 'chat', 'text': data['text'],
+                                                  'sender': self.mesh.node_id})
+            self.outbox.emit('message', data)
+            
+        @self.socketio.on('profiler')
+        def handle_profiler(data):
+            """Start or stop the sampling profiler: {enabled: bool}; dev mode only"""
+            if not self.debug:
+                return
+            if (data or {}).get('enabled'):
+                self.profiler.start()
+                console.log("[yellow]Sampling profiler started[/yellow]")
+            elif self.profiler.running:
+                self.profiler.stop()
+                console.log("[yellow]Sampling profiler stopped[/yellow]")
+            self.outbox.emit('profile', self._profile_report(), to=request.sid)
+
+        @self.socketio.on('history_sync')
+        def handle_history_sync(data):
+            """Replay what a client missed: {digest: {channel: {stream: seq}}, channels: [...]}"""
+            data = data or {}
+            if not isinstance(data, dict):
+                return
+            channels = data.get('channels')
+            try:
+                digest = clean_digest(data.get('digest'))
+            except ValueError:
+                return
+            if channels is not None and not (isinstance(channels, list) and
+                                             all(isinstance(channel, str) for channel in channels)):
+                return
+            missing = self.mesh.history.missing(digest, self.HISTORY_REPLAY, channels)
+            for channel, messages in missing.items():
+                if messages:
+                    self.outbox.emit('history', {'channel': channel, 'messages': messages},
+                                     to=request.sid)
             
         @self.socketio.on('sos')
         def handle_sos(data):
@@ -134,12 +332,12 @@ class BackSat:
             morse_sos = self.survival.text_to_morse('SOS')
             data['morse'] = morse_sos
             
-            # Broadcast SOS to all nodes
-            self.mesh.broadcast_message({
+            # Keep and flood SOS to every node in reach
+            self.mesh.publish('sos', {
                 'type': 'sos',
                 'data': data
             })
-            self.socketio.emit('sos', data, broadcast=True)
+            self.outbox.emit('sos', data)
             
         @self.socketio.on('update_location')
         def handle_location_update(data):
@@ -148,62 +346,58 @@ class BackSat:
                 lat = float(data['lat'])
                 lon = float(data['lon'])
                 self.mesh.update_location(lat, lon)
-                self.socketio.emit('location_updated', {
+                self.outbox.emit('location_updated', {
                     'status': 'success',
                     'lat': lat,
                     'lon': lon
                 })
             except Exception as e:
                 console.log(f"[red]Error updating location: {e}[/red]")
-                self.socketio.emit('location_updated', {
+                self.outbox.emit('location_updated', {
                     'status': 'error',
                     'message': str(e)
                 })
             
-    def _emit_system_status(self):
-        """Emit system status updates periodically"""
-        while True:
-            try:
-                cpu = psutil.cpu_percent()
-                memory = psutil.virtual_memory().percent
-                self.socketio.emit('system_status', {
-                    'cpu': cpu,
-                    'memory': memory
-                })
-                self.socketio.sleep(2)
-            except Exception as e:
-                console.log(f"[red]Error updating system status: {e}[/red]")
-                
-    def _emit_network_status(self):
-        """Emit network status updates periodically"""
-        first_run = True
+    def _on_mesh_message(self, payload, envelope):
+        """Relay messages routed to us from other nodes to the dashboard"""
+        if payload.get('type') == 'chat':
+            self.outbox.emit('message', payload)
+        elif payload.get('type') == 'sos':
+            route = 'history sync' if envelope.get('synced') else f"{envelope['hops']} hops"
+            console.log(f"[red]SOS received from {envelope['origin']} ({route})[/red]")
+            self.outbox.emit('sos', payload.get('data'))
+            
+    def _resync_client(self, client_id):
+        """Queue full snapshots for a client that just connected or fell behind"""
+        self.outbox.emit('network_status', self.publisher.snapshot(), to=client_id)
+        status = self.telemetry.latest()
+        if status is not None:
+            self.outbox.emit('system_status', status, to=client_id)
+        
+    def _tail_emergency_logs(self, after_id, limit, wait):
+        if self.async_mode == 'threading':
+            return self.survival.tail_emergency_logs(after_id, limit, wait)
+        # Blocking on the log's condition would stall every green thread: poll instead
+        deadline = time.time() + wait
         while True:
-            try:
-                status = self.mesh.get_network_status()
-                connection_status = {
-                    'status': 'connected' if status['active_nodes'] > 0 else 'waiting_for_nodes',
-                    'nodes': status['nodes'],
-                    'clients': len(self.connected_clients),
-                    'node_id': status['node_id']
-                }
-                
-                if first_run:
-                    console.log(f"[blue]BackSat node {status['node_id']} initialized[/blue]")
-                    first_run = False
-                
-                if status['active_nodes'] > 0:
-                    console.log(f"[green]Mesh network active: {status['active_nodes']} nodes connected[/green]")
-                else:
-                    console.log(f"[yellow]Node {status['node_id']} active, searching for peers...[/yellow]")
-                
-                self.socketio.emit('network_status', connection_status)
-                self.socketio.sleep(2)  # Increased sleep time to reduce console spam
-            except Exception as e:
-                console.log(f"[red]Network status error: {str(e)}[/red]")
-                self.socketio.sleep(2)
+            result = self.survival.tail_emergency_logs(after_id, limit)
+            if result['logs'] or time.time() >= deadline:
+                return result
+            self.socketio.sleep(self.TAIL_POLL)
+            
+    def _profile_report(self, limit=10):
+        return {'stats': self.profiler.get_stats(), 'top': self.profiler.top(limit)}
+
+    def _on_telemetry(self, sample):
+        """Push each telemetry sample, and the metrics with it, to the dashboard"""
+        if self.connected_clients:
+            self.outbox.emit('system_status', sample)
+            self.outbox.emit('metrics', {'metrics': self.metrics.snapshot(),
+                                         'profiler': self.profiler.get_stats()})
                 
     def open_dashboard(self):
-        webbrowser.open('http://localhost:3030')
+        import webbrowser
+        webbrowser.open(f'http://localhost:{self.port}')
             
     def run(self):
         console.print(Panel.fit(
@@ -214,28 +408,50 @@ class BackSat:
         try:
             # Start mesh network
             self.mesh.start()
+            if os.environ.get('BACKSAT_PROFILE'):
+                self.profiler.start()
             
-            # Start monitoring threads
-            Thread(target=self._emit_system_status, daemon=True).start()
-            Thread(target=self._emit_network_status, daemon=True).start()
+            console.log(f"[blue]BackSat node {self.mesh.node_id} initialized[/blue]")
+            
+            # One status publisher for all clients
+            self.socketio.start_background_task(self.telemetry.run, self.socketio.sleep)
+            self.socketio.start_background_task(self.publisher.run)
+            self.socketio.start_background_task(self.outbox.run)
             
             # Open dashboard in separate thread
-            Thread(target=self.open_dashboard).start()
+            if self.debug:
+                Thread(target=self.open_dashboard).start()
             
             # Start server
+            console.log(f"[blue]Serving dashboard in {self.server_mode} mode ({self.async_mode})[/blue]")
+            options = {}
+            if self.async_mode == 'threading':
+                # Production without eventlet/gevent still has to run somewhere
+                options['allow_unsafe_werkzeug'] = True
             self.socketio.run(self.app, 
                             host='0.0.0.0', 
-                            port=3030,
-                            debug=True,
-                            use_reloader=False)
+                            port=self.port,
+                            debug=self.debug,
+                            use_reloader=False,
+                            log_output=self.debug,
+                            **options)
                             
         except KeyboardInterrupt:
             console.log("[yellow]Shutting down BackSat...[/yellow]")
-            self.mesh.stop()
         except Exception as e:
             console.log(f"[red]Error starting BackSat: {e}[/red]")
-            self.mesh.stop()
             raise
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """Stop background work and commit queued emergency events"""
+        self.publisher.stop()
+        self.outbox.stop()
+        self.telemetry.stop()
+        self.profiler.stop()
+        self.mesh.stop()
+        self.survival.close()
 
 if __name__ == '__main__':
     backsat = BackSat()
@@ -0,0 +1,265 @@
+import atexit
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from ..network.spatial import GeoPoint, KM_PER_DEGREE
+
+# fsync policy -> SQLite synchronous mode. In WAL mode NORMAL only fsyncs
+# at checkpoints, so a crash can lose the last commits but never corrupts.
+FSYNC_POLICIES = {
+    'always': 'FULL',  # fsync every group commit
+    'batch': 'NORMAL',  # fsync at WAL checkpoints
+    'off': 'OFF'  # leave it to the OS
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    timestamp TEXT NOT NULL,
+    type TEXT NOT NULL,
+    lat REAL,
+    lon REAL,
+    location TEXT,
+    details TEXT
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_type_ts ON events (type, ts);
+CREATE INDEX IF NOT EXISTS events_lat_lon ON events (lat, lon);
+"""
+
+class EmergencyLogStore:
+    """Append-only emergency event log in SQLite (WAL mode).
+
+    Writers never touch the disk: append() queues the event and a single
+    writer thread commits everything queued in one transaction every
+    flush_interval seconds (or as soon as batch_size events are waiting).
+    Readers use their own per-thread connections, which WAL lets run
+    alongside the writer, and page through the indexed table with an id
+    cursor instead of loading the whole log. close() commits whatever is
+    still queued; it also runs at interpreter exit, so an event appended
+    just before shutdown is not lost with the daemon writer thread.
+    """
+
+    def __init__(self, path, fsync='batch', flush_interval=0.5, batch_size=256, legacy_log=None):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.path = path
+        self.synchronous = FSYNC_POLICIES[fsync]
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = []
+        self._uncommitted = 0
+        self._cond = threading.Condition()
+        self._committed = threading.Condition()
+        self._local = threading.local()
+        self.last_id = 0
+        self.legacy_skipped = 0  # Malformed lines left out of the legacy import
+        self.running = True
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        if legacy_log and os.path.exists(legacy_log):
+            self._import_legacy(conn, legacy_log)
+        self.last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+        self._writer = threading.Thread(target=self._write_loop, name='emergency-log-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _import_legacy(self, conn, legacy_log):
+        """One-time import of the old JSON-lines emergency.log, skipping malformed lines"""
+        rows = []
+        with open(legacy_log, 'r', errors='replace') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        entry = json.loads(line)
+                        if not isinstance(entry, dict):
+                            raise ValueError("Not an object")
+                        rows.append(self._row(entry))
+                    except (ValueError, TypeError, OverflowError, OSError, RecursionError):
+                        self.legacy_skipped += 1
+        with conn:
+            conn.executemany(
+                "INSERT INTO events (ts, timestamp, type, lat, lon, location, details) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        os.replace(legacy_log, legacy_log + '.imported')
+
+    @staticmethod
+    def _row(entry):
+        """Table row for an event dict; raises ValueError or TypeError if it is malformed"""
+        timestamp = entry.get('timestamp') or datetime.now().isoformat()
+        if isinstance(timestamp, (int, float)) and not isinstance(timestamp, bool):
+            ts = float(timestamp)  # Epoch seconds
+            timestamp = datetime.fromtimestamp(ts).isoformat()
+        elif isinstance(timestamp, str):
+            try:
+                ts = datetime.fromisoformat(timestamp).timestamp()
+            except ValueError:
+                ts = time.time()
+        else:
+            raise TypeError(f"Bad timestamp {timestamp!r}")
+        if not isinstance(entry.get('type', 'unknown'), str):
+            raise TypeError(f"Bad event type {entry['type']!r}")
+        location = entry.get('location')
+        lat = lon = None
+        if isinstance(location, dict):
+            try:
+                lat = float(location['lat'])
+                lon = float(location['lon'])
+            except (KeyError, TypeError, ValueError):
+                lat = lon = None
+        return (ts, timestamp, entry.get('type', 'unknown'), lat, lon,
+                json.dumps(location), json.dumps(entry.get('details')))
+
+    def append(self, entry):
+        """Queue an event for the next group commit"""
+        row = self._row(entry)
+        with self._cond:
+            self._queue.append(row)
+            self._uncommitted += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self, timeout=5):
+        """Block until everything queued so far is committed"""
+        with self._cond:
+            if not self._uncommitted:
+                return
+            self._cond.notify()
+        with self._committed:
+            self._committed.wait_for(lambda: not self._uncommitted, timeout)
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            with self._cond:
+                if self.running and len(self._queue) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                batch, self._queue = self._queue, []
+            if batch:
+                try:
+                    with conn:
+                        conn.executemany(
+                            "INSERT INTO events (ts, timestamp, type, lat, lon, location, details) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+                    self.last_id = conn.execute("SELECT MAX(id) FROM events").fetchone()[0]
+                    with self._cond:
+                        self._uncommitted -= len(batch)
+                except sqlite3.Error:
+                    # Keep the events for the next attempt rather than dropping them
+                    with self._cond:
+                        self._queue[:0] = batch
+                    time.sleep(self.flush_interval)
+                with self._committed:
+                    self._committed.notify_all()
+            elif not self.running:
+                break
+        conn.close()
+
+    def close(self):
+        """Commit everything still queued and stop the writer; safe to call twice"""
+        with self._cond:
+            self.running = False
+            self._cond.notify()
+        self._writer.join(timeout=5)
+        atexit.unregister(self.close)
+
+    @staticmethod
+    def _event(row):
+        return {
+            'id': row['id'],
+            'timestamp': row['timestamp'],
+            'type': row['type'],
+            'location': json.loads(row['location']) if row['location'] else None,
+            'details': json.loads(row['details']) if row['details'] else None
+        }
+
+    def query(self, since=None, until=None, event_type=None, near=None, cursor=None,
+              limit=100, newest_first=True):
+        """Page through events.
+
+        since/until are epoch seconds, near is (lat, lon, radius_km) and
+        cursor is the 'next_cursor' of the previous page. Returns
+        {'logs': [...], 'next_cursor': id or None}.
+        """
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts <= ?")
+            params.append(until)
+        if event_type:
+            clauses.append("type = ?")
+            params.append(event_type)
+        origin = radius_km = None
+        if near is not None:
+            lat, lon, radius_km = near
+            origin = GeoPoint(lat, lon)
+            # Bounding box on the index first, exact distance below
+            dlat = radius_km / KM_PER_DEGREE
+            dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+            clauses.append("lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?")
+            params.extend((lat - dlat, lat + dlat, lon - dlon, lon + dlon))
+        # Keyset pagination: the cursor is always the last clause so the
+        # refill loop below can just move it forward
+        clauses.append("id < ?" if newest_first else "id > ?")
+        params.append(cursor if cursor is not None else (2 ** 63 - 1 if newest_first else 0))
+        sql = f"SELECT * FROM events WHERE {' AND '.join(clauses)} ORDER BY id {'DESC' if newest_first else 'ASC'} LIMIT ?"
+        limit = max(1, min(int(limit), 1000))
+
+        logs = []
+        last_id = None
+        while True:
+            page = self._reader().execute(sql, params + [limit]).fetchall()
+            for row in page:
+                last_id = row['id']
+                # The bounding box over-selects corners; drop those exactly
+                if origin and origin.distance_to(GeoPoint(row['lat'], row['lon'])) > radius_km:
+                    continue
+                logs.append(self._event(row))
+                if len(logs) == limit:
+                    return {'logs': logs, 'next_cursor': last_id}
+            if len(page) < limit:
+                return {'logs': logs, 'next_cursor': None}
+            params[-1] = last_id
+
+    def scan(self, **filters):
+        """Every event matching the query() filters, oldest first, a page at a time"""
+        cursor = None
+        while True:
+            page = self.query(cursor=cursor, limit=1000, newest_first=False, **filters)
+            yield from page['logs']
+            cursor = page['next_cursor']
+            if cursor is None:
+                return
+
+    def tail(self, after_id=0, limit=100, wait=0):
+        """Events newer than after_id, oldest first; optionally long-poll up to wait seconds"""
+        if wait and self.last_id <= after_id:
+            with self._committed:
+                self._committed.wait_for(lambda: self.last_id > after_id, wait)
+        rows = self._reader().execute(
+            "SELECT * FROM events WHERE id > ? ORDER BY id ASC LIMIT ?",
+            (after_id, max(1, min(int(limit), 1000)))).fetchall()
+        logs = [self._event(row) for row in rows]
+        return {'logs': logs, 'next_cursor': logs[-1]['id'] if logs else after_id}
@@ -0,0 +1,99 @@
+import threading
+from rich.console import Console
+
+console = Console()
+
+class DashboardPublisher:
+    """Pushes mesh node table changes to dashboard clients as coalesced deltas.
+
+    The mesh reports every join/update/leave through a change listener; the
+    publisher folds them into one pending entry per node and a single
+    background task emits whatever accumulated once per TICK. Clients get a
+    full snapshot only when they connect.
+    """
+
+    TICK = 1.0  # Seconds between delta flushes
+
+    def __init__(self, socketio, mesh, clients, emit=None):
+        self.socketio = socketio
+        self.emit = emit or socketio.emit
+        self.mesh = mesh
+        self.clients = clients
+        self._pending = {}  # {node_id: 'joined' | 'updated' | 'seen' | 'left'}
+        self._clients_changed = False
+        self._lock = threading.Lock()
+        self.running = False
+        mesh.add_change_listener(self.on_change)
+
+    def on_change(self, event, node_id):
+        """Mesh change listener; runs on the mesh engine thread"""
+        with self._lock:
+            previous = self._pending.get(node_id)
+            if event == 'left':
+                if previous == 'joined':
+                    del self._pending[node_id]  # Came and went within one tick
+                else:
+                    self._pending[node_id] = 'left'
+            elif event == 'joined':
+                # Left and rejoined within one tick: clients still have it
+                self._pending[node_id] = 'updated' if previous == 'left' else 'joined'
+            elif event == 'updated':
+                if previous != 'joined':
+                    self._pending[node_id] = 'updated'
+            elif previous is None:
+                self._pending[node_id] = 'seen'
+
+    def clients_changed(self):
+        with self._lock:
+            self._clients_changed = True
+
+    def snapshot(self):
+        status = self.mesh.get_network_status()
+        return {
+            'status': 'connected' if status['active_nodes'] > 0 else 'waiting_for_nodes',
+            'node_id': status['node_id'],
+            'stream': self.mesh.history.stream,  # Lets the dashboard tell our own chat messages apart
+            'active_nodes': status['active_nodes'],
+            'nodes': status['nodes'],
+            'clients': len(self.clients)
+        }
+
+    def flush(self):
+        """Emit the accumulated delta, if there is one"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            clients_changed, self._clients_changed = self._clients_changed, False
+        if not pending and not clients_changed:
+            return None
+        delta = {'joined': [], 'updated': [], 'seen': [], 'left': []}
+        for node_id, event in pending.items():
+            if event in ('joined', 'updated'):
+                node = self.mesh.get_node(node_id)
+                if node is None:
+                    # Expired before we got to it
+                    if event == 'updated':
+                        delta['left'].append(node_id)
+                    continue
+                delta[event].append(node)
+            else:
+                delta[event].append(node_id)
+        active = len(self.mesh.nodes)
+        delta['active_nodes'] = active
+        delta['status'] = 'connected' if active > 0 else 'waiting_for_nodes'
+        delta['clients'] = len(self.clients)
+        if self.clients:
+            self.emit('network_delta', delta)
+        return delta
+
+    def run(self):
+        """Background task: one flush per tick for all clients"""
+        self.running = True
+        while self.running:
+            self.socketio.sleep(self.TICK)
+            try:
+                self.flush()
+            except Exception as e:
+                console.log(f"[red]Network status error: {str(e)}[/red]")
+
+    def stop(self):
+        self.running = False
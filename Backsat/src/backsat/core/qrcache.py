@@ -0,0 +1,76 @@
+import hashlib
+import io
+import socket
+import threading
+import time
+
+class QRCodeCache:
+    """Quick-connect QR codes rendered once per (address, port) and kept in memory.
+
+    The node's LAN address is re-resolved at most every ADDRESS_TTL seconds;
+    when it changes the cached images for the old address are dropped. Each
+    image carries a content hash so clients can revalidate with ETags.
+    """
+
+    ADDRESS_TTL = 30
+    FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+    def __init__(self, port):
+        self.port = port
+        self._lock = threading.Lock()
+        self._address = None
+        self._resolved_at = 0
+        self._images = {}  # {(ip, port, fmt): (bytes, etag)}
+        self.renders = 0
+
+    def _local_ip(self):
+        try:
+            return socket.gethostbyname(socket.gethostname())
+        except OSError:
+            return '127.0.0.1'  # Fallback to localhost
+
+    def address(self):
+        now = time.monotonic()
+        if self._address is None or now - self._resolved_at > self.ADDRESS_TTL:
+            ip = self._local_ip()
+            with self._lock:
+                if ip != self._address:
+                    self._images.clear()
+                    self._address = ip
+                self._resolved_at = now
+        return self._address
+
+    def url(self):
+        return f"http://{self.address()}:{self.port}"
+
+    def get(self, fmt='png'):
+        """Return (image bytes, mimetype, etag) for the current address"""
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Unsupported QR format: {fmt}")
+        ip = self.address()
+        key = (ip, self.port, fmt)
+        cached = self._images.get(key)
+        if cached is None:
+            with self._lock:
+                cached = self._images.get(key)
+                if cached is None:
+                    data = self._render(f"http://{ip}:{self.port}", fmt)
+                    cached = self._images[key] = (data, hashlib.sha1(data).hexdigest())
+                    self.renders += 1
+        data, etag = cached
+        return data, self.FORMATS[fmt], etag
+
+    @staticmethod
+    def _render(url, fmt):
+        import qrcode  # Pulls in PIL: loaded on the first render, not at startup
+        qr = qrcode.QRCode(version=1, box_size=10, border=5)
+        qr.add_data(url)
+        qr.make(fit=True)
+        if fmt == 'svg':
+            from qrcode.image.svg import SvgPathImage
+            image = qr.make_image(image_factory=SvgPathImage)
+        else:
+            image = qr.make_image(fill_color="black", back_color="white")
+        buffer = io.BytesIO()
+        image.save(buffer)
+        return buffer.getvalue()
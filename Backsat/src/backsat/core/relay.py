@@ -0,0 +1,67 @@
+import importlib.util
+import os
+import signal
+import threading
+from ..network.mesh import MeshNetwork
+from .telemetry import TelemetrySampler
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+HISTORY_DIR = os.path.join(os.path.dirname(__file__), 'data', 'history')
+
+class MeshRelay:
+    """Headless node: the mesh without the dashboard.
+
+    Beacons, multi-hop routing, store-and-forward, history sync and file
+    relaying all run as usual, but nothing from the web stack (Flask,
+    Socket.IO, qrcode) is imported. Meant for relay-only devices started
+    with `python run.py --mode mesh-only`. When psutil is installed the
+    relay samples its own health slowly and advertises it in its beacons,
+    so dashboards nearby can see how unattended relays are doing.
+    """
+
+    STATS_INTERVAL = 300  # Seconds between status log lines
+    TELEMETRY_INTERVAL = 30  # Seconds between health samples
+
+    def __init__(self, link_mode=None, history_dir=HISTORY_DIR, telemetry=True):
+        link_mode = link_mode or os.environ.get('BACKSAT_LINK_MODE', 'multicast')
+        self.telemetry = None
+        if telemetry and importlib.util.find_spec('psutil') is not None:
+            self.telemetry = TelemetrySampler(interval=self.TELEMETRY_INTERVAL, size=120)
+        self.mesh = MeshNetwork(max_range_km=3, link_mode=link_mode, history_dir=history_dir,
+                                telemetry=self.telemetry.compact if self.telemetry else None)
+        self.mesh.add_message_handler(self._on_mesh_message)
+        self._stopped = threading.Event()
+
+    def _on_mesh_message(self, payload, envelope):
+        if isinstance(payload, dict) and payload.get('type') == 'sos':
+            route = 'history sync' if envelope.get('synced') else f"{envelope['hops']} hops"
+            logger.warning(f"SOS received from {envelope['origin']} ({route})")
+
+    def _log_status(self):
+        status = self.mesh.get_network_status()
+        routing = self.mesh.get_routing_stats()
+        logger.info(f"{status['active_nodes']} peers, {routing['forwarded']} forwarded, "
+                    f"{routing['stored']} held for absent nodes")
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        self.mesh.start()
+        if self.telemetry:
+            self.telemetry.start()
+        logger.info(f"Mesh relay {self.mesh.node_id} running (no dashboard)")
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda *_: self.stop())
+        try:
+            while not self._stopped.wait(self.STATS_INTERVAL):
+                self._log_status()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            logger.info("Shutting down mesh relay...")
+            if self.telemetry:
+                self.telemetry.stop()
+            self.mesh.stop()
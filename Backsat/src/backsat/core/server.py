@@ -0,0 +1,193 @@
+import gzip
+import importlib.util
+import threading
+import time
+from collections import deque, OrderedDict
+from flask import request
+from rich.console import Console
+
+console = Console()
+
+SERVER_MODES = ('dev', 'production')
+GREEN_MODES = ('eventlet', 'gevent')  # Tried in this order for production
+
+def pick_async_mode(server_mode):
+    """Flask-SocketIO async_mode for a server mode ('dev' or 'production')"""
+    if server_mode not in SERVER_MODES:
+        raise ValueError(f"Unknown server mode: {server_mode}")
+    if server_mode == 'dev':
+        return 'threading'
+    for mode in GREEN_MODES:
+        if importlib.util.find_spec(mode) is not None:
+            return mode
+    console.log("[yellow]Neither eventlet nor gevent is installed; "
+                "serving production mode with threads[/yellow]")
+    return 'threading'
+
+class ResponseCompressor:
+    """Gzips text responses for clients that accept it.
+
+    Static files are compressed once per ETag and kept in memory, so each
+    asset costs one compression for the life of the process; dynamic
+    responses (JSON, the rendered index) are compressed per request.
+    """
+
+    MIMETYPES = {'text/html', 'text/css', 'text/plain', 'text/javascript',
+                 'application/javascript', 'application/json', 'image/svg+xml'}
+    MIN_SIZE = 500  # Bytes; smaller bodies don't shrink enough to pay off
+    LEVEL = 6
+    MAX_CACHED = 64  # Compressed static files kept
+
+    def __init__(self, app):
+        self._cache = OrderedDict()  # {(path, etag): gzipped bytes}
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.cache_hits = 0
+        app.after_request(self.compress)
+
+    def compress(self, response):
+        if response.mimetype not in self.MIMETYPES or response.is_streamed:
+            return response
+        response.vary.add('Accept-Encoding')
+        if (response.status_code != 200 or 'Content-Encoding' in response.headers or
+                'gzip' not in request.headers.get('Accept-Encoding', '')):
+            return response
+        etag, _ = response.get_etag()
+        key = (request.path, etag) if etag else None
+        with self._lock:
+            data = self._cache.get(key) if key else None
+            if data is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+        if data is None:
+            response.direct_passthrough = False  # Static files: read the body
+            body = response.get_data()
+            if len(body) < self.MIN_SIZE:
+                return response
+            data = gzip.compress(body, self.LEVEL)
+            self.compressed += 1
+            if key:
+                with self._lock:
+                    self._cache[key] = data
+                    while len(self._cache) > self.MAX_CACHED:
+                        self._cache.popitem(last=False)
+        response.set_data(data)
+        response.headers['Content-Encoding'] = 'gzip'
+        if etag:
+            # Same resource, different bytes: a weak validator still revalidates
+            response.set_etag(etag, weak=True)
+        return response
+
+    def get_stats(self):
+        return {'compressed': self.compressed, 'cache_hits': self.cache_hits,
+                'cached': len(self._cache)}
+
+class ClientOutbox:
+    """Bounded per-client send queues drained by one background task.
+
+    Every dashboard emit goes through here, from any thread: the event is
+    appended to each target client's queue and the flusher hands at most
+    BATCH events per client to Socket.IO every INTERVAL. A client whose
+    engine.io queue is already MAX_BACKLOG packets deep is skipped until it
+    catches up, and one whose own queue overflows loses what was queued
+    and gets a fresh snapshot through on_overflow instead, so a slow or
+    stalled client costs bounded memory and never delays the others.
+    """
+
+    QUEUE_SIZE = 256  # Events held per client
+    BATCH = 32  # Events handed to Socket.IO per client per flush
+    INTERVAL = 0.05  # Seconds between flushes
+    MAX_BACKLOG = 64  # engine.io packets in flight before a client is skipped
+
+    def __init__(self, socketio, on_overflow=None, queue_size=None, metrics=None):
+        self.socketio = socketio
+        self.on_overflow = on_overflow
+        self.queue_size = queue_size or self.QUEUE_SIZE
+        self._queues = {}  # {sid: deque of (event, data)}
+        self._overflowed = set()
+        self.sent = 0
+        self.dropped = 0
+        self.resyncs = 0
+        self.running = False
+        self._flush_seconds = None
+        if metrics is not None:
+            self._flush_seconds = metrics.histogram(
+                'dashboard_flush_seconds', "Time to hand one round of queued events to Socket.IO")
+            metrics.collect('dashboard_clients', "Connected dashboard clients", lambda: len(self._queues))
+            metrics.collect('dashboard_events_total', "Dashboard events, by outcome",
+                            lambda: {'sent': self.sent, 'dropped': self.dropped, 'resynced': self.resyncs},
+                            kind='counter', labels=('outcome',))
+
+    def add(self, sid):
+        self._queues[sid] = deque()
+
+    def remove(self, sid):
+        self._queues.pop(sid, None)
+        self._overflowed.discard(sid)
+
+    def emit(self, event, data, to=None):
+        """Queue event for one client (to) or all of them; safe from any thread"""
+        targets = [to] if to is not None else list(self._queues)
+        for sid in targets:
+            queue = self._queues.get(sid)
+            if queue is None:
+                continue
+            if len(queue) >= self.queue_size:
+                self.dropped += len(queue)
+                queue.clear()
+                self._overflowed.add(sid)
+            queue.append((event, data))
+
+    def _backlog(self, sid):
+        """Packets engine.io still holds for sid (python-socketio internals)"""
+        try:
+            server = self.socketio.server
+            eio_sid = server.manager.eio_sid_from_sid(sid, '/')
+            return server.eio.sockets[eio_sid].queue.qsize()
+        except (AttributeError, KeyError, TypeError):
+            return 0
+
+    def flush(self):
+        started = time.perf_counter()
+        sent = self.sent
+        while self._overflowed:
+            sid = self._overflowed.pop()
+            if sid in self._queues:
+                self.resyncs += 1
+                if self.on_overflow:
+                    self.on_overflow(sid)
+        for sid, queue in list(self._queues.items()):
+            if not queue or self._backlog(sid) > self.MAX_BACKLOG:
+                continue
+            for _ in range(min(self.BATCH, len(queue))):
+                try:
+                    event, data = queue.popleft()
+                except IndexError:
+                    break  # Cleared by an overflow on another thread
+                self.socketio.emit(event, data, to=sid)
+                self.sent += 1
+        if self._flush_seconds is not None and self.sent != sent:
+            self._flush_seconds.observe(time.perf_counter() - started)
+
+    def run(self):
+        """Background task: drain the queues until stopped"""
+        self.running = True
+        while self.running:
+            self.socketio.sleep(self.INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:
+                console.log(f"[red]Client send error: {e}[/red]")
+
+    def stop(self):
+        self.running = False
+
+    def get_stats(self):
+        queues = list(self._queues.values())
+        return {
+            'clients': len(queues),
+            'queued': sum(len(queue) for queue in queues),
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'resyncs': self.resyncs
+        }
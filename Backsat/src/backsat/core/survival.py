@@ -1,11 +1,14 @@
-import json
 import os
 from datetime import datetime
+from .logstore import EmergencyLogStore
 
 class SurvivalTools:
     def __init__(self):
         self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
         os.makedirs(self.data_dir, exist_ok=True)
+        self.emergency_log = EmergencyLogStore(
+            os.path.join(self.data_dir, 'emergency.db'),
+            legacy_log=os.path.join(self.data_dir, 'emergency.log'))
         self._load_first_aid()
         self._load_morse_code()
         
@@ -74,26 +77,25 @@ class SurvivalTools:
         
     def log_emergency(self, data):
         """Log emergency events"""
-        log_file = os.path.join(self.data_dir, 'emergency.log')
-        timestamp = datetime.now().isoformat()
-        
-        with open(log_file, 'a') as f:
-            log_entry = {
-                'timestamp': timestamp,
-                'type': data.get('type', 'unknown'),
-                'location': data.get('location'),
-                'details': data.get('details')
-            }
-            f.write(json.dumps(log_entry) + '\n')
+        self.emergency_log.append({
+            'timestamp': datetime.now().isoformat(),
+            'type': data.get('type', 'unknown'),
+            'location': data.get('location'),
+            'details': data.get('details')
+        })
             
-    def get_emergency_logs(self):
-        """Get emergency event logs"""
-        log_file = os.path.join(self.data_dir, 'emergency.log')
-        logs = []
-        
-        if os.path.exists(log_file):
-            with open(log_file, 'r') as f:
-                for line in f:
-                    logs.append(json.loads(line.strip()))
-                    
-        return logs 
\ No newline at end of file
+    def get_emergency_logs(self, **filters):
+        """Get a page of emergency event logs (see EmergencyLogStore.query)"""
+        return self.emergency_log.query(**filters)
+
+    def get_all_emergency_logs(self, **filters):
+        """Get every matching emergency event log, oldest first (see EmergencyLogStore.scan)"""
+        return list(self.emergency_log.scan(**filters))
+
+    def tail_emergency_logs(self, after_id=0, limit=100, wait=0):
+        """Get emergency events newer than after_id, optionally waiting for one"""
+        return self.emergency_log.tail(after_id, limit, wait)
+
+    def close(self):
+        """Commit any queued emergency events"""
+        self.emergency_log.close()
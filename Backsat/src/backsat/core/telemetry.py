@@ -0,0 +1,184 @@
+import math
+import threading
+import time
+from collections import deque
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Columns of a stored sample, in order
+FIELDS = ('ts', 'cpu', 'memory', 'battery', 'plugged', 'temperature',
+          'rx_bps', 'tx_bps', 'drops', 'signal_dbm')
+
+class TelemetrySampler:
+    """The node's one source of system telemetry.
+
+    A single loop samples CPU, memory, battery, temperature and radio
+    counters every interval into a fixed-size ring buffer, so dashboard
+    clients, /metrics and mesh beacons all read cached values instead of
+    each calling psutil. Samples are kept as tuples (see FIELDS); the
+    buffer holds HISTORY of them and serves history queries. psutil is
+    imported on the first sample. Anything the platform doesn't expose
+    (no battery, no sensors, no wireless) is None.
+    """
+
+    INTERVAL = 2.0  # Seconds between samples
+    HISTORY = 900  # Samples kept: 30 minutes at the default interval
+    CPU_STEP = 5  # Beacon telemetry rounds CPU to this many percent, so it changes less often
+
+    def __init__(self, interval=None, size=None, interfaces=None, on_sample=None, metrics=None):
+        self.interval = interval or self.INTERVAL
+        self.interfaces = interfaces  # Radio counters for these NICs; None: all but loopback
+        self.on_sample = on_sample  # Called with each new sample dict
+        self._samples = deque(maxlen=size or self.HISTORY)
+        self._lock = threading.Lock()
+        self._last_net = None  # (monotonic time, rx bytes, tx bytes)
+        self.running = False
+        self.thread = None
+        if metrics is not None:
+            for field, help in (('cpu', "CPU use (percent)"), ('memory', "Memory use (percent)"),
+                                ('battery', "Battery charge (percent)"),
+                                ('temperature', "Hottest temperature sensor (°C)"),
+                                ('signal_dbm', "Wireless signal level (dBm)")):
+                metrics.collect(f'system_{field}', help,
+                                lambda field=field: (self.latest() or {}).get(field))
+
+    def sample(self):
+        """Take one sample now, store it and return it as a dict"""
+        import psutil
+        row = (round(time.time(), 3), psutil.cpu_percent(), psutil.virtual_memory().percent,
+               *self._battery(psutil), self._temperature(psutil), *self._radio(psutil),
+               self._signal())
+        with self._lock:
+            self._samples.append(row)
+        sample = dict(zip(FIELDS, row))
+        if self.on_sample:
+            self.on_sample(sample)
+        return sample
+
+    @staticmethod
+    def _battery(psutil):
+        try:
+            battery = psutil.sensors_battery()
+        except (AttributeError, OSError):
+            battery = None
+        if battery is None:
+            return None, None
+        return round(battery.percent), battery.power_plugged
+
+    @staticmethod
+    def _temperature(psutil):
+        try:
+            sensors = psutil.sensors_temperatures()
+        except (AttributeError, OSError):
+            sensors = {}
+        readings = [entry.current for entries in sensors.values() for entry in entries if entry.current]
+        if readings:
+            return round(max(readings), 1)
+        try:
+            with open('/sys/class/thermal/thermal_zone0/temp') as f:
+                return round(int(f.read()) / 1000, 1)
+        except (OSError, ValueError):
+            return None
+
+    def _radio(self, psutil):
+        """(rx bytes/s, tx bytes/s, dropped packets) over the radio interfaces"""
+        try:
+            counters = psutil.net_io_counters(pernic=True)
+        except OSError:
+            return None, None, None
+        nics = [stats for name, stats in counters.items()
+                if (name in self.interfaces if self.interfaces else name != 'lo')]
+        rx = sum(stats.bytes_recv for stats in nics)
+        tx = sum(stats.bytes_sent for stats in nics)
+        drops = sum(stats.dropin + stats.dropout for stats in nics)
+        now = time.monotonic()
+        rates = (None, None)
+        if self._last_net is not None:
+            elapsed = now - self._last_net[0]
+            if elapsed > 0:
+                rates = (round(max(0, rx - self._last_net[1]) / elapsed),
+                         round(max(0, tx - self._last_net[2]) / elapsed))
+        self._last_net = (now, rx, tx)
+        return (*rates, drops)
+
+    def _signal(self):
+        """Strongest wireless signal level in dBm (Linux /proc/net/wireless)"""
+        try:
+            with open('/proc/net/wireless') as f:
+                lines = f.readlines()[2:]
+        except OSError:
+            return None
+        levels = []
+        for line in lines:
+            name, _, values = line.partition(':')
+            if self.interfaces and name.strip() not in self.interfaces:
+                continue
+            try:
+                levels.append(float(values.split()[2].rstrip('.')))
+            except (IndexError, ValueError):
+                continue
+        return max(levels) if levels else None
+
+    def latest(self):
+        """Most recent sample as a dict, or None before the first one"""
+        with self._lock:
+            row = self._samples[-1] if self._samples else None
+        return dict(zip(FIELDS, row)) if row else None
+
+    def history(self, since=None, fields=None, max_points=None):
+        """Samples newer than since (oldest first), averaged down to max_points"""
+        with self._lock:
+            rows = list(self._samples)
+        if since is not None:
+            rows = [row for row in rows if row[0] > since]
+        if max_points and len(rows) > max_points:
+            step = math.ceil(len(rows) / max_points)
+            rows = [self._mean(rows[i:i + step]) for i in range(0, len(rows), step)]
+        columns = [(i, name) for i, name in enumerate(FIELDS)
+                   if fields is None or name in fields or name == 'ts']
+        return [{name: row[i] for i, name in columns} for row in rows]
+
+    @staticmethod
+    def _mean(rows):
+        merged = [rows[-1][0]]
+        for column in list(zip(*rows))[1:]:
+            values = [value for value in column if value is not None]
+            if not values:
+                merged.append(None)
+            elif isinstance(values[-1], bool):
+                merged.append(values[-1])
+            else:
+                merged.append(round(sum(values) / len(values), 1))
+        return tuple(merged)
+
+    def compact(self):
+        """Small-integer summary for mesh beacons, or None before the first sample"""
+        sample = self.latest()
+        if sample is None:
+            return None
+        temperature = sample['temperature']
+        return {
+            'cpu': min(100, self.CPU_STEP * round(sample['cpu'] / self.CPU_STEP)),
+            'memory': round(sample['memory']),
+            'battery': sample['battery'],
+            'temp': round(temperature) if temperature is not None else None
+        }
+
+    def run(self, sleep=time.sleep):
+        """Sampling loop; pass socketio.sleep to run it as a green background task"""
+        self.running = True
+        while self.running:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Telemetry sample failed: {e}")
+            sleep(self.interval)
+
+    def start(self):
+        """Run the loop in a daemon thread"""
+        self.thread = threading.Thread(target=self.run, name='telemetry', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,53 @@
+// BackSat dashboard service worker, rendered per asset build
+const CACHE = 'backsat-{{ version }}';
+const PRECACHE = {{ urls|tojson }};
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(CACHE)
+            .then(cache => cache.addAll(PRECACHE.concat(['/'])))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    // Drop the caches of older builds
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys
+                .filter(key => key.startsWith('backsat-') && key !== CACHE)
+                .map(key => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (request.method !== 'GET' || url.origin !== self.location.origin) {
+        return;
+    }
+    if (url.pathname.startsWith('{{ prefix }}')) {
+        // Fingerprinted: a cached copy is always current
+        event.respondWith(
+            caches.match(request).then(cached => cached || fetch(request).then(response => {
+                if (response.ok) {
+                    const copy = response.clone();
+                    caches.open(CACHE).then(cache => cache.put(request, copy));
+                }
+                return response;
+            }))
+        );
+    } else if (request.mode === 'navigate' && url.pathname === '/') {
+        // The page itself: fresh while the node answers, cached when it doesn't
+        event.respondWith(
+            fetch(request).then(response => {
+                if (response.ok) {
+                    const copy = response.clone();
+                    caches.open(CACHE).then(cache => cache.put('/', copy));
+                }
+                return response;
+            }).catch(() => caches.match('/'))
+        );
+    }
+});
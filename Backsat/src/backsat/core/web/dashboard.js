@@ -0,0 +1,409 @@
+const socket = io({
+    reconnectionAttempts: 3,
+    timeout: 5000
+});
+let networkChart;
+let connectionAttempts = 0;
+
+// Set initial status
+updateConnectionStatus('initializing');
+
+// Connection handling
+socket.on('connect', () => {
+    console.log('Connected to BackSat server');
+    connectionAttempts = 0;
+    updateConnectionStatus('server_connected');
+    // Fetch only the chat we haven't seen (everything recent on first load)
+    socket.emit('history_sync', { digest: { chat: chatMarks }, channels: ['chat'] });
+});
+
+socket.on('connect_error', (error) => {
+    console.log('Connection error:', error);
+    connectionAttempts++;
+    if (connectionAttempts >= 3) {
+        updateConnectionStatus('server_error');
+    }
+});
+
+socket.on('disconnect', () => {
+    console.log('Disconnected from BackSat server');
+    updateConnectionStatus('server_disconnected');
+});
+
+// Network status handling: one snapshot on connect, then deltas
+const meshNodes = new Map();  // id -> node, with seenAt in ms
+let meshNodeId = 'N/A';
+let meshStream = null;  // Our history stream: chat messages on it are ours
+
+function storeNode(node) {
+    meshNodes.set(node.id, { ...node, seenAt: Date.now() - node.last_seen * 1000 });
+}
+
+// Peer health piggybacked on its beacons: {cpu, memory, battery, temp}
+function formatHealth(health) {
+    const parts = [];
+    if (health.cpu !== null) parts.push(`CPU ${health.cpu}%`);
+    if (health.memory !== null) parts.push(`Mem ${health.memory}%`);
+    if (health.battery !== null) parts.push(`🔋 ${health.battery}%`);
+    if (health.temp !== null) parts.push(`${health.temp}°C`);
+    return parts.join(' · ');
+}
+
+function renderNetwork(activeNodes) {
+    document.getElementById('node-id').textContent = meshNodeId;
+    document.getElementById('active-nodes-count').textContent = activeNodes;
+
+    // Update connection status based on both socket and mesh status
+    if (socket.connected) {
+        updateConnectionStatus(activeNodes > 0 ? 'mesh_connected' : 'mesh_waiting');
+    }
+
+    // Update nodes list
+    const nodesDiv = document.getElementById('active-nodes');
+    nodesDiv.innerHTML = '';
+
+    meshNodes.forEach(node => {
+        const nodeElement = document.createElement('div');
+        nodeElement.className = 'bg-gray-700 rounded p-2 flex justify-between items-center';
+
+        const distanceClass = node.distance > 2.5 ? 'text-red-400' : 
+                            node.distance > 1.5 ? 'text-yellow-400' : 
+                            'text-green-400';
+        const lastSeen = Math.max(0, Math.round((Date.now() - node.seenAt) / 1000));
+
+        // Peer-supplied strings go in as text, never markup
+        const info = document.createElement('div');
+        const name = document.createElement('p');
+        name.className = 'font-medium';
+        name.textContent = node.id;
+        const seen = document.createElement('p');
+        seen.className = 'text-sm text-gray-400';
+        seen.textContent = `Last seen: ${lastSeen}s ago`;
+        info.append(name, seen);
+        if (node.telemetry) {
+            const health = document.createElement('p');
+            health.className = 'text-xs text-gray-400';
+            health.textContent = formatHealth(node.telemetry);
+            info.appendChild(health);
+        }
+        const distance = document.createElement('div');
+        distance.className = distanceClass;
+        distance.textContent = `${node.distance.toFixed(1)}km`;
+        nodeElement.append(info, distance);
+        nodesDiv.appendChild(nodeElement);
+    });
+
+    // Update network graph
+    if (networkChart && activeNodes > 0) {
+        const labels = networkChart.data.labels;
+        const data = networkChart.data.datasets[0].data;
+
+        if (labels.length > 10) {
+            labels.shift();
+            data.shift();
+        }
+
+        labels.push(new Date().toLocaleTimeString());
+        data.push(activeNodes);
+        networkChart.update();
+    }
+}
+
+socket.on('network_status', (status) => {
+    if (!status) return;
+    meshNodeId = status.node_id || 'N/A';
+    meshStream = status.stream || null;
+    meshNodes.clear();
+    status.nodes.forEach(storeNode);
+    renderNetwork(status.active_nodes || 0);
+});
+
+socket.on('network_delta', (delta) => {
+    delta.joined.forEach(storeNode);
+    delta.updated.forEach(storeNode);
+    delta.seen.forEach(id => {
+        const node = meshNodes.get(id);
+        if (node) node.seenAt = Date.now();
+    });
+    delta.left.forEach(id => meshNodes.delete(id));
+    renderNetwork(delta.active_nodes);
+});
+
+// Message handling
+// Per stream, the seq below which nothing is missing (sent back on reconnect, so
+// gaps are asked for again) and the seqs shown above it, as MessageHistory keeps them
+const chatMarks = {};
+const chatAhead = {};
+const MAX_AHEAD = 4096;  // Out-of-order seqs remembered per stream before giving up on a gap
+
+function markShown(stream, seq) {
+    let mark = chatMarks[stream] || 0;
+    const ahead = chatAhead[stream] || (chatAhead[stream] = new Set());
+    if (seq <= mark || ahead.has(seq)) return false;  // Already shown
+    ahead.add(seq);
+    if (seq === mark + 1 || ahead.size > MAX_AHEAD) {
+        if (seq !== mark + 1) mark = Math.min(...ahead) - 1;  // Too far behind: skip the gap
+        while (ahead.delete(mark + 1)) mark++;
+    }
+    chatMarks[stream] = mark;
+    return true;
+}
+
+function showMessage(data) {
+    if (data.stream !== undefined && !markShown(data.stream, data.seq)) return;
+    const messagesDiv = document.getElementById('chat-messages');
+    const messageElement = document.createElement('div');
+    const own = meshStream !== null && data.stream === meshStream;
+    messageElement.className = 'mb-2 p-2 rounded ' + 
+        (own ? 'bg-blue-900 ml-8' : 'bg-gray-600 mr-8');
+    messageElement.textContent = `${own ? 'You' : data.sender}: ${data.text}`;
+    messagesDiv.appendChild(messageElement);
+    messagesDiv.scrollTop = messagesDiv.scrollHeight;
+}
+
+socket.on('message', showMessage);
+
+socket.on('history', (history) => {
+    if (history.channel === 'chat') {
+        history.messages.forEach(showMessage);
+    }
+});
+
+// Send message
+document.getElementById('send-button').addEventListener('click', () => {
+    const input = document.getElementById('message-input');
+    const message = input.value.trim();
+    if (message) {
+        socket.emit('message', {
+            type: 'chat',
+            text: message
+        });
+        input.value = '';
+    }
+});
+
+// Enter key to send
+document.getElementById('message-input').addEventListener('keypress', (e) => {
+    if (e.key === 'Enter') {
+        document.getElementById('send-button').click();
+    }
+});
+
+// SOS handling
+document.getElementById('sos-button').addEventListener('click', () => {
+    if (confirm('Are you sure you want to send an SOS signal to all nodes?')) {
+        socket.emit('sos', {
+            type: 'sos',
+            timestamp: new Date().toISOString()
+        });
+        alert('SOS signal sent to all network nodes!');
+    }
+});
+
+// File handling
+document.getElementById('file-input').addEventListener('change', (e) => {
+    const files = Array.from(e.target.files);
+    if (files.length > 0) {
+        document.getElementById('selected-file').textContent = 
+            files.length === 1 ? files[0].name : `${files.length} files selected`;
+
+        // Show file list
+        const fileList = document.getElementById('file-list');
+        fileList.innerHTML = '';
+        files.forEach(file => {
+            const fileElement = document.createElement('div');
+            fileElement.className = 'flex justify-between items-center p-2 bg-gray-600 rounded';
+            fileElement.innerHTML = `
+                <span>${file.name}</span>
+                <span class="text-sm text-gray-400">${(file.size / 1024).toFixed(1)} KB</span>
+            `;
+            fileList.appendChild(fileElement);
+        });
+    }
+});
+
+// System status updates
+socket.on('system_status', (data) => {
+    document.getElementById('cpu-usage').textContent = `${data.cpu}%`;
+    document.getElementById('cpu-bar').style.width = `${data.cpu}%`;
+    document.getElementById('memory-usage').textContent = `${data.memory}%`;
+    document.getElementById('memory-bar').style.width = `${data.memory}%`;
+    const extra = [];
+    if (data.battery !== null) extra.push(`Battery: ${data.battery}%${data.plugged ? ' (charging)' : ''}`);
+    if (data.temperature !== null) extra.push(`Temp: ${data.temperature}°C`);
+    if (data.signal_dbm !== null) extra.push(`Signal: ${data.signal_dbm} dBm`);
+    document.getElementById('device-health').textContent = extra.join(' · ');
+});
+
+// Mesh and dashboard metrics (counters arrive as totals; rates are per update)
+let lastMetrics = null;
+let profilerRunning = false;
+
+function formatSeconds(histogram) {
+    if (!histogram || !histogram.count) return '-';
+    if (histogram.p99 === null) return '>1 s';
+    return histogram.p99 < 0.001 ? `${Math.round(histogram.p99 * 1e6)} µs` : `${Math.round(histogram.p99 * 1e3)} ms`;
+}
+
+function sum(values) {
+    return Object.values(values || {}).reduce((a, b) => a + b, 0);
+}
+
+socket.on('metrics', (data) => {
+    const m = data.metrics;
+    const now = Date.now();
+    const packetsIn = m.mesh_packets_in_total || 0;
+    const packetsOut = sum(m.mesh_packets_out_total);
+    if (lastMetrics) {
+        const seconds = (now - lastMetrics.time) / 1000;
+        const rateIn = Math.round((packetsIn - lastMetrics.packetsIn) / seconds);
+        const rateOut = Math.round((packetsOut - lastMetrics.packetsOut) / seconds);
+        document.getElementById('packet-rates').textContent = `${rateIn}/s · ${rateOut}/s`;
+    }
+    lastMetrics = {time: now, packetsIn, packetsOut};
+    document.getElementById('decode-errors').textContent = m.mesh_decode_errors_total || 0;
+    document.getElementById('send-drops').textContent = sum(m.mesh_send_dropped_total);
+    document.getElementById('handle-p99').textContent = formatSeconds(m.mesh_handle_seconds);
+    document.getElementById('flush-p99').textContent = formatSeconds(m.dashboard_flush_seconds);
+    setProfilerRunning(data.profiler.running);
+});
+
+function setProfilerRunning(running) {
+    profilerRunning = running;
+    document.getElementById('profiler-button').textContent = running ? 'Stop profiler' : 'Start profiler';
+}
+
+document.getElementById('profiler-button').addEventListener('click', () => {
+    socket.emit('profiler', {enabled: !profilerRunning});
+});
+
+socket.on('profile', (report) => {
+    setProfilerRunning(report.stats.running);
+    const list = document.getElementById('profile-top');
+    list.innerHTML = '';
+    if (report.stats.running) return;
+    report.top.forEach(entry => {
+        const item = document.createElement('li');
+        item.textContent = `${entry.self_pct}% ${entry.function}`;
+        list.appendChild(item);
+    });
+});
+
+// Location updates
+if ("geolocation" in navigator) {
+    navigator.geolocation.watchPosition((position) => {
+        socket.emit('update_location', {
+            lat: position.coords.latitude,
+            lon: position.coords.longitude
+        });
+    }, (error) => {
+        console.log("Error getting location:", error);
+    }, {
+        enableHighAccuracy: true,
+        maximumAge: 30000,
+        timeout: 27000
+    });
+}
+
+// Initialize network graph
+function initNetworkGraph() {
+    const ctx = document.getElementById('network-graph').getContext('2d');
+    networkChart = new Chart(ctx, {
+        type: 'line',
+        data: {
+            labels: [],
+            datasets: [{
+                label: 'Active Nodes',
+                data: [],
+                borderColor: 'rgb(59, 130, 246)',
+                tension: 0.4,
+                fill: false
+            }]
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            scales: {
+                y: {
+                    beginAtZero: true,
+                    grid: {
+                        color: 'rgba(255, 255, 255, 0.1)'
+                    },
+                    ticks: {
+                        color: '#9CA3AF'
+                    }
+                },
+                x: {
+                    grid: {
+                        color: 'rgba(255, 255, 255, 0.1)'
+                    },
+                    ticks: {
+                        color: '#9CA3AF'
+                    }
+                }
+            },
+            plugins: {
+                legend: {
+                    labels: {
+                        color: '#9CA3AF'
+                    }
+                }
+            }
+        }
+    });
+}
+
+// Initialize (the chart is optional: its CDN fallback may be unreachable offline)
+if (typeof Chart !== 'undefined') {
+    initNetworkGraph();
+}
+
+// Cache the dashboard for repeat and offline loads (needs localhost or HTTPS)
+if ('serviceWorker' in navigator) {
+    navigator.serviceWorker.register('/sw.js')
+        .catch(error => console.log('Service worker not registered:', error));
+}
+
+// Load QR code
+fetch('/qr')
+    .then(response => response.json())
+    .then(data => {
+        const qrDiv = document.getElementById('qr-code');
+        const img = document.createElement('img');
+        img.src = data.qr_url;
+        img.alt = 'Connection QR Code';
+        img.className = 'max-w-full h-auto';
+        qrDiv.innerHTML = '';
+        qrDiv.appendChild(img);
+    })
+    .catch(error => console.error('Error loading QR code:', error));
+
+function updateConnectionStatus(status) {
+    const statusElement = document.getElementById('connection-status');
+    switch(status) {
+        case 'initializing':
+            statusElement.className = 'px-3 py-1 rounded-full text-sm font-medium bg-blue-700';
+            statusElement.textContent = 'Starting BackSat Node...';
+            break;
+        case 'server_error':
+        case 'server_disconnected':
+            statusElement.className = 'px-3 py-1 rounded-full text-sm font-medium bg-yellow-700';
+            statusElement.textContent = 'Node Active (Standalone)';
+            break;
+        case 'server_connected':
+            statusElement.className = 'px-3 py-1 rounded-full text-sm font-medium bg-blue-700';
+            statusElement.textContent = 'Node Active';
+            break;
+        case 'mesh_connected':
+            statusElement.className = 'px-3 py-1 rounded-full text-sm font-medium bg-green-700';
+            statusElement.textContent = `Mesh Network Active`;
+            break;
+        case 'mesh_waiting':
+            statusElement.className = 'px-3 py-1 rounded-full text-sm font-medium bg-yellow-700';
+            statusElement.textContent = 'Searching for Other Nodes...';
+            break;
+        default:
+            statusElement.className = 'px-3 py-1 rounded-full text-sm font-medium bg-gray-700';
+            statusElement.textContent = 'Node Status Unknown';
+    }
+}
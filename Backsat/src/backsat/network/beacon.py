@@ -0,0 +1,90 @@
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class BeaconScheduler:
+    """Trickle-style discovery beacons (RFC 6206).
+
+    Each interval I sends one beacon at a random point in [I/2, I), which
+    keeps neighbours from synchronizing. A quiet interval doubles I up to
+    the maximum; a topology change (a neighbour joins or leaves, or we
+    move) resets it to IMIN so the neighbourhood converges quickly.
+
+    Trickle's redundancy suppression doesn't fit here because beacons are
+    also the liveness signal: a suppressed node would be expired by its
+    neighbours. Instead the maximum interval stretches with the number of
+    neighbours, keeping the total beacon rate of a crowded area roughly
+    constant. Since the interval keeps changing, each beacon advertises a
+    hold time: how long until MISSES more of our beacons could have been
+    lost, following the doubling schedule. Receivers use it as our timeout.
+    """
+
+    IMIN = 2.0  # Seconds; interval after a topology change
+    IMAX = 32.0  # Seconds; interval once the neighbourhood is stable
+    DENSITY_TARGET = 8  # Neighbours above which IMAX is stretched
+    MAX_STRETCH = 4  # Upper bound on that stretch
+    MISSES = 3  # Lost beacons the advertised hold time tolerates
+
+    def __init__(self, mesh, rng):
+        self.mesh = mesh
+        self.random = rng
+        self.interval = self.IMIN
+        self._interval_end = 0
+        self._epoch = 0  # Bumped on every new interval; stale timers check it
+        self.sent = 0
+        self.resets = 0
+
+    def max_interval(self):
+        stretch = min(self.MAX_STRETCH, max(1.0, len(self.mesh.nodes) / self.DENSITY_TARGET))
+        return self.IMAX * stretch
+
+    def hold_time(self):
+        """Seconds until the last beacon we could still send after MISSES losses"""
+        hold = max(0.0, self._interval_end - self.mesh.clock())
+        interval = self.interval
+        limit = self.max_interval()
+        for _ in range(self.MISSES + 1):
+            interval = min(interval * 2, limit)
+            hold += interval
+        return hold
+
+    def start(self):
+        self.interval = self.IMIN
+        self._begin()
+
+    def reset(self):
+        """Topology changed: go back to IMIN (engine loop only)"""
+        if self.interval > self.IMIN:
+            self.resets += 1
+            self.interval = self.IMIN
+            self._begin()
+
+    def _begin(self):
+        self._epoch += 1
+        self._interval_end = self.mesh.clock() + self.interval
+        engine = self.mesh.engine
+        engine.call_later(self.random.uniform(self.interval / 2, self.interval), self._fire, self._epoch)
+        engine.call_later(self.interval, self._end, self._epoch)
+
+    def _fire(self, epoch):
+        if epoch != self._epoch or not self.mesh.running:
+            return
+        try:
+            self.mesh._send_beacon()
+            self.sent += 1
+        except Exception as e:
+            logger.error(f"Error sending beacon: {e}")
+
+    def _end(self, epoch):
+        if epoch != self._epoch or not self.mesh.running:
+            return
+        self.interval = min(self.interval * 2, self.max_interval())
+        self._begin()
+
+    def get_stats(self):
+        return {
+            'interval': self.interval,
+            'max_interval': self.max_interval(),
+            'sent': self.sent,
+            'resets': self.resets
+        }
@@ -0,0 +1,216 @@
+import struct
+import threading
+import time
+from collections import OrderedDict
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey, X25519PublicKey
+from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from .wire import WireError, node_hash, ID_SIZE
+
+SEALED_MAGIC = 0xB6
+PUBKEY_SIZE = 32
+NONCE_SIZE = 12
+TAG_SIZE = 16
+
+_SEALED_HEADER = struct.Struct(f'!B{ID_SIZE}s')  # magic, sender node hash
+_NONCE = struct.Struct('!B3xQ')  # direction, per-peer send counter
+SEAL_OVERHEAD = _SEALED_HEADER.size + NONCE_SIZE + TAG_SIZE
+
+HKDF_INFO = b'backsat-session-v1'
+
+class KeyMismatch(WireError):
+    """Raised when a peer advertises a public key other than the one pinned for it"""
+
+class ReplayedFrame(WireError):
+    """Raised for a sealed datagram whose counter was already seen, or is too old to tell"""
+
+class ReplayWindow:
+    """Sliding bitmap of the counters accepted from one peer (as in IPsec/DTLS)"""
+
+    SIZE = 8192  # Sends may be reordered by the priority queues this far
+
+    def __init__(self, public_key):
+        self.public_key = public_key
+        self.top = -1
+        self.bits = 0  # Bit n set: counter top - n was accepted
+
+    def accept(self, counter):
+        """Record counter; False if it is a replay or older than the window"""
+        if counter > self.top:
+            shift = counter - self.top
+            self.bits = ((self.bits << shift) | 1) & ((1 << self.SIZE) - 1) if shift < self.SIZE else 1
+            self.top = counter
+            return True
+        offset = self.top - counter
+        if offset >= self.SIZE or self.bits >> offset & 1:
+            return False
+        self.bits |= 1 << offset
+        return True
+
+class SessionKeys:
+    """Per-peer AEAD session keys derived from an X25519 exchange.
+
+    Every node has an X25519 key pair for the life of the process and
+    advertises the public half in its discovery beacons, so the handshake
+    costs no extra packets: both sides run X25519 + HKDF-SHA256 over the
+    two public keys and end up with the same ChaCha20-Poly1305 key.
+
+    The first public key seen for a node ID is pinned (trust on first
+    use): a beacon advertising a different key for it raises KeyMismatch
+    instead of replacing the session, so a neighbour can't take over a
+    peer by claiming its name. The pin is dropped with forget() when the
+    peer expires from the node table. Default node IDs include the start
+    time, so a restarted node comes back as a new ID with a new key.
+
+    Derived cipher contexts are cached in a bounded LRU; peer public keys
+    are kept in a (larger) bounded table so an evicted context is simply
+    re-derived on next use. Both tables are shared by the ingress workers
+    and the engine loop and are guarded by one lock. Sealed datagrams are
+    magic | sender hash | nonce | ciphertext | tag, i.e. 37 bytes of
+    overhead with no base64 expansion.
+
+    The nonce is a direction byte plus a per-peer send counter, so the two
+    ends of a session never reuse each other's nonces, and the receiver
+    drops any counter its ReplayWindow for the peer has already seen.
+    Counters start at the monotonic clock in microseconds, so they keep
+    rising when a send counter is dropped and recreated. Replay windows
+    are keyed by the peer's public key and outlive forget(): a peer that
+    expires and comes back with the same key has the same session key,
+    and its old frames must stay dead.
+    """
+
+    MAX_CIPHERS = 256
+    MAX_PEERS = 4096
+
+    def __init__(self, node_id):
+        self.node_hash = node_hash(node_id)
+        self._private = X25519PrivateKey.generate()
+        self.public_key = self._private.public_key().public_bytes(
+            serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+        self._peer_keys = OrderedDict()  # {node hash: peer public key bytes}
+        self._ciphers = OrderedDict()  # {node hash: ChaCha20Poly1305}
+        self._counters = {}  # {node hash: next send counter}
+        self._windows = OrderedDict()  # {node hash: ReplayWindow}
+        self._lock = threading.Lock()
+        self.derivations = 0
+        self.mismatches = 0
+        self.replays = 0
+
+    def learn(self, peer_id, public_key):
+        """Pin a peer's advertised public key; returns True if it is new.
+
+        Raises KeyMismatch if a different key is already pinned for peer_id.
+        """
+        key = node_hash(peer_id)
+        if len(public_key) != PUBKEY_SIZE or key == self.node_hash:
+            return False
+        with self._lock:
+            pinned = self._peer_keys.get(key)
+            if pinned is not None:
+                if pinned != public_key:
+                    self.mismatches += 1
+                    raise KeyMismatch(f"Public key for {peer_id} differs from the pinned one")
+                self._peer_keys.move_to_end(key)
+                return False
+            self._peer_keys[key] = public_key
+            if len(self._peer_keys) > self.MAX_PEERS:
+                old, _ = self._peer_keys.popitem(last=False)
+                self._ciphers.pop(old, None)
+                self._counters.pop(old, None)
+        return True
+
+    def forget(self, peer_id):
+        """Drop a peer's pinned key and session, e.g. once it left the node table"""
+        key = node_hash(peer_id)
+        with self._lock:
+            self._peer_keys.pop(key, None)
+            self._ciphers.pop(key, None)
+            self._counters.pop(key, None)
+
+    def has_session(self, peer_id):
+        with self._lock:
+            return node_hash(peer_id) in self._peer_keys
+
+    def _cipher(self, key):
+        with self._lock:
+            cipher = self._ciphers.get(key)
+            if cipher is not None:
+                self._ciphers.move_to_end(key)
+                return cipher
+            public_key = self._peer_keys.get(key)
+        if public_key is None:
+            return None
+        # Derive outside the lock; two threads racing here just derive the same key twice
+        shared = self._private.exchange(X25519PublicKey.from_public_bytes(public_key))
+        salt = b''.join(sorted((self.public_key, public_key)))
+        session_key = HKDF(algorithm=hashes.SHA256(), length=32, salt=salt,
+                           info=HKDF_INFO).derive(shared)
+        cipher = ChaCha20Poly1305(session_key)
+        with self._lock:
+            self.derivations += 1
+            if self._peer_keys.get(key) != public_key:
+                return None  # Forgotten (or evicted) while we derived
+            self._ciphers[key] = cipher
+            if len(self._ciphers) > self.MAX_CIPHERS:
+                self._ciphers.popitem(last=False)
+        return cipher
+
+    def _direction(self, sender, receiver):
+        return 0 if sender < receiver else 1
+
+    def seal(self, peer_id, frame):
+        """Encrypt frame for peer_id; returns None when we have no key for it"""
+        key = node_hash(peer_id)
+        cipher = self._cipher(key)
+        if cipher is None:
+            return None
+        with self._lock:
+            counter = self._counters.get(key) or time.monotonic_ns() // 1000
+            self._counters[key] = counter + 1
+        header = _SEALED_HEADER.pack(SEALED_MAGIC, self.node_hash)
+        nonce = _NONCE.pack(self._direction(self.node_hash, key), counter)
+        return header + nonce + cipher.encrypt(nonce, frame, header)
+
+    def open(self, data):
+        """Decrypt a sealed datagram; raises WireError"""
+        if len(data) < SEAL_OVERHEAD:
+            raise WireError("Truncated sealed datagram")
+        header = data[:_SEALED_HEADER.size]
+        _, sender = _SEALED_HEADER.unpack(header)
+        cipher = self._cipher(sender)
+        if cipher is None:
+            raise WireError(f"No session key for {sender.hex()}")
+        nonce = data[_SEALED_HEADER.size:_SEALED_HEADER.size + NONCE_SIZE]
+        direction, counter = _NONCE.unpack(nonce)
+        if direction != self._direction(sender, self.node_hash):
+            raise WireError("Sealed datagram has the wrong direction")
+        try:
+            frame = cipher.decrypt(nonce, data[_SEALED_HEADER.size + NONCE_SIZE:], header)
+        except InvalidTag:
+            raise WireError("Sealed datagram failed authentication") from None
+        # Only authenticated counters may move the window
+        with self._lock:
+            public_key = self._peer_keys.get(sender)
+            if public_key is None:
+                raise WireError(f"No session key for {sender.hex()}")  # Forgotten meanwhile
+            window = self._windows.get(sender)
+            if window is None or window.public_key != public_key:
+                window = self._windows[sender] = ReplayWindow(public_key)
+                if len(self._windows) > self.MAX_PEERS:
+                    self._windows.popitem(last=False)
+            self._windows.move_to_end(sender)
+            if not window.accept(counter):
+                self.replays += 1
+                raise ReplayedFrame(f"Replayed sealed datagram from {sender.hex()}")
+        return frame
+
+    def get_stats(self):
+        return {
+            'peers': len(self._peer_keys),
+            'cached_ciphers': len(self._ciphers),
+            'derivations': self.derivations,
+            'key_mismatches': self.mismatches,
+            'replays': self.replays
+        }
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class MeshProtocol(asyncio.DatagramProtocol):
+    """Hands every datagram received on the mesh socket to the MeshNetwork"""
+
+    def __init__(self, mesh):
+        self.mesh = mesh
+
+    def datagram_received(self, data, addr):
+        self.mesh._on_datagram(data, addr)
+
+    def error_received(self, exc):
+        logger.error(f"Mesh socket error: {exc}")
+
+class MeshEngine:
+    """Runs beacons, the receive path and node expiry on one asyncio event loop.
+
+    The loop lives in a single daemon thread. Everything that touches the
+    mesh state runs on that thread; other threads (Flask, SocketIO) hand work
+    over with call_soon() or sendto(), which are thread-safe.
+    """
+
+    def __init__(self, mesh):
+        self.mesh = mesh
+        self.loop = asyncio.new_event_loop()
+        self.transport = None
+        self.thread = None
+        self._ready = threading.Event()
+        self._error = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='mesh-engine', daemon=True)
+        self.thread.start()
+        self._ready.wait()
+        if self._error:
+            raise self._error
+
+    def stop(self):
+        if self.thread is None or not self.thread.is_alive():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._setup())
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            if self.mesh.ingress:
+                self.loop.remove_reader(self.mesh.socket.fileno())
+            if self.transport:
+                self.transport.close()
+            # Let the transport's close callbacks run before shutting down
+            self.loop.run_until_complete(asyncio.sleep(0))
+            self.loop.close()
+
+    async def _setup(self):
+        if self.mesh.ingress:
+            # Batched mode: the ingress drains the socket itself, sends go out directly
+            self.mesh.socket.setblocking(False)
+            self.loop.add_reader(self.mesh.socket.fileno(), self.mesh.ingress.drain)
+        else:
+            self.transport, _ = await self.loop.create_datagram_endpoint(
+                lambda: MeshProtocol(self.mesh), sock=self.mesh.socket
+            )
+        self.schedule_timers()
+
+    def schedule_timers(self):
+        """Periodic mesh work; shared with the simulated engine"""
+        self.mesh.beacons.start()
+        self.every(self.mesh.CLEANUP_INTERVAL, self.mesh._expire_nodes)
+
+    def in_loop(self):
+        """True when called from the engine thread"""
+        return threading.current_thread() is self.thread
+
+    def every(self, interval, callback, delay=None):
+        """Run callback on the loop every interval seconds while the mesh is running"""
+        def tick():
+            if not self.mesh.running:
+                return
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error in mesh timer {getattr(callback, '__name__', callback)}: {e}")
+            self.call_later(interval, tick)
+
+        self.call_later(interval if delay is None else delay, tick)
+
+    def call_later(self, delay, callback, *args):
+        """Run callback once after delay seconds (engine thread only)"""
+        self.loop.call_later(delay, callback, *args)
+
+    def call_soon(self, callback, *args):
+        """Schedule callback on the loop from any thread"""
+        if self.in_loop():
+            self.loop.call_soon(callback, *args)
+        else:
+            self.loop.call_soon_threadsafe(callback, *args)
+
+    def sendto(self, data, addr):
+        """Send a datagram from any thread; delivery happens on the loop"""
+        if self.in_loop():
+            self._sendto(data, addr)
+        else:
+            self.loop.call_soon_threadsafe(self._sendto, data, addr)
+
+    def _sendto(self, data, addr):
+        try:
+            if self.transport is None:
+                self.mesh.socket.sendto(data, addr)
+            elif not self.transport.is_closing():
+                self.transport.sendto(data, addr)
+        except BlockingIOError:
+            logger.debug(f"Send buffer full, dropped datagram to {addr}")
+        except Exception as e:
+            logger.error(f"Error sending to {addr}: {e}")
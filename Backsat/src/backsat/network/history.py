@@ -0,0 +1,438 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CHANNELS = ('chat', 'sos')  # The only channels kept; a channel name is also a directory name
+MAX_DIGEST_CHANNELS = 64  # Channels accepted in one digest
+MAX_DIGEST_STREAMS = 1024  # Streams accepted per channel (MessageHistory.MAX_STREAMS)
+
+def clean_digest(digest):
+    """Check a digest received from a peer or client; returns it or raises ValueError"""
+    if digest is None:
+        return {}
+    if not isinstance(digest, dict) or len(digest) > MAX_DIGEST_CHANNELS:
+        raise ValueError("Digest must be a {channel: {stream: seq}} object")
+    for channel, marks in digest.items():
+        if not isinstance(marks, dict) or len(marks) > MAX_DIGEST_STREAMS:
+            raise ValueError(f"Marks for {channel!r} must be a {{stream: seq}} object")
+        for stream, seq in marks.items():
+            if type(seq) is not int or seq < 0:
+                raise ValueError(f"Mark for {stream!r} must be a non-negative integer")
+    return digest
+
+def _valid_entry(payload):
+    return (isinstance(payload, dict) and payload.get('channel') in CHANNELS and
+            isinstance(payload.get('stream'), str) and type(payload.get('seq')) is int and payload['seq'] > 0)
+
+class ChannelLog:
+    """One channel's recent messages: a ring capped by count and bytes.
+
+    Messages pushed out of the ring are appended to numbered JSON-lines
+    segments under spill_dir (oldest segments are deleted past
+    MAX_SEGMENTS), or dropped when there is no spill directory.
+    """
+
+    SEGMENT_MESSAGES = 1000  # Lines per segment file
+    MAX_SEGMENTS = 8  # Segments kept per channel
+
+    def __init__(self, name, max_messages, max_bytes, spill_dir=None):
+        self.name = name
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.ring = deque()  # [(payload, encoded size)]
+        self.bytes = 0
+        self.spill_dir = os.path.join(spill_dir, name) if spill_dir else None
+        self.spilled = {}  # {stream: highest seq on disk}
+        self._segment_lines = 0
+        self.spilled_count = 0
+        self.dropped = 0
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            for payload in self.read_spilled():
+                self._note_spilled(payload)
+            segments = self._segments()
+            if segments:
+                with open(segments[-1]) as f:
+                    self._segment_lines = sum(1 for _ in f)
+
+    def _segments(self):
+        names = sorted(name for name in os.listdir(self.spill_dir) if name.endswith('.jsonl'))
+        return [os.path.join(self.spill_dir, name) for name in names]
+
+    def _note_spilled(self, payload):
+        stream = payload['stream']
+        self.spilled[stream] = max(self.spilled.get(stream, 0), payload['seq'])
+
+    def append(self, payload):
+        size = len(json.dumps(payload, separators=(',', ':')))
+        self.ring.append((payload, size))
+        self.bytes += size
+        evicted = []
+        while len(self.ring) > self.max_messages or (self.bytes > self.max_bytes and len(self.ring) > 1):
+            old, old_size = self.ring.popleft()
+            self.bytes -= old_size
+            evicted.append(old)
+        if evicted:
+            self._spill(evicted)
+
+    def _spill(self, payloads):
+        if not self.spill_dir:
+            self.dropped += len(payloads)
+            return
+        try:
+            segments = self._segments()
+            if not segments or self._segment_lines >= self.SEGMENT_MESSAGES:
+                index = int(os.path.basename(segments[-1])[:-6]) + 1 if segments else 1
+                segments.append(os.path.join(self.spill_dir, f"{index:08d}.jsonl"))
+                self._segment_lines = 0
+            with open(segments[-1], 'a') as f:
+                for payload in payloads:
+                    f.write(json.dumps(payload, separators=(',', ':')) + '\n')
+            self._segment_lines += len(payloads)
+            self.spilled_count += len(payloads)
+            for payload in payloads:
+                self._note_spilled(payload)
+            for path in segments[:-self.MAX_SEGMENTS]:
+                os.remove(path)
+        except OSError as e:
+            self.dropped += len(payloads)
+            logger.error(f"Could not spill {self.name} history: {e}")
+
+    def read_spilled(self):
+        """Messages on disk, oldest first"""
+        if not self.spill_dir:
+            return
+        for path in self._segments():
+            with open(path) as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue  # Torn write from a crash
+
+    def missing(self, have, limit):
+        """The newest messages (up to limit, oldest first) above the marks in have"""
+        found = [payload for payload, _ in self.ring if payload['seq'] > have.get(payload['stream'], 0)]
+        if len(found) < limit and any(seq > have.get(stream, 0) for stream, seq in self.spilled.items()):
+            # Spilled messages are all older than the ring
+            older = [payload for payload in self.read_spilled()
+                     if payload['seq'] > have.get(payload['stream'], 0)]
+            found = older + found
+        return found[-limit:]
+
+class MessageHistory:
+    """Chat and SOS messages retained per channel for late joiners.
+
+    Each node numbers the messages it originates on a channel in its own
+    stream ("node_id@start time", so a restart opens a new sequence
+    instead of reusing one). For every stream a channel has seen, the history keeps a
+    high-water mark: the highest seq below which it holds no gaps. The
+    marks of all streams form a version vector, and anyone holding one can
+    be sent exactly the messages above it. Marks outlive the ring, so an
+    evicted message is never fetched again. Only CHANNELS are kept: peers
+    name the channel, and each one costs memory and a spill directory.
+    Safe to use from any thread.
+    """
+
+    MAX_MESSAGES = 500  # Per channel, in memory
+    MAX_BYTES = 256 * 1024  # Per channel, in memory
+    MAX_STREAMS = 1024  # Marks kept per channel; the oldest streams are forgotten
+    MAX_AHEAD = 4096  # Out-of-order seqs remembered per stream before giving up on a gap
+
+    def __init__(self, node_id, clock=time.time, spill_dir=None, max_messages=None, max_bytes=None):
+        self.clock = clock
+        self.stream = f"{node_id}@{int(clock())}"
+        self.spill_dir = spill_dir
+        self.max_messages = max_messages or self.MAX_MESSAGES
+        self.max_bytes = max_bytes or self.MAX_BYTES
+        self.channels = {}  # {name: ChannelLog}
+        self._marks = {}  # {channel: {stream: contiguous seq}}
+        self._ahead = {}  # {channel: {stream: set of seqs above the mark}}
+        self._seqs = {}  # {channel: last seq we stamped}
+        self._lock = threading.Lock()
+        if spill_dir and os.path.isdir(spill_dir):
+            for name in sorted(os.listdir(spill_dir)):
+                if name in CHANNELS and os.path.isdir(os.path.join(spill_dir, name)):
+                    log = self._channel(name)
+                    self._marks[name].update(log.spilled)
+
+    def _channel(self, name):
+        log = self.channels.get(name)
+        if log is None:
+            log = self.channels[name] = ChannelLog(name, self.max_messages, self.max_bytes, self.spill_dir)
+            self._marks[name] = {}
+            self._ahead[name] = {}
+        return log
+
+    def stamp(self, channel, payload):
+        """Copy of payload numbered as our next message on channel"""
+        if channel not in CHANNELS:
+            raise ValueError(f"Unknown history channel: {channel!r}")
+        with self._lock:
+            seq = self._seqs[channel] = self._seqs.get(channel, 0) + 1
+        return dict(payload, channel=channel, stream=self.stream, seq=seq, ts=self.clock())
+
+    def add(self, payload):
+        """Record a stamped message; returns False if it was already known or is malformed"""
+        if not _valid_entry(payload):
+            return False
+        channel, stream, seq = payload['channel'], payload['stream'], payload['seq']
+        with self._lock:
+            log = self._channel(channel)
+            marks = self._marks[channel]
+            ahead = self._ahead[channel].setdefault(stream, set())
+            mark = marks.get(stream, 0)
+            if seq <= mark or seq in ahead:
+                return False
+            if seq == mark + 1:
+                marks[stream] = self._advance(seq, ahead)
+            else:
+                ahead.add(seq)
+                if len(ahead) > self.MAX_AHEAD:
+                    # Too far behind to ever fill the gap: skip it
+                    marks[stream] = self._advance(min(ahead), ahead)
+                elif stream not in marks:
+                    marks[stream] = 0
+            if len(marks) > self.MAX_STREAMS:
+                oldest = next(iter(marks))
+                del marks[oldest]
+                self._ahead[channel].pop(oldest, None)
+            log.append(payload)
+            return True
+
+    @staticmethod
+    def _advance(mark, ahead):
+        ahead.discard(mark)
+        while mark + 1 in ahead:
+            mark += 1
+            ahead.discard(mark)
+        return mark
+
+    def skip_to(self, channel, stream, seq):
+        """Stop waiting for stream's messages up to seq; they are no longer available"""
+        if channel not in CHANNELS:
+            return
+        with self._lock:
+            self._channel(channel)
+            marks = self._marks[channel]
+            ahead = self._ahead[channel].setdefault(stream, set())
+            if seq > marks.get(stream, 0):
+                for old in [s for s in ahead if s <= seq]:
+                    ahead.discard(old)
+                marks[stream] = self._advance(seq, ahead)
+
+    def digest(self, channels=None):
+        """Version vector: {channel: {stream: contiguous seq}}"""
+        with self._lock:
+            return {name: dict(marks) for name, marks in self._marks.items()
+                    if channels is None or name in channels}
+
+    def missing(self, digest, limit, channels=None):
+        """{channel: messages above digest's marks}, at most limit per channel, oldest first"""
+        with self._lock:
+            logs = [log for name, log in self.channels.items() if channels is None or name in channels]
+            return {log.name: log.missing(digest.get(log.name, {}), limit) for log in logs}
+
+    def get_stats(self):
+        with self._lock:
+            return {name: {
+                'messages': len(log.ring),
+                'bytes': log.bytes,
+                'streams': len(self._marks[name]),
+                'spilled': log.spilled_count,
+                'dropped': log.dropped
+            } for name, log in self.channels.items()}
+
+class HistorySync:
+    """Late-joiner catch-up between neighbours, driven by version vectors.
+
+    When a neighbour appears we send it our digest, after a random delay
+    so that when several appear at once the later requests already
+    reflect the first answers. A digest can hold up to 1024 streams per
+    channel, so it travels split into parts of at most DIGEST_BYTES of
+    marks each; the neighbour reassembles them (a few requests at a time,
+    for PENDING_TIMEOUT) before answering, since a part on its own would
+    read as "have nothing" for every stream it leaves out. The neighbour
+    replies with only
+    the messages above our marks, newest SYNC_LIMIT per channel, packed a
+    few to a datagram; when it had to leave older ones out it also sends a
+    floor per stream so we stop asking for them. A floor moves our marks
+    past messages for good, so it is taken in full only from the stream's
+    owner, and from anyone else only up to the mark that peer advertised
+    in its own digest. Synced messages are delivered locally and never
+    re-flooded. Runs on the engine loop.
+    """
+
+    SYNC_LIMIT = 100  # Messages per channel per sync
+    BATCH_BYTES = 1000  # Encoded payload bytes per history_entries datagram
+    SYNC_JITTER = 2.0  # Seconds; spreads requests so later ones carry an updated digest
+    DIGEST_BYTES = 1000  # Encoded marks per history_digest datagram
+    MAX_PARTS = 64  # Digest parts per request; marks beyond that are left out
+    MAX_PENDING = 16  # Partly received digests kept
+    PENDING_TIMEOUT = 30  # Seconds to wait for the rest of a digest
+    MAX_ADVERTISED = 256  # Peers whose last digest is remembered to bound their floors
+
+    def __init__(self, mesh, history):
+        self.mesh = mesh
+        self.history = history
+        self._pending = {}  # {(node_id, request id): (first seen, parts, {part: digest})}
+        self._advertised = {}  # {node_id: its last whole digest}
+        self.requested = 0
+        self.sent = 0
+        self.received = 0
+        self.rejected = 0
+
+    def peer_appeared(self, node_id):
+        delay = self.mesh.transport.random.uniform(0, self.SYNC_JITTER)
+        self.mesh.engine.call_later(delay, self._request, node_id)
+
+    def _request(self, node_id):
+        if not self.mesh.running:
+            return
+        self.requested += 1
+        parts = self._split(self.history.digest())
+        request_id = os.urandom(4).hex()
+        for index, part in enumerate(parts):
+            self.mesh.send_to_node(node_id, {
+                'type': 'history_digest',
+                'from': self.mesh.node_id,
+                'id': request_id,
+                'part': index,
+                'parts': len(parts),
+                'digest': part
+            })
+
+    def _split(self, digest):
+        """Digest as a list of sub-digests of about DIGEST_BYTES encoded marks each"""
+        parts, part, size = [], {}, 0
+        for channel, marks in digest.items():
+            for stream, seq in marks.items():
+                cost = len(json.dumps(stream)) + len(str(seq)) + 2
+                if size + cost > self.DIGEST_BYTES and part:
+                    parts.append(part)
+                    part, size = {}, 0
+                if channel not in part:
+                    part[channel] = {}
+                    size += len(json.dumps(channel)) + 4
+                part[channel][stream] = seq
+                size += cost
+        parts.append(part)
+        if len(parts) > self.MAX_PARTS:
+            logger.warning(f"History digest needs {len(parts)} datagrams, sending {self.MAX_PARTS}")
+        return parts[:self.MAX_PARTS]
+
+    def handle(self, message, addr):
+        if message['type'] == 'history_digest':
+            try:
+                digest = clean_digest(message.get('digest'))
+            except ValueError as e:
+                self.rejected += 1
+                logger.warning(f"Ignoring history digest from {message.get('from')}: {e}")
+                return
+            digest = self._reassemble(message, digest)
+            if digest is not None:
+                self._advertise(message['from'], digest)
+                self._answer(message['from'], digest)
+        elif message['type'] == 'history_entries':
+            self._receive(message)
+
+    def _reassemble(self, message, digest):
+        """The whole digest once every part of it has arrived, else None"""
+        parts, index = message.get('parts', 1), message.get('part', 0)
+        if parts == 1:
+            return digest
+        if type(parts) is not int or type(index) is not int or not 0 <= index < parts <= self.MAX_PARTS:
+            self.rejected += 1
+            return None
+        now = self.mesh.clock()
+        for key in [key for key, (seen, _, _) in self._pending.items()
+                    if now - seen > self.PENDING_TIMEOUT]:
+            del self._pending[key]
+        key = (message['from'], message.get('id'))
+        if key not in self._pending:
+            if len(self._pending) >= self.MAX_PENDING:
+                del self._pending[next(iter(self._pending))]
+            self._pending[key] = (now, parts, {})
+        _, expected, received = self._pending[key]
+        if expected != parts:
+            return None
+        received[index] = digest
+        if len(received) < parts:
+            return None
+        del self._pending[key]
+        merged = {}
+        for part in received.values():
+            for channel, marks in part.items():
+                merged.setdefault(channel, {}).update(marks)
+        return merged
+
+    def _advertise(self, node_id, digest):
+        self._advertised.pop(node_id, None)
+        if len(self._advertised) >= self.MAX_ADVERTISED:
+            del self._advertised[next(iter(self._advertised))]
+        self._advertised[node_id] = digest
+
+    def _answer(self, node_id, digest):
+        for channel, payloads in self.history.missing(digest, self.SYNC_LIMIT).items():
+            if not payloads:
+                continue
+            floor = self._floor(payloads, digest.get(channel, {}))
+            batch, size = [], 0
+            for payload in payloads:
+                batch.append(payload)
+                size += len(json.dumps(payload, separators=(',', ':')))
+                if size >= self.BATCH_BYTES:
+                    self._send(node_id, channel, batch, floor)
+                    batch, size = [], 0
+            if batch:
+                self._send(node_id, channel, batch, floor)
+
+    @staticmethod
+    def _floor(payloads, have):
+        """Per stream, the seq just below the oldest one sent, if that leaves a gap"""
+        first = {}
+        for payload in payloads:
+            stream = payload['stream']
+            first[stream] = min(first.get(stream, payload['seq']), payload['seq'])
+        return {stream: seq - 1 for stream, seq in first.items() if seq - 1 > have.get(stream, 0)}
+
+    def _send(self, node_id, channel, payloads, floor):
+        self.sent += len(payloads)
+        self.mesh.send_to_node(node_id, {
+            'type': 'history_entries',
+            'from': self.mesh.node_id,
+            'channel': channel,
+            'entries': payloads,
+            'floor': floor
+        })
+
+    def _receive(self, message):
+        channel = message['channel']
+        floor, entries = message.get('floor') or {}, message.get('entries') or []
+        if not isinstance(channel, str) or not isinstance(floor, dict) or not isinstance(entries, list):
+            self.rejected += 1
+            return
+        sender = message.get('from')
+        advertised = self._advertised.get(sender, {}).get(channel, {})
+        for stream, seq in floor.items():
+            if not isinstance(stream, str) or type(seq) is not int:
+                continue
+            if stream.rsplit('@', 1)[0] != sender:
+                seq = min(seq, advertised.get(stream, 0))
+            if seq > 0:
+                self.history.skip_to(channel, stream, seq)
+        for payload in entries:
+            if not _valid_entry(payload) or payload.get('channel') != channel:
+                continue
+            origin = payload['stream'].rsplit('@', 1)[0]
+            if self.mesh._deliver(payload, {'origin': origin, 'hops': None, 'synced': True}):
+                self.received += 1
+
+    def get_stats(self):
+        return {'requested': self.requested, 'sent': self.sent, 'received': self.received,
+                'rejected': self.rejected}
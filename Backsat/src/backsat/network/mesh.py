@@ -1,61 +1,147 @@
+import base64
+import os
 import socket
-import json
-import threading
 import time
 import math
 from datetime import datetime
-from cryptography.fernet import Fernet
+from .ingress import BatchedIngress
+from .scheduler import OutboundScheduler, classify, PRIORITY_CONTROL, PRIORITY_BULK, PRIORITY_NAMES
+from .spatial import SpatialIndex, GeoPoint
+from .routing import MeshRouter
+from .transfer import FileTransferManager
+from .history import MessageHistory, HistorySync
+from .transport import UDPTransport, BROADCAST
+from .beacon import BeaconScheduler
+from .registry import NodeRegistry, PeerRecord
+from .crypto import SessionKeys, KeyMismatch, ReplayedFrame, SEALED_MAGIC
+from .wire import WireCodec, WireError, UnknownNode, node_hash, ID_SIZE, MAGIC, CODEC_BINARY, CODEC_JSON
 from ..utils.logger import get_logger
+from ..utils.metrics import MetricsRegistry
 
 logger = get_logger(__name__)
 
 class MeshNetwork:
-    def __init__(self, start_port=5000, max_range_km=3):
-        self.start_port = start_port
-        self.port = self._find_available_port()
-        self.nodes = {}  # {node_id: {'ip': ip, 'port': port, 'last_seen': timestamp, 'distance': km}}
-        self.node_id = self._generate_node_id()
-        self.encryption_key = Fernet.generate_key()
-        self.fernet = Fernet(self.encryption_key)
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.bind(('0.0.0.0', self.port))
+    NODE_TIMEOUT = 30  # Seconds without a beacon before dropping a peer that has no hold time
+    MIN_NODE_TIMEOUT = 10  # Lower bound on per-peer timeouts
+    TIMEOUT_FACTOR = 6  # Timeout in observed beacon intervals, for peers without a hold time
+    CLEANUP_INTERVAL = 1  # Seconds per expiry timer wheel tick
+    NAME_EVERY = 3  # Binary beacons carry the full node ID every Nth beacon
+    PROBE_INTERVAL = 5  # Seconds between probes of a known peer's new beacon address
+    # Beacon health fields and their bounds; anything else a peer sends is dropped
+    TELEMETRY_BOUNDS = {'cpu': (0, 100), 'memory': (0, 100), 'battery': (0, 100), 'temp': (-127, 127)}
+
+    def __init__(self, start_port=5000, max_range_km=3, ingress_mode='direct',
+                 ingress_workers=2, ingress_queue_size=4096, wire_format='binary',
+                 download_dir=None, node_id=None, transport=None, link_mode='broadcast',
+                 interfaces=None, history_dir=None, send_mode='scheduled', metrics=None,
+                 telemetry=None):
+        if transport is None:
+            if link_mode not in ('multicast', 'broadcast'):
+                raise ValueError(f"Unknown link mode: {link_mode}")
+            if link_mode == 'multicast':
+                try:
+                    from .multicast import MulticastTransport  # Needs netifaces
+                    transport = MulticastTransport(start_port, interfaces)
+                except ImportError as e:
+                    logger.warning(f"Multicast link mode unavailable ({e}), using broadcast")
+            if transport is None:
+                transport = UDPTransport(start_port)
+        self.transport = transport
+        self.port = self.transport.port
+        self.socket = self.transport.socket  # None for simulated and multicast transports
+        self.clock = self.transport.clock
+        self.registry = NodeRegistry(self.clock, tick=self.CLEANUP_INTERVAL)
+        self.node_id = node_id or self._generate_node_id()
+        if wire_format not in ('binary', 'json'):
+            raise ValueError(f"Unknown wire format: {wire_format}")
+        self.wire_format = wire_format
+        self.codec = WireCodec(self.node_id)
+        self.sessions = SessionKeys(self.node_id)  # Per-peer AEAD keys; everything but beacons is sealed
+        self._beacon_count = 0
+        self._probed = {}  # {node_id: last probe time}
+        self.beacons = BeaconScheduler(self, self.transport.random)
+        self.engine = None
+        self.ingress = None
+        if ingress_mode == 'batched':
+            if self.socket is None:
+                raise ValueError("Batched ingress needs a single-socket transport")
+            self.ingress = BatchedIngress(self, workers=ingress_workers,
+                                          queue_size=ingress_queue_size)
+        elif ingress_mode != 'direct':
+            raise ValueError(f"Unknown ingress mode: {ingress_mode}")
+        if send_mode not in ('scheduled', 'direct'):
+            raise ValueError(f"Unknown send mode: {send_mode}")
+        self.send_mode = send_mode
+        self.scheduler = None  # Created on start: multicast sends go through the engine
         self.running = False
         self.max_range_km = max_range_km
         self.location = None  # Will be updated with GPS coordinates if available
-        
-    def _find_available_port(self):
-        """Find first available port starting from start_port"""
-        port = self.start_port
-        max_port = self.start_port + 100  # Try up to 100 ports
-        
-        while port < max_port:
-            try:
-                with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
-                    s.bind(('0.0.0.0', port))
-                    return port
-            except OSError:
-                port += 1
-        
-        raise RuntimeError(f"No available ports found between {self.start_port} and {max_port}")
+        self._origin = None  # GeoPoint for self.location
+        self.spatial = SpatialIndex()  # Peers that advertised a location
+        self.router = MeshRouter(self)
+        self.message_handlers = []  # Called with (payload, envelope) for routed messages
+        self.change_listeners = []  # Called with (event, node_id) when the node table changes
+        self.transfers = FileTransferManager(
+            self, download_dir or os.path.join(os.path.dirname(__file__), 'data', 'downloads'))
+        self.history = MessageHistory(self.node_id, self.clock, spill_dir=history_dir)
+        self.history_sync = HistorySync(self, self.history)
+        self.telemetry = telemetry  # Optional callable: compact health dict to piggyback on beacons
+        self.metrics = metrics or MetricsRegistry()
+        self._register_metrics()
+
+    def _register_metrics(self):
+        """Hot-path counters, plus callbacks reading the stats components already keep"""
+        m = self.metrics
+        self._packets_in = m.counter('mesh_packets_in_total', "Datagrams received")
+        self._bytes_in = m.counter('mesh_bytes_in_total', "Bytes received")
+        self._decode_errors = m.counter('mesh_decode_errors_total', "Datagrams that failed to decrypt or decode")
+        self._handle_seconds = m.histogram('mesh_handle_seconds', "Time to handle one decoded message")
+        packets_out = m.counter('mesh_packets_out_total', "Datagrams sent, by priority class", ('class',))
+        bytes_out = m.counter('mesh_bytes_out_total', "Bytes sent, by priority class", ('class',))
+        self._packets_out = [packets_out.labels(name) for name in PRIORITY_NAMES]
+        self._bytes_out = [bytes_out.labels(name) for name in PRIORITY_NAMES]
+        m.collect('mesh_peers', "Directly reachable peers", lambda: len(self.nodes))
+        m.collect('mesh_send_queued', "Datagrams waiting in the send scheduler",
+                  lambda: self.get_send_stats()['queued'], labels=('class',))
+        m.collect('mesh_send_dropped_total', "Datagrams dropped by a full send queue",
+                  lambda: self.get_send_stats()['dropped'], kind='counter', labels=('class',))
+        m.collect('mesh_send_throttled_total', "Times a peer's rate limit held back a datagram",
+                  lambda: self.get_send_stats()['throttled'], kind='counter')
+        m.collect('mesh_sos_queue_wait_max_seconds', "Longest time an SOS waited to be sent",
+                  lambda: self.get_send_stats()['sos_wait_max'])
+        m.collect('mesh_ingress_dropped_total', "Datagrams dropped by a full receive queue",
+                  lambda: self.get_ingress_stats()['dropped'], kind='counter')
+        m.collect('mesh_routed_total', "Routed messages, by outcome",
+                  lambda: {event: count for event, count in self.router.get_stats().items()
+                           if event in ('originated', 'delivered', 'forwarded', 'duplicates')},
+                  kind='counter', labels=('event',))
         
     def _generate_node_id(self):
         return f"node_{socket.gethostname()}_{int(time.time())}"
         
     def start(self):
         self.running = True
-        self.discovery_thread = threading.Thread(target=self._node_discovery)
-        self.listen_thread = threading.Thread(target=self._listen)
-        self.cleanup_thread = threading.Thread(target=self._cleanup_inactive_nodes)
-        
-        self.discovery_thread.start()
-        self.listen_thread.start()
-        self.cleanup_thread.start()
+        self.engine = self.transport.create_engine(self)
+        self.engine.start()
+        if self.send_mode == 'scheduled':
+            send = self.socket.sendto if self.socket is not None else self.engine.sendto
+            self.scheduler = OutboundScheduler(self.socket, send)
+            self.scheduler.start()
+        self.transfers.start()
+        if self.ingress:
+            self.ingress.start()
         
         logger.info(f"Mesh node started with ID: {self.node_id} on port {self.port}")
         
     def stop(self):
         self.running = False
-        self.socket.close()
+        if self.scheduler:
+            self.scheduler.stop()
+        if self.engine:
+            self.engine.stop()
+        if self.ingress:
+            self.ingress.stop()
+        self.transport.close()
         logger.info("Mesh network stopped")
         
     def _calculate_distance(self, lat1, lon1, lat2, lon2):
@@ -72,104 +158,505 @@ class MeshNetwork:
         c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
         return R * c
         
-    def _cleanup_inactive_nodes(self):
-        """Remove nodes that haven't been seen in the last 30 seconds"""
-        while self.running:
-            current_time = time.time()
-            inactive_nodes = []
+    @property
+    def nodes(self):
+        """Read-only snapshot {node_id: PeerRecord}; safe to iterate from any thread"""
+        return self.registry.snapshot()
+        
+    def _expire_nodes(self):
+        """Remove nodes that missed their per-peer timeout (runs on the engine loop)"""
+        inactive_nodes = self.registry.expire()
+        for node_id in inactive_nodes:
+            self.spatial.remove(node_id)
+            self.sessions.forget(node_id)
+            self._probed.pop(node_id, None)
+            logger.info(f"Node {node_id} removed due to inactivity")
+            self._notify('left', node_id)
+        if inactive_nodes:
+            self._topology_changed()
             
-            for node_id, info in self.nodes.items():
-                if current_time - info['last_seen'] > 30:  # 30 seconds timeout
-                    inactive_nodes.append(node_id)
-                    
-            for node_id in inactive_nodes:
-                del self.nodes[node_id]
-                logger.info(f"Node {node_id} removed due to inactivity")
-                
-            time.sleep(5)  # Check every 5 seconds
+    def _topology_changed(self):
+        """Beacon quickly again, starting with a named one"""
+        self._beacon_count = 0
+        self._probed = {}  # {node_id: last probe time}
+        self.beacons.reset()
             
-    def _node_discovery(self):
-        while self.running:
-            discovery_message = {
-                'type': 'discovery',
-                'node_id': self.node_id,
-                'port': self.port,
-                'timestamp': time.time(),
-                'location': self.location
-            }
-            self._broadcast_message(discovery_message)
-            time.sleep(5)  # Send beacon every 5 seconds
+    def _peer_timeout(self, previous, hold, now):
+        """Size a peer's timeout from its hold time, else from its observed beacon interval"""
+        interval = None
+        if previous:
+            # Smoothed inter-arrival time, but never below the latest gap
+            gap = now - previous.last_seen
+            interval = gap if previous.interval is None else max(gap, 0.75 * previous.interval + 0.25 * gap)
+        if hold:
+            return interval, max(self.MIN_NODE_TIMEOUT, hold)
+        if interval is None:
+            return None, self.NODE_TIMEOUT
+        return interval, max(self.NODE_TIMEOUT, self.TIMEOUT_FACTOR * interval)
             
-    def _listen(self):
-        while self.running:
-            try:
-                data, addr = self.socket.recvfrom(4096)
-                message = json.loads(data.decode())
-                self._handle_message(message, addr)
-            except Exception as e:
-                logger.error(f"Error while listening: {e}")
+    def _send_beacon(self):
+        """Broadcast a discovery beacon (runs on the engine loop)
+
+        Binary nodes send the compact beacon, plus a JSON one while any
+        neighbour has only advertised JSON support.
+        """
+        timestamp = self.clock()
+        send_json = self.wire_format == 'json'
+        if self.wire_format == 'binary':
+            include_name = self._beacon_count % self.NAME_EVERY == 0
+            self._broadcast(self.codec.encode_beacon(
+                self.port, timestamp, self.location, include_name=include_name,
+                public_key=self.sessions.public_key if include_name else None,
+                hold=self.beacons.hold_time(), telemetry=self._telemetry()))
+            send_json = any(info.codec == CODEC_JSON for info in self.nodes.values())
+        self._beacon_count += 1
+        if send_json:
+            self._broadcast_message(self._json_beacon(timestamp))
+            
+    def _json_beacon(self, timestamp):
+        return {
+            'type': 'discovery',
+            'node_id': self.node_id,
+            'port': self.port,
+            'timestamp': timestamp,
+            'location': self.location,
+            'codecs': [CODEC_BINARY, CODEC_JSON] if self.wire_format == 'binary' else [CODEC_JSON],
+            'pubkey': base64.b64encode(self.sessions.public_key).decode(),
+            'hold': self.beacons.hold_time(),
+            'telemetry': self._telemetry()
+        }
+
+    def _telemetry(self):
+        if self.telemetry is None:
+            return None
+        try:
+            return self.telemetry()
+        except Exception as e:
+            logger.error(f"Error reading telemetry: {e}")
+            return None
+
+    @classmethod
+    def _clean_telemetry(cls, telemetry):
+        """A peer's beacon health as bounded ints (None when unknown or malformed)"""
+        if not isinstance(telemetry, dict):
+            return None
+        clean = {}
+        for field, (low, high) in cls.TELEMETRY_BOUNDS.items():
+            value = telemetry.get(field)
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+                clean[field] = min(high, max(low, round(value)))
+            else:
+                clean[field] = None
+        return clean
+            
+    def _send_hello(self, node_id):
+        """Unicast a full beacon (name and public key) to one peer"""
+        info = self.nodes[node_id]
+        if self._peer_codec(info) == CODEC_BINARY:
+            frame = self.codec.encode_beacon(self.port, self.clock(), self.location,
+                                             include_name=True, public_key=self.sessions.public_key,
+                                             hold=self.beacons.hold_time(), telemetry=self._telemetry())
+        else:
+            frame = self.codec.encode_json(self._json_beacon(self.clock()))
+        self._sendto(frame, info.addr)
+            
+    def _on_datagram(self, data, addr, link=None):
+        """Decode and dispatch one received datagram (runs on the engine loop)
+
+        link identifies the interface it arrived on, for transports that
+        track several paths per peer.
+        """
+        self._packets_in.inc()
+        self._bytes_in.inc(len(data))
+        try:
+            message, sender = self._decode(data)
+        except UnknownNode:
+            return  # Learned from the next beacon that carries the full ID
+        except ReplayedFrame as e:
+            self._decode_errors.inc()
+            logger.debug(f"Dropped datagram from {addr[0]}: {e}")
+            return
+        except WireError as e:
+            self._decode_errors.inc()
+            logger.error(f"Error decoding datagram from {addr[0]}: {e}")
+            return
+        started = time.perf_counter()
+        self._handle_message(message, self._heard(message, sender, addr, link), sender)
+        self._handle_seconds.observe(time.perf_counter() - started)
+
+    def _heard(self, message, sender, addr, link=None):
+        """Tell the transport who a decoded frame came from; returns the address to know them by"""
+        if sender is None:
+            sender = node_hash(str(message['node_id']))  # A beacon: claimed, not authenticated
+            return self.transport.heard(sender, addr, link, authenticated=False)
+        addr = self.transport.heard(sender, addr, link, authenticated=True)
+        self._follow(sender, addr)
+        return addr
+
+    def _follow(self, sender, addr):
+        """A sealed frame proves where its sender is now: move a known peer to that address"""
+        try:
+            node_id = self.codec.lookup(sender)
+        except UnknownNode:
+            return
+        record = self.nodes.get(node_id)
+        if record is not None and record.addr != (addr[0], addr[1]):
+            self.registry.move(node_id, addr[0], addr[1])
+            logger.info(f"Node {node_id} moved to {addr[0]}:{addr[1]}")
+            self._notify('updated', node_id)
+
+    def _probe(self, node_id, addr):
+        """Ask a known peer to confirm, sealed, a new address its beacons came from"""
+        now = self.clock()
+        if now - self._probed.get(node_id, -self.PROBE_INTERVAL) < self.PROBE_INTERVAL:
+            return
+        self._probed[node_id] = now
+        sealed = self._encrypt(node_id, self._encode(self._peer_codec(self.nodes[node_id]),
+                                                     {'type': 'probe'}))
+        if sealed is not None:
+            self._sendto(sealed, addr)
+        
+    def _decode(self, data):
+        """Decrypt (if sealed) and decode a datagram; returns (message, sealer hash or None)
+
+        Raises WireError.
+
+        Only discovery beacons travel in the clear. Everything else must
+        arrive sealed with a peer's session key, which is what
+        authenticates the sender, so unsealed frames of any other type are
+        dropped here, before they reach a handler. A 'from' claim (file
+        offers, history digests), and the header of a sealed binary frame,
+        must name the node that sealed it.
+        """
+        sender = None
+        if data[:1] == bytes([SEALED_MAGIC]):
+            sender = data[1:1 + ID_SIZE]
+            data = self.sessions.open(data)
+            if data[:1] == bytes([MAGIC]) and data[4:4 + ID_SIZE] != sender:
+                raise WireError("Binary frame names a sender other than its sealer")
+        message = self.codec.decode(data)
+        if sender is None and message['type'] != 'discovery':
+            raise WireError(f"Unsealed {message['type']!r} datagram dropped")
+        if 'from' in message and node_hash(str(message['from'])) != sender:
+            raise WireError("Message claims to be from a node other than its sealer")
+        return message, sender
+        
+    def _dispatch_batch(self, messages):
+        """Handle a batch of already-decoded (message, sender, addr) triples (runs on the engine loop)"""
+        for message, sender, addr in messages:
+            started = time.perf_counter()
+            self._handle_message(message, self._heard(message, sender, addr), sender)
+            self._handle_seconds.observe(time.perf_counter() - started)
                 
-    def _handle_message(self, message, addr):
+    def _sendto(self, data, addr, priority=PRIORITY_CONTROL):
+        self._packets_out[priority].inc()
+        self._bytes_out[priority].inc(len(data))
+        if self.scheduler and self.scheduler.running:
+            self.scheduler.submit(data, addr, priority)
+        elif self.engine:
+            self.engine.sendto(data, addr)
+        else:
+            self.transport.sendto(data, addr)
+            
+
+    def _handle_message(self, message, addr, sender=None):
         try:
-            if message['type'] == 'discovery':
+            if message['type'] == 'routed':
+                self.router.handle(message, addr)
+            elif message['type'] in ('file_chunk', 'file_ack', 'file_offer'):
+                self.transfers.handle(message, addr, sender)
+            elif message['type'] in ('history_digest', 'history_entries'):
+                self.history_sync.handle(message, addr)
+            elif message['type'] == 'probe':
+                # _follow() has moved the prober to where the probe came from; answer there
+                self.send_to_node(self.codec.lookup(sender), {'type': 'probe_ack'})
+            elif message['type'] == 'probe_ack':
+                pass  # _follow() already acted on it
+            elif message['type'] == 'discovery':
                 node_id = message['node_id']
                 if node_id != self.node_id:
                     distance = 0
-                    if self.location and message.get('location'):
-                        distance = self._calculate_distance(
-                            self.location['lat'], self.location['lon'],
-                            message['location']['lat'], message['location']['lon']
-                        )
+                    point = None
+                    location = message.get('location')
+                    if location:
+                        point = self.spatial.point_for(node_id, location['lat'], location['lon'])
+                        origin = self._origin
+                        if origin:
+                            distance = origin.distance_to(point)
                         
                     # Only add node if within range
                     if distance <= self.max_range_km:
-                        self.nodes[node_id] = {
-                            'ip': addr[0],
-                            'port': message['port'],
-                            'last_seen': time.time(),
-                            'distance': distance
-                        }
-                        logger.info(f"Node {node_id} at {distance:.1f}km updated")
+                        if point:
+                            self.spatial.update(node_id, point)
+                        else:
+                            self.spatial.remove(node_id)
+                        previous = self.nodes.get(node_id)
+                        is_new = previous is None
+                        public_key = message.get('pubkey')
+                        new_key = False
+                        if public_key:
+                            if isinstance(public_key, str):
+                                public_key = base64.b64decode(public_key)
+                            try:
+                                new_key = self.sessions.learn(node_id, public_key)
+                            except KeyMismatch as e:
+                                logger.warning(f"Ignoring beacon from {addr[0]}: {e}")
+                                return
+                        telemetry = self._clean_telemetry(message.get('telemetry'))
+                        now = self.clock()
+                        interval, timeout = self._peer_timeout(previous, message.get('hold'), now)
+                        # Peers that never advertised codecs run the JSON-only format
+                        codec = CODEC_BINARY if CODEC_BINARY in message.get('codecs', ()) else CODEC_JSON
+                        health_changed = (previous is not None and telemetry is not None and
+                                          telemetry != previous.telemetry)
+                        ip, port = addr[0], message['port']
+                        if not is_new and previous.addr != (ip, port):
+                            # Anyone can send a beacon in a known peer's name: only a sealed
+                            # reply from the new address moves the peer (see _follow)
+                            self._probe(node_id, (ip, port))
+                            ip, port = previous.ip, previous.port
+                        self.codec.learn(node_id)
+                        self.registry.update(PeerRecord(node_id, ip, port, distance,
+                                                        codec, now, interval, timeout, telemetry))
+                        moved = not is_new and previous.distance != distance
+                        if is_new:
+                            logger.info(f"Node {node_id} joined at {distance:.1f}km")
+                            self._notify('joined', node_id)
+                            self._topology_changed()
+                        elif moved or health_changed:
+                            if moved:
+                                logger.info(f"Node {node_id} moved to {distance:.1f}km")
+                            self._notify('updated', node_id)
+                        else:
+                            logger.debug(f"Node {node_id} at {distance:.1f}km seen")
+                            self._notify('seen', node_id)
+                        if new_key:
+                            # Handshake reply: make sure the peer has our key before we use theirs
+                            self._send_hello(node_id)
+                        if is_new:
+                            self.router.peer_appeared(node_id)
+                            self.transfers.peer_appeared(node_id)
+                            self.history_sync.peer_appeared(node_id)
                     else:
                         logger.debug(f"Node {node_id} ignored - too far ({distance:.1f}km)")
         except Exception as e:
             logger.error(f"Error handling message: {e}")
                 
+    def _peer_codec(self, info):
+        return info.codec if self.wire_format == 'binary' else CODEC_JSON
+        
+    def _encode(self, codec, message):
+        """Encode message for a peer codec"""
+        return (self.codec.encode_message(message) if codec == CODEC_BINARY
+                else self.codec.encode_json(message))
+        
+    def _encrypt(self, node_id, frame):
+        """Seal frame with the peer's session key; None until we have its key"""
+        sealed = self.sessions.seal(node_id, frame)
+        if sealed is None:
+            logger.debug(f"No session key for {node_id} yet, not sending")
+        return sealed
+        
+    def send_to_node(self, node_id, message, priority=None):
+        """Send a message to one directly reachable node (priority defaults to its class)"""
+        info = self.nodes.get(node_id)
+        if info is None:
+            return False
+        try:
+            sealed = self._encrypt(node_id, self._encode(self._peer_codec(info), message))
+            if sealed is None:
+                return False
+            self._sendto(sealed, info.addr, classify(message) if priority is None else priority)
+            return True
+        except Exception as e:
+            logger.error(f"Error sending to {node_id}: {e}")
+            return False
+            
+    def send_chunk(self, node_id, transfer_id, index, data):
+        """Send one file chunk to a directly reachable node"""
+        info = self.nodes.get(node_id)
+        if info is None:
+            return False
+        if self._peer_codec(info) == CODEC_BINARY:
+            frame = self.codec.encode_chunk(transfer_id, index, data)
+        else:
+            frame = self.codec.encode_json({
+                'type': 'file_chunk',
+                'transfer': transfer_id,
+                'index': index,
+                'data': base64.b64encode(data).decode()
+            })
+        try:
+            sealed = self._encrypt(node_id, frame)
+            if sealed is None:
+                return False
+            self._sendto(sealed, self.transport.stripe(info.addr), PRIORITY_BULK)
+            return True
+        except Exception as e:
+            logger.error(f"Error sending chunk to {node_id}: {e}")
+            return False
+            
+    def send_file(self, node_id, path):
+        """Start a chunked transfer of path to node_id; returns the transfer ID"""
+        return self.transfers.send_file(node_id, path)
+        
+    def get_transfer_status(self):
+        """Get progress of active and finished file transfers"""
+        return self.transfers.get_status()
+        
+    def add_message_handler(self, handler):
+        """Register handler(payload, envelope) for messages routed to this node"""
+        self.message_handlers.append(handler)
+        
+    def publish(self, channel, payload):
+        """Number payload in our history stream, keep it and flood it; returns the stamped copy"""
+        payload = self.history.stamp(channel, payload)
+        self.history.add(payload)
+        self.router.send(payload)
+        return payload
+        
+    def _deliver(self, payload, envelope):
+        """Hand payload to the handlers; False if it is a history message we already had"""
+        if isinstance(payload, dict) and 'stream' in payload and not self.history.add(payload):
+            return False
+        for handler in self.message_handlers:
+            try:
+                handler(payload, envelope)
+            except Exception as e:
+                logger.error(f"Error in message handler: {e}")
+        return True
+                
     def broadcast_message(self, message):
         """Broadcast a message to all known nodes"""
         try:
-            encrypted_message = self.fernet.encrypt(json.dumps(message).encode())
+            encoded = {}  # Encode at most once per codec; encryption is per peer
+            priority = classify(message)
+            # The snapshot never changes under us, even while the engine updates the table
             for node_id, info in self.nodes.items():
+                codec = self._peer_codec(info)
+                if codec not in encoded:
+                    encoded[codec] = self._encode(codec, message)
                 try:
-                    self.socket.sendto(encrypted_message, (info['ip'], info['port']))
-                    logger.debug(f"Message sent to {node_id}")
+                    sealed = self._encrypt(node_id, encoded[codec])
+                    if sealed is not None:
+                        self._sendto(sealed, info.addr, priority)
                 except Exception as e:
                     logger.error(f"Error sending to {node_id}: {e}")
         except Exception as e:
             logger.error(f"Error broadcasting message: {e}")
             
     def _broadcast_message(self, message):
-        encoded_message = json.dumps(message).encode()
-        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        self.socket.sendto(encoded_message, ('<broadcast>', self.port))
+        self._broadcast(self.codec.encode_json(message))
+        
+    def _broadcast(self, data):
+        self._sendto(data, (BROADCAST, self.port))
+        
+    def add_change_listener(self, listener):
+        """Register listener(event, node_id); event is 'joined', 'updated', 'seen' or 'left'"""
+        self.change_listeners.append(listener)
+        
+    def _notify(self, event, node_id):
+        for listener in self.change_listeners:
+            try:
+                listener(event, node_id)
+            except Exception as e:
+                logger.error(f"Error in change listener: {e}")
+                
+    @staticmethod
+    def _node_entry(node_id, info, now):
+        return {
+            'id': node_id,
+            'ip': info.ip,
+            'distance': info.distance,
+            'last_seen': int(now - info.last_seen),
+            'telemetry': info.telemetry
+        }
+        
+    def get_node(self, node_id):
+        """Get status of one node, or None if it isn't in the table"""
+        info = self.nodes.get(node_id)
+        return self._node_entry(node_id, info, self.clock()) if info else None
         
     def get_network_status(self):
         """Get current network status"""
+        nodes = self.nodes
+        now = self.clock()
         return {
             'node_id': self.node_id,
-            'active_nodes': len(self.nodes),
-            'nodes': [{
-                'id': node_id,
-                'ip': info['ip'],
-                'distance': info['distance'],
-                'last_seen': int(time.time() - info['last_seen'])
-            } for node_id, info in self.nodes.items()]
+            'active_nodes': len(nodes),
+            'nodes': [self._node_entry(node_id, info, now) for node_id, info in nodes.items()]
         }
         
+    def get_beacon_stats(self):
+        """Get the adaptive beacon interval and counters"""
+        return self.beacons.get_stats()
+        
+    def get_session_stats(self):
+        """Get session key table counters"""
+        return self.sessions.get_stats()
+        
+    def get_history_stats(self):
+        """Get per-channel history sizes and late-joiner sync counters"""
+        return {'channels': self.history.get_stats(), 'sync': self.history_sync.get_stats()}
+        
+    def get_routing_stats(self):
+        """Get multi-hop routing counters"""
+        return self.router.get_stats()
+        
+    def get_link_stats(self):
+        """Get per-interface and per-path counters (multicast link mode only)"""
+        get_stats = getattr(self.transport, 'get_stats', None)
+        return get_stats() if get_stats else None
+
+    def get_send_stats(self):
+        """Get per-priority send queue, drop and throttle counters (scheduled send only)"""
+        return self.scheduler.get_stats() if self.scheduler else None
+
+    def get_ingress_stats(self):
+        """Get receive queue and drop counters (batched ingress only)"""
+        return self.ingress.get_stats() if self.ingress else None
+        
+    def get_nodes_within(self, radius_km):
+        """Get peers within radius_km of this node, nearest first"""
+        origin = self._origin
+        if origin is None:
+            return []
+        return [{'id': node_id, 'distance': distance}
+                for node_id, distance in self.spatial.within(origin, radius_km)]
+        
+    def get_nearest_nodes(self, k):
+        """Get the k peers closest to this node"""
+        origin = self._origin
+        if origin is None:
+            return []
+        return [{'id': node_id, 'distance': distance}
+                for node_id, distance in self.spatial.nearest(origin, k)]
+        
     def update_location(self, lat, lon):
         """Update node's GPS location"""
         self.location = {'lat': lat, 'lon': lon}
+        self._origin = GeoPoint(lat, lon)
+        if self.engine:
+            self.engine.call_soon(self._refresh_distances)
+        else:
+            self._refresh_distances()
         logger.info(f"Location updated: {lat}, {lon}")
         
+    def _refresh_distances(self):
+        """Recompute peer distances from the cached points after we moved"""
+        if self.engine:
+            self._topology_changed()
+        origin = self._origin
+        changed = {}
+        for node_id, info in self.nodes.items():
+            point = self.spatial.get(node_id)
+            distance = origin.distance_to(point) if origin and point else 0
+            if distance != info.distance:
+                changed[node_id] = distance
+        if changed:
+            self.registry.update_distances(changed)
+            for node_id in changed:
+                self._notify('updated', node_id)
+        
     def get_active_nodes(self):
-        return list(self.nodes.keys()) 
\ No newline at end of file
+        return list(self.nodes) 
\ No newline at end of file
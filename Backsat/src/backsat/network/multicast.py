@@ -0,0 +1,360 @@
+import ipaddress
+import os
+import random
+import socket
+import struct
+import time
+import netifaces
+from .engine import MeshEngine
+from .transport import UDPTransport, BROADCAST
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+GROUP_V4 = '239.255.181.1'  # Administratively scoped
+GROUP_V6 = 'ff02::b5:1'  # Link-local scope
+
+# Not exported by the socket module on every Python build (Linux values)
+IP_PKTINFO = getattr(socket, 'IP_PKTINFO', 8)
+IP_MULTICAST_ALL = getattr(socket, 'IP_MULTICAST_ALL', 49)
+_IN_PKTINFO = struct.Struct('=i4s4s')  # ifindex, spec_dst, addr
+_IN6_PKTINFO = struct.Struct('=16sI')  # addr, ifindex
+_IP_MREQN = struct.Struct('=4s4si')  # group, local address, ifindex
+_ANCILLARY_SIZE = socket.CMSG_SPACE(_IN6_PKTINFO.size)
+
+DEFAULT_SPEED = 100  # Mb/s assumed for wired links that don't report one
+WIRELESS_SPEED = 54  # Mb/s assumed for Wi-Fi links
+
+class Interface:
+    """One usable network interface and its addresses"""
+
+    __slots__ = ('name', 'index', 'ipv4', 'broadcast', 'ipv6', 'speed')
+
+    def __init__(self, name, index, ipv4=None, broadcast=None, ipv6=False, speed=DEFAULT_SPEED):
+        self.name = name
+        self.index = index
+        self.ipv4 = ipv4
+        self.broadcast = broadcast
+        self.ipv6 = ipv6
+        self.speed = speed
+
+def link_speed(name):
+    """Nominal link speed in Mb/s, from sysfs where the driver reports it"""
+    base = os.path.join('/sys/class/net', name)
+    if os.path.exists(os.path.join(base, 'wireless')):
+        return WIRELESS_SPEED
+    try:
+        with open(os.path.join(base, 'speed')) as f:
+            speed = int(f.read().strip())
+        return speed if speed > 0 else DEFAULT_SPEED
+    except (OSError, ValueError):
+        return DEFAULT_SPEED
+
+def list_interfaces(names=None):
+    """Up, non-loopback interfaces with an IPv4 or IPv6 link-local address"""
+    interfaces = []
+    for name in names or netifaces.interfaces():
+        try:
+            addresses = netifaces.ifaddresses(name)
+            index = socket.if_nametoindex(name)
+        except (ValueError, OSError):
+            continue
+        ipv4 = broadcast = None
+        for entry in addresses.get(netifaces.AF_INET, ()):
+            if not ipaddress.ip_address(entry['addr']).is_loopback:
+                ipv4 = entry['addr']
+                broadcast = entry.get('broadcast')
+                break
+        ipv6 = any(entry['addr'].split('%')[0].lower().startswith('fe80')
+                   for entry in addresses.get(netifaces.AF_INET6, ()))
+        if ipv4 or ipv6:
+            interfaces.append(Interface(name, index, ipv4, broadcast, ipv6, link_speed(name)))
+    return interfaces
+
+def _sockaddr(addr):
+    """Socket address for an (ip, port) key, resolving an IPv6 scope ("fe80::1%3")"""
+    if ':' not in addr[0]:
+        return addr
+    return socket.getaddrinfo(addr[0], addr[1], socket.AF_INET6, socket.SOCK_DGRAM)[0][4]
+
+class Path:
+    """One way of reaching a peer: an interface plus the peer's address on it"""
+
+    __slots__ = ('addr', 'sockaddr', 'iface', 'speed', 'last_heard', 'last_beacon', 'credit')
+
+    def __init__(self, addr, sockaddr, iface, speed):
+        self.addr = addr  # (ip, port) key the mesh uses for this path
+        self.sockaddr = sockaddr
+        self.iface = iface
+        self.speed = speed
+        self.last_heard = 0
+        self.last_beacon = 0
+        self.credit = 0  # Smooth weighted round robin state for bulk striping
+
+class MulticastTransport(UDPTransport):
+    """Discovery over IPv4 and IPv6 multicast on every interface, with per-peer paths.
+
+    Beacons go to a multicast group on each interface (plus each subnet's
+    broadcast address, so nodes on the old broadcast transport still hear
+    us). A peer with several links therefore shows up on several paths.
+    The mesh reports every decoded frame through heard(), and the
+    transport presents the best path to the mesh as that peer's address.
+    Only a sealed frame, which proves the sender holds the peer's session
+    key, records a path; a beacon, whose sender hash anyone can claim, can
+    only mark an existing path as having carried the latest round. The
+    best path is the fastest link that carried the peer's latest beacon
+    round, so a link going quiet fails over at the next beacon. Bulk
+    traffic (file chunks) is striped across all live paths in proportion
+    to link speed.
+    """
+
+    IFACE_REFRESH = 30  # Seconds between interface rescans
+    ROUND_SLACK = 1.0  # Beacons of one round arrive on all links within this many seconds
+    PATH_TIMEOUT = 600  # Seconds before a silent path is forgotten
+    MAX_PEERS = 1024  # Peers with tracked paths
+    MAX_PATHS = 8  # Paths tracked per peer
+
+    def __init__(self, start_port=5000, interfaces=None, broadcast=True):
+        self.start_port = start_port
+        self.names = interfaces
+        self.send_broadcast = broadcast
+        self.port = self._find_available_port()
+        self.clock = time.time
+        self.random = random.Random()
+        self.socket = None  # Two sockets; batched ingress needs a single one
+        self.sock4 = self._open_v4()
+        self.sock6 = self._open_v6()
+        self.interfaces = {}  # {ifindex: Interface}
+        self.paths = {}  # {node hash: {addr: Path}}
+        self._owners = {}  # {addr: node hash}
+        self.refresh_interfaces()
+
+    def _open_v4(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.setsockopt(socket.IPPROTO_IP, IP_PKTINFO, 1)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 0)
+        try:
+            sock.setsockopt(socket.IPPROTO_IP, IP_MULTICAST_ALL, 0)
+        except OSError:
+            pass  # Linux only; other groups on the port are filtered by the decoder anyway
+        sock.bind(('0.0.0.0', self.port))
+        return sock
+
+    def _open_v6(self):
+        try:
+            sock = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
+        except OSError:
+            return None  # No IPv6 stack
+        sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_RECVPKTINFO, 1)
+        sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_LOOP, 0)
+        sock.bind(('::', self.port))
+        return sock
+
+    def sockets(self):
+        return [sock for sock in (self.sock4, self.sock6) if sock is not None]
+
+    def _membership(self, iface, join):
+        """Join or leave the mesh groups on iface, by interface index rather than address"""
+        if iface.ipv4:
+            mreq = _IP_MREQN.pack(socket.inet_aton(GROUP_V4), bytes(4), iface.index)
+            self.sock4.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP if join
+                                  else socket.IP_DROP_MEMBERSHIP, mreq)
+        if iface.ipv6 and self.sock6:
+            mreq = socket.inet_pton(socket.AF_INET6, GROUP_V6) + struct.pack('@I', iface.index)
+            self.sock6.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_JOIN_GROUP if join
+                                  else socket.IPV6_LEAVE_GROUP, mreq)
+
+    def _leave(self, iface):
+        try:
+            self._membership(iface, join=False)
+        except OSError:
+            pass  # The interface (or its address) is already gone, and the membership with it
+
+    def refresh_interfaces(self):
+        """Join the groups on new interfaces, rejoin on address changes, forget vanished ones
+
+        Beacons are sent with the interface's current address as
+        IP_MULTICAST_IF, so an interface whose address changed (DHCP renew,
+        roaming) is replaced by its new description and its memberships
+        are renewed.
+        """
+        current = {iface.index: iface for iface in list_interfaces(self.names)}
+        joined = {}
+        for index, iface in current.items():
+            old = self.interfaces.get(index)
+            if old is not None and (old.ipv4, old.ipv6) == (iface.ipv4, iface.ipv6):
+                joined[index] = iface
+                continue
+            if old is not None:
+                self._leave(old)
+                logger.info(f"Mesh interface {iface.name} address changed "
+                            f"({old.ipv4} -> {iface.ipv4}), rejoining")
+            try:
+                self._membership(iface, join=True)
+            except OSError as e:
+                logger.error(f"Could not join mesh multicast group on {iface.name}: {e}")
+                continue
+            joined[index] = iface
+            if old is None:
+                logger.info(f"Mesh interface {iface.name} up ({iface.speed} Mb/s)")
+        for index in set(self.interfaces) - set(joined):
+            self._leave(self.interfaces[index])
+            logger.info(f"Mesh interface {self.interfaces[index].name} gone")
+        self.interfaces = joined
+        names = {iface.name for iface in joined.values()}
+        cutoff = self.clock() - self.PATH_TIMEOUT
+        for sender, paths in list(self.paths.items()):
+            for addr in [addr for addr, path in paths.items()
+                         if path.iface not in names or path.last_heard < cutoff]:
+                del paths[addr]
+                self._owners.pop(addr, None)
+            if not paths:
+                del self.paths[sender]
+
+    def create_engine(self, mesh):
+        return MulticastEngine(mesh)
+
+    def receive(self, sock):
+        """Read one datagram; returns (data, addr, sockaddr, index of the interface it came in on)
+
+        A link-local IPv6 addr carries its scope ("fe80::1%3"), without
+        which it can't be sent to.
+        """
+        data, ancdata, _, sockaddr = sock.recvmsg(65535, _ANCILLARY_SIZE)
+        index = None
+        for level, kind, value in ancdata:
+            if level == socket.IPPROTO_IP and kind == IP_PKTINFO:
+                index = _IN_PKTINFO.unpack_from(value)[0]
+            elif level == socket.IPPROTO_IPV6 and kind == socket.IPV6_PKTINFO:
+                index = _IN6_PKTINFO.unpack_from(value)[1]
+        host = sockaddr[0]
+        if len(sockaddr) == 4 and sockaddr[3] and '%' not in host:
+            host = f"{host}%{sockaddr[3]}"
+        return data, (host, sockaddr[1]), sockaddr, index
+
+    def heard(self, sender, addr, link, authenticated):
+        """Record the path a decoded frame came in on; returns the peer's best path address
+
+        link is the (index of the interface, raw sockaddr) from receive().
+        """
+        paths = self.paths.get(sender)
+        path = paths.get(addr) if paths else None
+        if path is None:
+            iface = self.interfaces.get(link[0]) if link else None
+            if not authenticated or iface is None:
+                return self._best(paths).addr if paths else addr
+            if paths is None:
+                if len(self.paths) >= self.MAX_PEERS:
+                    return addr
+                paths = self.paths[sender] = {}
+            if len(paths) >= self.MAX_PATHS or addr in self._owners:
+                return self._best(paths).addr if paths else addr
+            path = paths[addr] = Path(addr, link[1], iface.name, iface.speed)
+            self._owners[addr] = sender
+        path.last_heard = self.clock()
+        if not authenticated:
+            path.last_beacon = path.last_heard
+        return self._best(paths).addr
+
+    def _live(self, paths):
+        freshest = max(path.last_beacon for path in paths.values())
+        return [path for path in paths.values() if freshest - path.last_beacon <= self.ROUND_SLACK]
+
+    def _best(self, paths):
+        return max(self._live(paths), key=lambda path: (path.speed, path.last_beacon))
+
+    def stripe(self, addr):
+        """Pick a path for the next bulk datagram to the peer behind addr"""
+        owner = self._owners.get(addr)
+        if owner is None:
+            return addr
+        live = self._live(self.paths[owner])
+        if len(live) == 1:
+            return live[0].addr
+        total = sum(path.speed for path in live)
+        for path in live:
+            path.credit += path.speed
+        chosen = max(live, key=lambda path: path.credit)
+        chosen.credit -= total
+        return chosen.addr
+
+    def sendto(self, data, addr):
+        if addr[0] == BROADCAST:
+            self._multicast(data)
+            return
+        owner = self._owners.get(addr)
+        if owner is None:
+            sockaddr = _sockaddr(addr)
+        else:
+            paths = self.paths[owner]
+            path = paths[addr]
+            # Fail over if this path missed the peer's latest beacon round
+            if path not in self._live(paths):
+                path = self._best(paths)
+            sockaddr = path.sockaddr
+        sock = self.sock6 if ':' in sockaddr[0] else self.sock4
+        if sock is not None:
+            sock.sendto(data, sockaddr)
+
+    def _multicast(self, data):
+        for iface in list(self.interfaces.values()):
+            try:
+                if iface.ipv4:
+                    self.sock4.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF,
+                                          socket.inet_aton(iface.ipv4))
+                    self.sock4.sendto(data, (GROUP_V4, self.port))
+                    if self.send_broadcast and iface.broadcast:
+                        self.sock4.sendto(data, (iface.broadcast, self.port))
+                if iface.ipv6 and self.sock6:
+                    self.sock6.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_IF, iface.index)
+                    self.sock6.sendto(data, (GROUP_V6, self.port, 0, iface.index))
+            except OSError as e:
+                logger.warning(f"Multicast on {iface.name} failed: {e}")
+
+    def get_stats(self):
+        return {
+            'interfaces': [{'name': iface.name, 'ipv4': iface.ipv4, 'ipv6': iface.ipv6,
+                            'speed': iface.speed} for iface in self.interfaces.values()],
+            'peers': len(self.paths),
+            'paths': sum(len(paths) for paths in self.paths.values())
+        }
+
+    def close(self):
+        for sock in self.sockets():
+            sock.close()
+
+class MulticastEngine(MeshEngine):
+    """MeshEngine reading both multicast sockets and rescanning interfaces"""
+
+    async def _setup(self):
+        transport = self.mesh.transport
+        for sock in transport.sockets():
+            sock.setblocking(False)
+            self.loop.add_reader(sock.fileno(), self._readable, sock)
+        self.schedule_timers()
+        self.every(transport.IFACE_REFRESH, transport.refresh_interfaces)
+
+    MAX_READS_PER_WAKEUP = 64  # Yield to timers after this many datagrams
+
+    def _readable(self, sock):
+        for _ in range(self.MAX_READS_PER_WAKEUP):
+            try:
+                data, addr, sockaddr, index = self.mesh.transport.receive(sock)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                logger.error(f"Mesh socket error: {e}")
+                return
+            self.mesh._on_datagram(data, addr, link=(index, sockaddr))
+
+    def _sendto(self, data, addr):
+        try:
+            self.mesh.transport.sendto(data, addr)
+        except BlockingIOError:
+            logger.debug(f"Send buffer full, dropped datagram to {addr}")
+        except Exception as e:
+            logger.error(f"Error sending to {addr}: {e}")
@@ -0,0 +1,198 @@
+import math
+from types import MappingProxyType
+
+class PeerRecord:
+    """One directly reachable neighbour.
+
+    Route fields (ip, port, distance, codec) never change once a record is
+    published; a change publishes a new record. Only the liveness fields
+    (last_seen, interval, timeout) and the peer's advertised telemetry are
+    refreshed in place by each beacon, and single attribute stores are
+    atomic for readers.
+    """
+
+    __slots__ = ('node_id', 'ip', 'port', 'distance', 'codec', 'last_seen', 'interval', 'timeout',
+                 'telemetry')
+
+    def __init__(self, node_id, ip, port, distance, codec, last_seen, interval=None, timeout=30,
+                 telemetry=None):
+        self.node_id = node_id
+        self.ip = ip
+        self.port = port
+        self.distance = distance
+        self.codec = codec
+        self.last_seen = last_seen
+        self.interval = interval
+        self.timeout = timeout
+        self.telemetry = telemetry
+
+    @property
+    def addr(self):
+        return self.ip, self.port
+
+    @property
+    def deadline(self):
+        return self.last_seen + self.timeout
+
+    def same_route(self, other):
+        return (self.ip == other.ip and self.port == other.port and
+                self.distance == other.distance and self.codec == other.codec)
+
+    def with_distance(self, distance):
+        return PeerRecord(self.node_id, self.ip, self.port, distance, self.codec,
+                          self.last_seen, self.interval, self.timeout, self.telemetry)
+
+    def with_addr(self, ip, port):
+        return PeerRecord(self.node_id, ip, port, self.distance, self.codec,
+                          self.last_seen, self.interval, self.timeout, self.telemetry)
+
+class TimerWheel:
+    """Hierarchical timing wheel: O(1) schedule, O(due) per tick.
+
+    Level 0 has one slot per tick; each higher level has one slot per full
+    turn of the level below and is cascaded down as that turn begins.
+    Entries are never cancelled, so owners drop stale ones when they fire.
+    """
+
+    def __init__(self, now, tick=1.0, slots=64, levels=3):
+        self.tick = tick
+        self.slots = slots
+        self.wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.current = int(now // tick)  # Last tick processed
+        self.pending = 0
+
+    def schedule(self, key, deadline):
+        due = max(math.ceil(deadline / self.tick), self.current + 1)
+        self._place((key, deadline, due))
+        self.pending += 1
+
+    def _place(self, entry):
+        due = entry[2]
+        delta = due - self.current
+        last = len(self.wheels) - 1
+        for level, wheel in enumerate(self.wheels):
+            span = self.slots ** (level + 1)
+            if delta < span or level == last:
+                # Beyond the top level's reach: park in its furthest slot and re-place later
+                at = due if delta < span else self.current + span - 1
+                wheel[(at // self.slots ** level) % self.slots].append(entry)
+                return
+
+    def advance(self, now):
+        """Move to now; returns the (key, deadline) entries that came due"""
+        target = int(now // self.tick)
+        fired = []
+        while self.current < target:
+            self.current += 1
+            for level in range(1, len(self.wheels)):
+                size = self.slots ** level
+                if self.current % size:
+                    break
+                slot = self.wheels[level][(self.current // size) % self.slots]
+                entries = slot[:]
+                slot.clear()
+                for entry in entries:
+                    self._place(entry)
+            bucket = self.wheels[0][self.current % self.slots]
+            if bucket:
+                entries = bucket[:]
+                bucket.clear()
+                for entry in entries:
+                    if entry[2] > self.current:
+                        self._place(entry)  # Parked overflow entry, not due yet
+                    else:
+                        fired.append((entry[0], entry[1]))
+        self.pending -= len(fired)
+        return fired
+
+class NodeRegistry:
+    """The node table: one writer (the engine loop), lock-free readers.
+
+    Readers get an immutable snapshot mapping; joins, leaves and route
+    changes copy the table and publish the new one, while the far more
+    common "seen again" beacon only refreshes the record's liveness
+    fields. Expiry runs off a timer wheel holding one entry per peer; a
+    beacon doesn't touch the wheel, the entry just re-arms itself at the
+    peer's current deadline when it fires, so a tick costs O(due) instead
+    of a scan over every peer.
+    """
+
+    def __init__(self, clock, tick=1.0):
+        self.clock = clock
+        self._peers = {}
+        self._view = MappingProxyType(self._peers)
+        self._armed = {}  # {node_id: deadline of its live wheel entry}
+        self.wheel = TimerWheel(clock(), tick)
+
+    def snapshot(self):
+        """Current {node_id: PeerRecord} mapping; never changes once returned"""
+        return self._view
+
+    def _publish(self, peers):
+        self._peers = peers
+        self._view = MappingProxyType(peers)
+
+    def update(self, record):
+        """Insert or refresh a peer; returns the previous record, if any"""
+        previous = self._peers.get(record.node_id)
+        if previous is not None and previous.same_route(record):
+            previous.last_seen = record.last_seen
+            previous.interval = record.interval
+            previous.timeout = record.timeout
+            if record.telemetry is not None:
+                previous.telemetry = record.telemetry
+        else:
+            if previous is not None and record.telemetry is None:
+                record.telemetry = previous.telemetry  # Not every beacon carries it
+            peers = dict(self._peers)
+            peers[record.node_id] = record
+            self._publish(peers)
+        self._arm(record.node_id, record.deadline)
+        return previous
+
+    def update_distances(self, distances):
+        """Publish new distances for several peers at once"""
+        peers = dict(self._peers)
+        for node_id, distance in distances.items():
+            if node_id in peers:
+                peers[node_id] = peers[node_id].with_distance(distance)
+        self._publish(peers)
+
+    def move(self, node_id, ip, port):
+        """Publish a new address for a known peer; returns False if there is none"""
+        record = self._peers.get(node_id)
+        if record is None:
+            return False
+        peers = dict(self._peers)
+        peers[node_id] = record.with_addr(ip, port)
+        self._publish(peers)
+        return True
+
+    def _arm(self, node_id, deadline):
+        armed = self._armed.get(node_id)
+        # A later deadline is picked up when the existing entry fires
+        if armed is None or deadline < armed:
+            self._armed[node_id] = deadline
+            self.wheel.schedule(node_id, deadline)
+
+    def expire(self):
+        """Drop peers past their deadline; returns their IDs"""
+        now = self.clock()
+        expired = []
+        for node_id, deadline in self.wheel.advance(now):
+            if self._armed.get(node_id) != deadline:
+                continue  # Superseded by an earlier entry
+            del self._armed[node_id]
+            record = self._peers.get(node_id)
+            if record is None:
+                continue
+            if record.deadline > now:
+                self._arm(node_id, record.deadline)
+            else:
+                expired.append(node_id)
+        if expired:
+            peers = dict(self._peers)
+            for node_id in expired:
+                del peers[node_id]
+            self._publish(peers)
+        return expired
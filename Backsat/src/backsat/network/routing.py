@@ -0,0 +1,169 @@
+import os
+import time
+from collections import OrderedDict, deque
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class SeenCache:
+    """Bounded LRU set of message IDs used to suppress duplicate floods"""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._ids = OrderedDict()
+
+    def __contains__(self, msg_id):
+        return msg_id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, msg_id):
+        """Remember msg_id; returns False if it was already known"""
+        if msg_id in self._ids:
+            self._ids.move_to_end(msg_id)
+            return False
+        self._ids[msg_id] = None
+        if len(self._ids) > self.maxsize:
+            self._ids.popitem(last=False)
+        return True
+
+class StoreAndForward:
+    """Messages held for peers that are currently out of range.
+
+    Addressed messages wait per destination until that peer shows up again;
+    recent floods are kept in a short ring so peers joining late still get
+    them (the receiver's SeenCache drops anything it already had).
+    """
+
+    def __init__(self, max_per_peer=64, max_peers=256, max_recent=64, max_age=600, clock=time.time):
+        self.clock = clock
+        self.max_per_peer = max_per_peer
+        self.max_peers = max_peers
+        self.max_age = max_age
+        self._pending = OrderedDict()  # {node_id: deque([(stored_at, envelope)])}
+        self._recent = deque(maxlen=max_recent)  # [(stored_at, envelope)]
+        self.stored = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return sum(len(queue) for queue in self._pending.values())
+
+    def store(self, dest, envelope):
+        queue = self._pending.get(dest)
+        if queue is None:
+            if len(self._pending) >= self.max_peers:
+                _, dropped = self._pending.popitem(last=False)
+                self.evicted += len(dropped)
+            queue = self._pending[dest] = deque(maxlen=self.max_per_peer)
+        elif len(queue) == queue.maxlen:
+            self.evicted += 1
+        queue.append((self.clock(), envelope))
+        self.stored += 1
+
+    def remember(self, envelope):
+        self._recent.append((self.clock(), envelope))
+
+    def take(self, node_id):
+        """Pop everything still fresh that should be handed to node_id"""
+        cutoff = self.clock() - self.max_age
+        queue = self._pending.pop(node_id, ())
+        envelopes = [env for stored_at, env in queue if stored_at >= cutoff]
+        envelopes.extend(env for stored_at, env in self._recent
+                         if stored_at >= cutoff and env['origin'] != node_id)
+        return envelopes
+
+class MeshRouter:
+    """Multi-hop flooding with TTL, duplicate suppression and store-and-forward.
+
+    Application messages are wrapped in a 'routed' envelope carrying a random
+    message ID, the originating node, an optional destination and a hop
+    budget. Every node delivers each ID once, then re-floods it to its
+    direct neighbours (or straight to the destination when it is one) until
+    the TTL runs out. All methods except send() run on the engine loop.
+    """
+
+    DEFAULT_TTL = 6
+
+    def __init__(self, mesh, ttl=DEFAULT_TTL, seen_size=4096, store=None):
+        self.mesh = mesh
+        self.ttl = ttl
+        self.seen = SeenCache(seen_size)
+        self.store = store or StoreAndForward(clock=mesh.clock)
+        self.originated = 0
+        self.delivered = 0
+        self.forwarded = 0
+        self.duplicates = 0
+
+    def send(self, payload, dest=None, ttl=None):
+        """Route payload to dest (or everyone); safe to call from any thread"""
+        envelope = {
+            'type': 'routed',
+            'id': os.urandom(8).hex(),
+            'origin': self.mesh.node_id,
+            'dest': dest,
+            'ttl': self.ttl if ttl is None else ttl,
+            'hops': 0,
+            'payload': payload
+        }
+        if self.mesh.engine:
+            self.mesh.engine.call_soon(self._originate, envelope)
+        else:
+            self._originate(envelope)
+        return envelope['id']
+
+    def _originate(self, envelope):
+        self.seen.add(envelope['id'])
+        self.originated += 1
+        self._forward(envelope, exclude=())
+
+    def handle(self, envelope, addr):
+        """Process a routed envelope received from a neighbour"""
+        if not self.seen.add(envelope['id']):
+            self.duplicates += 1
+            return
+        dest = envelope.get('dest')
+        if dest is None or dest == self.mesh.node_id:
+            self.delivered += 1
+            self.mesh._deliver(envelope['payload'], envelope)
+            if dest is not None:
+                return
+        if envelope['ttl'] <= 1:
+            return
+        relayed = dict(envelope, ttl=envelope['ttl'] - 1, hops=envelope['hops'] + 1)
+        self.forwarded += 1
+        self._forward(relayed, exclude=(envelope['origin'], envelope.get('via')))
+
+    def _forward(self, envelope, exclude):
+        envelope['via'] = self.mesh.node_id
+        dest = envelope.get('dest')
+        neighbours = self.mesh.get_active_nodes()
+        if dest is not None and dest in neighbours:
+            self.mesh.send_to_node(dest, envelope)
+            return
+        for node_id in neighbours:
+            if node_id not in exclude:
+                self.mesh.send_to_node(node_id, envelope)
+        if dest is None:
+            self.store.remember(envelope)
+        else:
+            self.store.store(dest, envelope)
+
+    def peer_appeared(self, node_id):
+        """Hand over anything held while node_id was out of range"""
+        envelopes = self.store.take(node_id)
+        for envelope in envelopes:
+            self.mesh.send_to_node(node_id, envelope)
+        if envelopes:
+            logger.info(f"Forwarded {len(envelopes)} stored messages to {node_id}")
+
+    def get_stats(self):
+        return {
+            'originated': self.originated,
+            'delivered': self.delivered,
+            'forwarded': self.forwarded,
+            'duplicates': self.duplicates,
+            'seen': len(self.seen),
+            'stored': len(self.store),
+            'evicted': self.store.evicted
+        }
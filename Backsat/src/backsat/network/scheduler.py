@@ -0,0 +1,320 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from .ingress import _IOVec, _MMsgHdr
+from .transport import BROADCAST
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Priority classes, most urgent first
+PRIORITY_SOS = 0
+PRIORITY_CONTROL = 1  # Beacons, handshakes, acks, offers, sync requests
+PRIORITY_CHAT = 2
+PRIORITY_BULK = 3  # File chunks, history sync answers
+PRIORITY_NAMES = ('sos', 'control', 'chat', 'bulk')
+
+BULK_TYPES = ('file_chunk', 'history_entries')
+
+def classify(message):
+    """Priority class for a mesh message dict"""
+    kind = message.get('type')
+    if kind == 'routed':
+        payload = message.get('payload')
+        if isinstance(payload, dict) and 'sos' in (payload.get('type'), payload.get('channel')):
+            return PRIORITY_SOS
+        return PRIORITY_CHAT
+    if kind == 'history_entries' and message.get('channel') == 'sos':
+        return PRIORITY_SOS
+    if kind in BULK_TYPES:
+        return PRIORITY_BULK
+    return PRIORITY_CONTROL
+
+def _load_sendmmsg():
+    """Return libc's sendmmsg, or None where it isn't available"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        sendmmsg = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return sendmmsg
+
+_sendmmsg = _load_sendmmsg()
+
+def _sockaddr_in(addr):
+    """Raw sockaddr_in for an IPv4 (ip, port), or None for anything else"""
+    ip = '255.255.255.255' if addr[0] == BROADCAST else addr[0]
+    try:
+        packed = socket.inet_aton(ip)
+    except OSError:
+        return None
+    return (socket.AF_INET.to_bytes(2, sys.byteorder) + struct.pack('!H', addr[1])
+            + packed + bytes(8))
+
+class BatchSender:
+    """Sends many datagrams per syscall.
+
+    Uses sendmmsg(2) through ctypes on a single IPv4 socket on Linux and
+    falls back to send(data, addr) one datagram at a time elsewhere, or
+    when there is no single socket (multicast link mode).
+    """
+
+    def __init__(self, sock, send, use_sendmmsg=True):
+        self.sock = sock
+        self.send = send
+        self.use_sendmmsg = use_sendmmsg and _sendmmsg is not None and self.sock is not None
+        self.errors = 0
+
+    def send_batch(self, batch):
+        """Send (data, addr) pairs in order; returns how many left before the buffer filled"""
+        if self.use_sendmmsg:
+            return self._send_mmsg(batch)
+        return self._send_loop(batch)
+
+    def _send_mmsg(self, batch):
+        count = len(batch)
+        names = [_sockaddr_in(addr) for _, addr in batch]
+        if None in names:
+            return self._send_loop(batch)
+        buffers = [ctypes.create_string_buffer(data, len(data)) for data, _ in batch]
+        name_buffers = [ctypes.create_string_buffer(name, len(name)) for name in names]
+        iovecs = (_IOVec * count)()
+        msgs = (_MMsgHdr * count)()
+        for i in range(count):
+            iovecs[i].iov_base = ctypes.addressof(buffers[i])
+            iovecs[i].iov_len = len(batch[i][0])
+            hdr = msgs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(name_buffers[i])
+            hdr.msg_namelen = len(names[i])
+            hdr.msg_iov = ctypes.pointer(iovecs[i])
+            hdr.msg_iovlen = 1
+        base, size = ctypes.addressof(msgs), ctypes.sizeof(_MMsgHdr)
+        sent = 0
+        while sent < count:
+            n = _sendmmsg(self.sock.fileno(), base + sent * size, count - sent, socket.MSG_DONTWAIT)
+            if n < 0:
+                err = ctypes.get_errno()
+                if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                if err != errno.EINTR:
+                    # This datagram can't go (e.g. unreachable): skip it, keep the rest
+                    self.errors += 1
+                    logger.debug(f"Send to {batch[sent][1]} failed: {os.strerror(err)}")
+                    sent += 1
+                continue
+            sent += n
+        return sent
+
+    def _send_loop(self, batch):
+        sent = 0
+        for data, addr in batch:
+            try:
+                self.send(data, addr)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                self.errors += 1
+                logger.debug(f"Send to {addr} failed: {e}")
+            sent += 1
+        return sent
+
+class TokenBucket:
+    """Byte budget refilled at rate per second, holding at most burst.
+
+    A datagram larger than burst could never fit, so it may go whenever
+    the bucket is full and leaves it in debt: the balance goes negative
+    and later datagrams wait for the refill, which keeps the average rate.
+    """
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def delay(self, size, now):
+        """Seconds until size bytes may go; 0 means take them now"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        needed = min(size, self.burst)
+        if self.tokens >= needed:
+            self.tokens -= size
+            return 0
+        return (needed - self.tokens) / self.rate
+
+class OutboundScheduler:
+    """Prioritized, rate-limited send path with a dedicated sender thread.
+
+    Callers on any thread submit already-encrypted datagrams with a
+    priority class and return immediately. The sender thread always
+    drains the most urgent non-empty class first, at most BATCH datagrams
+    per syscall batch, so an SOS waits behind one batch at worst however
+    much chat or file data is queued. Within the chat and bulk classes
+    each peer has its own queue and token bucket and peers are served
+    round-robin, so one busy peer can't starve the others or exceed its
+    rate. Full classes drop new datagrams (the file transfer treats them as
+    loss and backs off).
+    """
+
+    BATCH = 32  # Datagrams handed to the kernel per send call
+    QUEUE_LIMITS = (1024, 4096, 4096, 8192)  # Per priority class
+    RATES = {  # Per peer: (bytes/s, burst bytes); other classes are not limited
+        PRIORITY_CHAT: (64 * 1024, 16 * 1024),
+        PRIORITY_BULK: (4 * 1024 * 1024, 256 * 1024)
+    }
+    MAX_BUCKETS = 1024  # Idle peers' buckets are forgotten beyond this
+    RETRY_WAIT = 0.002  # Seconds to back off when the socket buffer is full
+
+    def __init__(self, sock, send, rates=None, use_sendmmsg=True):
+        self.sender = BatchSender(sock, send, use_sendmmsg=use_sendmmsg)
+        self.rates = dict(self.RATES, **(rates or {}))
+        self._queues = [OrderedDict() for _ in PRIORITY_NAMES]  # [{addr: deque of (data, addr, queued_at)}]
+        self._sizes = [0] * len(PRIORITY_NAMES)
+        self._buckets = [OrderedDict() for _ in PRIORITY_NAMES]  # [{addr: TokenBucket}]
+        self._cond = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.sent = [0] * len(PRIORITY_NAMES)
+        self.dropped = [0] * len(PRIORITY_NAMES)
+        self.throttled = 0
+        self.batches = 0
+        self.sos_wait_max = 0.0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='mesh-sender', daemon=True)
+        self.thread.start()
+        logger.info(f"Outbound scheduler started "
+                    f"({'sendmmsg' if self.sender.use_sendmmsg else 'sendto loop'})")
+
+    def stop(self):
+        with self._cond:
+            self.running = False
+            self._cond.notify()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+
+    def submit(self, data, addr, priority=PRIORITY_CONTROL):
+        """Queue one datagram; returns False if its class is full. Safe from any thread"""
+        with self._cond:
+            if self._sizes[priority] >= self.QUEUE_LIMITS[priority]:
+                self.dropped[priority] += 1
+                return False
+            queue = self._queues[priority].get(addr)
+            if queue is None:
+                queue = self._queues[priority][addr] = deque()
+            queue.append((data, addr, time.monotonic()))
+            self._sizes[priority] += 1
+            self._cond.notify()
+            return True
+
+    def _take(self, now):
+        """Up to BATCH ready datagrams, most urgent class first; also the wait until more are ready"""
+        batch = []
+        wait = None
+        for priority, peers in enumerate(self._queues):
+            rate = self.rates.get(priority)
+            blocked = set()  # Peers out of tokens this time round
+            # One datagram per peer per round: round-robin between peers
+            while len(batch) < self.BATCH and len(peers) > len(blocked):
+                for addr in list(peers):
+                    if len(batch) >= self.BATCH:
+                        break
+                    if addr in blocked:
+                        continue
+                    queue = peers[addr]
+                    data, _, queued_at = queue[0]
+                    if rate is not None:
+                        delay = self._bucket(priority, addr, rate, now).delay(len(data), now)
+                        if delay:
+                            self.throttled += 1
+                            blocked.add(addr)
+                            wait = delay if wait is None else min(wait, delay)
+                            continue
+                    queue.popleft()
+                    self._sizes[priority] -= 1
+                    if priority == PRIORITY_SOS:
+                        self.sos_wait_max = max(self.sos_wait_max, now - queued_at)
+                    batch.append((priority, data, addr, queued_at))
+                    if queue:
+                        peers.move_to_end(addr)
+                    else:
+                        del peers[addr]
+        return batch, wait
+
+    def _bucket(self, priority, addr, rate, now):
+        buckets = self._buckets[priority]
+        bucket = buckets.get(addr)
+        if bucket is None:
+            bucket = buckets[addr] = TokenBucket(rate[0], rate[1], now)
+            if len(buckets) > self.MAX_BUCKETS:
+                buckets.popitem(last=False)
+        else:
+            buckets.move_to_end(addr)
+        return bucket
+
+    def _requeue(self, items):
+        """Put unsent datagrams back at the head of their queues, keeping their queue time
+
+        Submits may have filled the room they left meanwhile; those that no
+        longer fit are dropped like any datagram for a full class.
+        """
+        with self._cond:
+            for priority, data, addr, queued_at in reversed(items):
+                if self._sizes[priority] >= self.QUEUE_LIMITS[priority]:
+                    self.dropped[priority] += 1
+                    continue
+                peers = self._queues[priority]
+                queue = peers.get(addr)
+                if queue is None:
+                    queue = peers[addr] = deque()
+                    peers.move_to_end(addr, last=False)
+                queue.appendleft((data, addr, queued_at))
+                self._sizes[priority] += 1
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self.running:
+                    return
+                batch, wait = self._take(time.monotonic())
+                if not batch:
+                    self._cond.wait(wait)
+                    continue
+            try:
+                sent = self.sender.send_batch([(data, addr) for _, data, addr, _ in batch])
+            except Exception as e:
+                logger.error(f"Error sending batch: {e}")
+                sent = len(batch)
+            self.batches += 1
+            for priority, _, _, _ in batch[:sent]:
+                self.sent[priority] += 1
+            if sent < len(batch):
+                # Socket buffer full: keep the rest, in order, and give the kernel a moment
+                self._requeue(batch[sent:])
+                time.sleep(self.RETRY_WAIT)
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                'queued': dict(zip(PRIORITY_NAMES, self._sizes)),
+                'sent': dict(zip(PRIORITY_NAMES, self.sent)),
+                'dropped': dict(zip(PRIORITY_NAMES, self.dropped)),
+                'throttled': self.throttled,
+                'batches': self.batches,
+                'send_errors': self.sender.errors,
+                'sos_wait_max': self.sos_wait_max
+            }
@@ -0,0 +1,186 @@
+import heapq
+import itertools
+import random
+import time
+from .engine import MeshEngine
+from .mesh import MeshNetwork
+from .spatial import SpatialIndex, GeoPoint
+from .transport import BROADCAST
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class SimNetwork:
+    """Deterministic in-process radio network for many MeshNetwork nodes.
+
+    Everything runs on the calling thread in virtual time: a single heap of
+    timed events drives every node's timers and datagram deliveries, so a
+    thousand nodes need no sockets, no threads and no wall-clock waiting.
+    Latency, jitter and loss are drawn from a seeded RNG, and broadcasts
+    only reach nodes within radio_range_km when positions are known, so a
+    run with the same seed and inputs replays the same schedule.
+    """
+
+    def __init__(self, seed=0, latency=0.005, jitter=0.002, loss=0.0, radio_range_km=None):
+        self.random = random.Random(seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.radio_range_km = radio_range_km
+        self.time = 0.0
+        self._events = []  # heap of (time, seq, engine, callback, args)
+        self._seq = itertools.count()
+        self.transports = {}  # {ip: SimTransport}
+        self.positions = SpatialIndex(cell_km=radio_range_km or 1.0)
+        self.packets_sent = 0
+        self.bytes_sent = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def now(self):
+        return self.time
+
+    def transport(self, lat=None, lon=None, port=5000):
+        """Attach a new simulated interface, optionally at a position"""
+        n = len(self.transports) + 1
+        ip = f"10.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}"
+        transport = SimTransport(self, ip, port)
+        self.transports[ip] = transport
+        if lat is not None and lon is not None:
+            self.move(transport, lat, lon)
+        return transport
+
+    def add_node(self, lat=None, lon=None, **kwargs):
+        """Create a MeshNetwork on a new simulated interface"""
+        kwargs.setdefault('send_mode', 'direct')  # The sender thread would run outside virtual time
+        mesh = MeshNetwork(transport=self.transport(lat, lon), **kwargs)
+        if lat is not None and lon is not None:
+            mesh.update_location(lat, lon)
+        return mesh
+
+    def move(self, transport, lat, lon):
+        self.positions.update(transport.ip, GeoPoint(lat, lon))
+
+    def schedule(self, delay, engine, callback, *args):
+        """Run callback at now + delay; engine (or None) is charged for its CPU time"""
+        heapq.heappush(self._events, (self.time + delay, next(self._seq), engine, callback, args))
+
+    def run(self, duration):
+        """Advance virtual time by duration seconds"""
+        self.run_until(self.time + duration)
+
+    def run_until(self, until):
+        events = self._events
+        while events and events[0][0] <= until:
+            at, _, engine, callback, args = heapq.heappop(events)
+            self.time = at
+            if engine is not None and engine.stopped:
+                continue
+            started = time.process_time()
+            try:
+                callback(*args)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error in simulated event {getattr(callback, '__name__', callback)}: {e}")
+            if engine is not None:
+                engine.cpu_time += time.process_time() - started
+        self.time = until
+
+    def _receivers(self, sender, addr):
+        if addr[0] != BROADCAST:
+            transport = self.transports.get(addr[0])
+            return [transport] if transport is not None and transport.port == addr[1] else []
+        point = self.positions.get(sender.ip)
+        if self.radio_range_km is None or point is None:
+            return [t for t in self.transports.values() if t is not sender]
+        return [self.transports[ip] for ip, _ in self.positions.within(point, self.radio_range_km)
+                if ip != sender.ip]
+
+    def send(self, sender, data, addr):
+        self.packets_sent += 1
+        self.bytes_sent += len(data)
+        sender.packets_sent += 1
+        sender.bytes_sent += len(data)
+        source = (sender.ip, sender.port)
+        for receiver in self._receivers(sender, addr):
+            if receiver.engine is None or self.random.random() < self.loss:
+                self.dropped += 1
+                continue
+            self.delivered += 1
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            self.schedule(delay, receiver.engine, receiver.mesh._on_datagram, data, source)
+
+    def get_stats(self):
+        return {
+            'time': self.time,
+            'nodes': len(self.transports),
+            'packets_sent': self.packets_sent,
+            'bytes_sent': self.bytes_sent,
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+            'errors': self.errors
+        }
+
+class SimTransport:
+    """One node's interface on a SimNetwork; same surface as UDPTransport"""
+
+    socket = None
+
+    def __init__(self, sim, ip, port):
+        self.sim = sim
+        self.ip = ip
+        self.port = port
+        self.clock = sim.now
+        self.random = random.Random(sim.random.random())
+        self.mesh = None
+        self.engine = None
+        self.packets_sent = 0
+        self.bytes_sent = 0
+
+    def create_engine(self, mesh):
+        self.mesh = mesh
+        self.engine = SimEngine(mesh, self)
+        return self.engine
+
+    def heard(self, sender, addr, link, authenticated):
+        return addr
+
+    def stripe(self, addr):
+        return addr
+
+    def sendto(self, data, addr):
+        self.sim.send(self, data, addr)
+
+    def close(self):
+        self.engine = None
+
+class SimEngine(MeshEngine):
+    """MeshEngine whose loop is the SimNetwork's virtual-time event heap"""
+
+    def __init__(self, mesh, transport):
+        self.mesh = mesh
+        self.transport = transport
+        self.sim = transport.sim
+        self.stopped = False
+        self.cpu_time = 0.0
+
+    def start(self):
+        self.schedule_timers()
+
+    def stop(self):
+        self.stopped = True
+
+    def in_loop(self):
+        return True
+
+    def call_later(self, delay, callback, *args):
+        self.sim.schedule(delay, self, callback, *args)
+
+    def call_soon(self, callback, *args):
+        self.sim.schedule(0, self, callback, *args)
+
+    def sendto(self, data, addr):
+        self.sim.send(self.transport, data, addr)
+
+    _sendto = sendto
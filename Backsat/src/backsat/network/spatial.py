@@ -0,0 +1,172 @@
+import heapq
+import math
+import threading
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE = 2 * math.pi * EARTH_RADIUS_KM / 360
+
+class GeoPoint:
+    """A lat/lon position with its trig values computed once.
+
+    The point is stored as a unit vector, so the great-circle distance to
+    another point needs one sqrt and one asin instead of a full haversine.
+    """
+
+    __slots__ = ('lat', 'lon', 'x', 'y', 'z')
+
+    def __init__(self, lat, lon):
+        self.lat = lat
+        self.lon = lon
+        lat_r = math.radians(lat)
+        lon_r = math.radians(lon)
+        cos_lat = math.cos(lat_r)
+        self.x = cos_lat * math.cos(lon_r)
+        self.y = cos_lat * math.sin(lon_r)
+        self.z = math.sin(lat_r)
+
+    def distance_to(self, other):
+        """Great-circle distance in kilometers"""
+        dx = self.x - other.x
+        dy = self.y - other.y
+        dz = self.z - other.z
+        chord = math.sqrt(dx * dx + dy * dy + dz * dz)
+        return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+class SpatialIndex:
+    """Uniform lat/lon grid of node positions for range and nearest queries.
+
+    Each node lives in exactly one cell, so moving it is a remove plus an
+    add. Radius queries only visit the cells overlapping the search circle
+    and k-nearest queries grow a ring of cells outward until the k-th
+    candidate is closer than anything the next ring could hold.
+    """
+
+    def __init__(self, cell_km=1.0):
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        self._cells = {}  # {(row, col): {node_id: GeoPoint}}
+        self._points = {}  # {node_id: (GeoPoint, (row, col))}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, node_id):
+        return node_id in self._points
+
+    def _cell(self, lat, lon):
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg))
+
+    def update(self, node_id, point):
+        """Insert a node or move it to point"""
+        with self._lock:
+            current = self._points.get(node_id)
+            if current and current[0] is point:
+                return
+            cell = self._cell(point.lat, point.lon)
+            if current and current[1] != cell:
+                self._discard(node_id, current[1])
+            self._cells.setdefault(cell, {})[node_id] = point
+            self._points[node_id] = (point, cell)
+
+    def remove(self, node_id):
+        with self._lock:
+            current = self._points.pop(node_id, None)
+            if current:
+                self._discard(node_id, current[1])
+
+    def _discard(self, node_id, cell):
+        members = self._cells.get(cell)
+        if members is not None:
+            members.pop(node_id, None)
+            if not members:
+                del self._cells[cell]
+
+    def get(self, node_id):
+        current = self._points.get(node_id)
+        return current[0] if current else None
+
+    def point_for(self, node_id, lat, lon):
+        """The node's indexed GeoPoint if it hasn't moved, else a fresh one"""
+        current = self.get(node_id)
+        if current and current.lat == lat and current.lon == lon:
+            return current
+        return GeoPoint(lat, lon)
+
+    def _span(self, origin, radius_km):
+        """Row/column half-widths of the cell window covering radius_km around origin"""
+        rows = int(math.ceil(radius_km / KM_PER_DEGREE / self.cell_deg))
+        cos_lat = math.cos(math.radians(min(abs(origin.lat), 89.0)))
+        cols = int(math.ceil(radius_km / (KM_PER_DEGREE * cos_lat) / self.cell_deg))
+        return rows, cols
+
+    def within(self, origin, radius_km):
+        """Return [(node_id, distance_km)] within radius_km of origin, nearest first"""
+        row, col = self._cell(origin.lat, origin.lon)
+        rows, cols = self._span(origin, radius_km)
+        results = []
+        with self._lock:
+            if (2 * rows + 1) * (2 * cols + 1) > len(self._cells):
+                # Sparse grid: walking the occupied cells is cheaper than the window
+                candidates = [m for (r, c), m in self._cells.items()
+                              if abs(r - row) <= rows and abs(c - col) <= cols]
+            else:
+                candidates = [self._cells[(r, c)]
+                              for r in range(row - rows, row + rows + 1)
+                              for c in range(col - cols, col + cols + 1)
+                              if (r, c) in self._cells]
+            for members in candidates:
+                for node_id, point in members.items():
+                    distance = origin.distance_to(point)
+                    if distance <= radius_km:
+                        results.append((node_id, distance))
+        results.sort(key=lambda item: item[1])
+        return results
+
+    def nearest(self, origin, k):
+        """Return the k nearest [(node_id, distance_km)] to origin"""
+        if k <= 0:
+            return []
+        row, col = self._cell(origin.lat, origin.lon)
+        # Cells in ring r + 1 are at least r cell widths away; widths shrink
+        # with latitude, so the column width at the origin is the safe bound
+        ring_km = self.cell_deg * KM_PER_DEGREE * math.cos(math.radians(min(abs(origin.lat), 89.0)))
+        best = []  # max-heap of (-distance, node_id)
+        with self._lock:
+            remaining = len(self._points)
+            ring = 0
+            while remaining:
+                if 8 * ring > len(self._cells):
+                    # Rings now cost more than the occupied cells: finish with a scan
+                    return self._scan_nearest(origin, k)
+                for cell in self._ring(row, col, ring):
+                    members = self._cells.get(cell)
+                    if not members:
+                        continue
+                    remaining -= len(members)
+                    for node_id, point in members.items():
+                        distance = origin.distance_to(point)
+                        if len(best) < k:
+                            heapq.heappush(best, (-distance, node_id))
+                        elif distance < -best[0][0]:
+                            heapq.heapreplace(best, (-distance, node_id))
+                if len(best) == k and -best[0][0] <= ring * ring_km:
+                    break
+                ring += 1
+        return sorted(((node_id, -neg) for neg, node_id in best), key=lambda item: item[1])
+
+    def _scan_nearest(self, origin, k):
+        distances = ((node_id, origin.distance_to(point))
+                     for node_id, (point, _) in self._points.items())
+        return heapq.nsmallest(k, distances, key=lambda item: item[1])
+
+    @staticmethod
+    def _ring(row, col, ring):
+        if ring == 0:
+            yield row, col
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield row - ring, c
+            yield row + ring, c
+        for r in range(row - ring + 1, row + ring):
+            yield r, col - ring
+            yield r, col + ring
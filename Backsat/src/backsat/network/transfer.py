@@ -0,0 +1,648 @@
+import base64
+import hashlib
+import heapq
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from .wire import node_hash
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CHUNK_SIZE = 960  # Keeps an encrypted chunk datagram under a 1500 byte MTU
+INITIAL_WINDOW = 4  # Chunks in flight before the first ack
+MAX_WINDOW = 512
+MIN_RTO = 0.2
+MAX_RTO = 5.0
+LOSS_BACKOFF = 0.7  # Window multiplier when a loss looks like congestion
+QUEUE_DELAY_FACTOR = 2.0  # srtt above this multiple of min RTT means queues are building
+REORDER_SLACK = 3  # Sends that may overtake a chunk before it counts as lost
+ACK_EVERY = 8  # Receiver acks after this many new chunks...
+ACK_DELAY = 0.02  # ...or this long after the first unacked one
+MAX_SACK_RANGES = 16
+OFFER_RETRIES = 10
+IDLE_TIMEOUT = 60  # Seconds without progress before an incoming transfer stalls (its .part is kept)
+STALLED_KEEP = 24 * 3600  # Seconds a stalled or paused transfer waits for its peer before it is dropped
+FINISHED_KEEP = 600  # Seconds a finished transfer stays listed in the status
+MAX_FILE_SIZE = 512 * 1024 * 1024  # Largest file we accept from a peer
+MIN_CHUNK_SIZE = 256  # Bounds chunks per file, and so the received-chunk bitmap
+MAX_CHUNK_SIZE = 8192
+
+_TRANSFER_ID = re.compile(r'[0-9a-f]{16}')
+_SHA256 = re.compile(r'[0-9a-f]{64}')
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def validate_offer(offer):
+    """Raise ValueError unless a peer's file_offer is well-formed and within our limits"""
+    transfer_id, name = offer.get('transfer'), offer.get('name')
+    size, chunk_size, total = offer.get('size'), offer.get('chunk_size'), offer.get('total')
+    if not isinstance(transfer_id, str) or not _TRANSFER_ID.fullmatch(transfer_id):
+        raise ValueError(f"Bad transfer ID {transfer_id!r}")
+    if not isinstance(name, str) or '\0' in name or os.path.basename(name) in ('.', '..'):
+        raise ValueError(f"Bad file name {name!r}")
+    if not isinstance(offer.get('sha256'), str) or not _SHA256.fullmatch(offer['sha256']):
+        raise ValueError("Bad checksum")
+    if not all(type(value) is int for value in (size, chunk_size, total)):
+        raise ValueError("Size, chunk size and total must be integers")
+    if not 0 <= size <= MAX_FILE_SIZE:
+        raise ValueError(f"File size {size} outside 0..{MAX_FILE_SIZE}")
+    if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError(f"Chunk size {chunk_size} outside {MIN_CHUNK_SIZE}..{MAX_CHUNK_SIZE}")
+    if total != max(1, math.ceil(size / chunk_size)):
+        raise ValueError(f"{total} chunks don't match {size} bytes in {chunk_size} byte chunks")
+
+def valid_ack(ack, total):
+    """True if a peer's file_ack has an in-range cum and well-formed SACK ranges"""
+    cum, sack = ack.get('cum'), ack.get('sack', ())
+    if type(cum) is not int or not 0 <= cum <= total or not isinstance(sack, list):
+        return False
+    return len(sack) <= MAX_SACK_RANGES and all(
+        isinstance(block, list) and len(block) == 2 and all(type(i) is int for i in block) and
+        0 <= block[0] < block[1] <= total for block in sack)
+
+def reserve_path(directory, name):
+    """Create an empty file for name in directory, numbering it ("name (1).ext") if taken"""
+    root, ext = os.path.splitext(name)
+    for n in range(1000):
+        path = os.path.join(directory, name if n == 0 else f"{root} ({n}){ext}")
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+            return path
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"No free name for {name} in {directory}")
+
+class OutgoingTransfer:
+    """Sender side of one file transfer.
+
+    Chunks are read from disk on demand. A congestion window (slow start,
+    then additive increase) bounds the chunks in flight and sends are paced
+    at cwnd / srtt. Radio links lose packets without being congested, so a
+    loss only cuts the window (by LOSS_BACKOFF, once per loss episode) when
+    the smoothed RTT shows queues building up. Acks carry the
+    cumulative position plus selective ranges, so only chunks that were
+    actually lost are retransmitted: either on RTO or when REORDER_SLACK
+    later sends have been acked first.
+    """
+
+    def __init__(self, transfer_id, node_id, path, sha256, chunk_size=CHUNK_SIZE, clock=time.time):
+        self.id = transfer_id
+        self.clock = clock
+        self.node_id = node_id
+        self.path = path
+        self.name = os.path.basename(path)
+        self.size = os.path.getsize(path)
+        self.sha256 = sha256
+        self.chunk_size = chunk_size
+        self.total = max(1, math.ceil(self.size / chunk_size))
+        self.file = open(path, 'rb')
+        self.acked = bytearray(self.total)
+        self.acked_count = 0
+        self.cum = 0  # Every chunk below this is acked
+        self.next_new = 0
+        self.in_flight = OrderedDict()  # {index: (sent_at, send_seq, retransmitted)}, oldest send first
+        self.lost = []  # heap of indices waiting for retransmission
+        self.send_seq = 0
+        self.cwnd = float(INITIAL_WINDOW)
+        self.ssthresh = float(MAX_WINDOW)
+        self.srtt = None
+        self.rttvar = None
+        self.min_rtt = None
+        self.rto = 1.0
+        self.recovery_seq = 0  # Losses among sends before this seq belong to the last cut
+        self.last_ack_at = clock()
+        self.send_credit = 0.0
+        self.last_tick = clock()
+        self.state = 'offering'
+        self.offer_sent_at = 0
+        self.offer_attempts = 0
+        self.started_at = clock()
+        self.finished_at = None
+        self.chunks_sent = 0
+        self.retransmits = 0
+
+    def offer(self):
+        return {
+            'type': 'file_offer',
+            'transfer': self.id,
+            'name': self.name,
+            'size': self.size,
+            'chunk_size': self.chunk_size,
+            'total': self.total,
+            'sha256': self.sha256
+        }
+
+    def read_chunk(self, index):
+        self.file.seek(index * self.chunk_size)
+        return self.file.read(self.chunk_size)
+
+    def close(self):
+        self.file.close()
+
+    def restart(self):
+        """Go back to offering, e.g. after the peer dropped out and came back"""
+        for index in self.in_flight:
+            heapq.heappush(self.lost, index)
+        self.in_flight.clear()
+        self.cwnd = float(INITIAL_WINDOW)
+        self.state = 'offering'
+        self.offer_attempts = 0
+        self.offer_sent_at = 0
+
+    def _sample_rtt(self, rtt):
+        self.min_rtt = rtt if self.min_rtt is None else min(self.min_rtt, rtt)
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.rto = min(MAX_RTO, max(MIN_RTO, self.srtt + 4 * self.rttvar))
+
+    def _mark_acked(self, index, now):
+        if not 0 <= index < self.total or self.acked[index]:
+            return None
+        self.acked[index] = 1
+        self.acked_count += 1
+        sent = self.in_flight.pop(index, None)
+        if sent and not sent[2]:
+            self._sample_rtt(now - sent[0])  # Karn: never sample retransmitted chunks
+        return sent
+
+    def _congested(self):
+        if self.srtt is None:
+            return True
+        return self.srtt > QUEUE_DELAY_FACTOR * self.min_rtt + ACK_DELAY
+
+    def _on_loss(self, seq):
+        if seq < self.recovery_seq or not self._congested():
+            return
+        self.recovery_seq = self.send_seq
+        self.ssthresh = max(self.cwnd * LOSS_BACKOFF, float(INITIAL_WINDOW))
+        self.cwnd = self.ssthresh
+
+    def on_ack(self, ack, now):
+        self.last_ack_at = now
+        newest_seq = -1
+        newly_acked = 0
+        for index in range(self.cum, min(ack['cum'], self.total)):
+            if self.acked[index]:
+                continue
+            sent = self._mark_acked(index, now)
+            newly_acked += 1
+            if sent:
+                newest_seq = max(newest_seq, sent[1])
+        self.cum = max(self.cum, min(ack['cum'], self.total))
+        for start, end in ack.get('sack', ()):
+            for index in range(start, min(end, self.total)):
+                if self.acked[index]:
+                    continue
+                sent = self._mark_acked(index, now)
+                newly_acked += 1
+                if sent:
+                    newest_seq = max(newest_seq, sent[1])
+        # Window growth: slow start, then roughly +1 chunk per RTT
+        for _ in range(newly_acked):
+            if self.cwnd < self.ssthresh:
+                self.cwnd += 1
+            else:
+                self.cwnd += 1 / self.cwnd
+        self.cwnd = min(self.cwnd, MAX_WINDOW)
+        # Anything sent well before a chunk that already arrived is lost
+        if newest_seq >= 0:
+            lost = [(index, seq) for index, (_, seq, _) in self.in_flight.items()
+                    if seq < newest_seq - REORDER_SLACK]
+            for index, seq in lost:
+                del self.in_flight[index]
+                heapq.heappush(self.lost, index)
+                self._on_loss(seq)
+
+    def expire(self, now):
+        """Move chunks outstanding longer than RTO to the retransmit heap"""
+        timed_out = False
+        while self.in_flight:
+            index, (sent_at, seq, _) = next(iter(self.in_flight.items()))
+            if now - sent_at < self.rto:
+                break
+            del self.in_flight[index]
+            heapq.heappush(self.lost, index)
+            self._on_loss(seq)
+            timed_out = True
+        if timed_out:
+            # Back off only when acks stopped altogether, not for scattered losses
+            if now - self.last_ack_at > self.rto:
+                self.rto = min(MAX_RTO, self.rto * 2)
+
+    def next_chunk(self):
+        """(index, retransmission) to send next, or None when there is nothing to send"""
+        while self.lost:
+            index = heapq.heappop(self.lost)
+            if not self.acked[index] and index not in self.in_flight:
+                return index, True
+        while self.next_new < self.total and self.acked[self.next_new]:
+            self.next_new += 1
+        if self.next_new < self.total:
+            self.next_new += 1
+            return self.next_new - 1, False
+        return None
+
+    def record_send(self, index, now, retransmitted):
+        self.in_flight[index] = (now, self.send_seq, retransmitted)
+        self.send_seq += 1
+        self.chunks_sent += 1
+        if retransmitted:
+            self.retransmits += 1
+
+    @property
+    def complete(self):
+        return self.acked_count == self.total
+
+    def status(self):
+        elapsed = (self.finished_at or self.clock()) - self.started_at
+        done_bytes = min(self.size, self.acked_count * self.chunk_size)
+        return {
+            'id': self.id,
+            'direction': 'out',
+            'peer': self.node_id,
+            'name': self.name,
+            'size': self.size,
+            'state': self.state,
+            'progress': self.acked_count / self.total,
+            'rate_bps': done_bytes / elapsed if elapsed > 0 else 0,
+            'cwnd': round(self.cwnd, 1),
+            'srtt': self.srtt,
+            'retransmits': self.retransmits
+        }
+
+class IncomingTransfer:
+    """Receiver side: writes chunks in place into a .part file and acks them.
+
+    The offer must have passed validate_offer(): its ID names the .part
+    file and its sizes set the file length and the chunk bitmap. A
+    transfer that stalls closes the file but keeps it and the bitmap, so
+    a re-offer resumes it; a finished file never overwrites an existing
+    download of the same name.
+    """
+
+    def __init__(self, offer, node_id, directory, clock=time.time):
+        self.id = offer['transfer']
+        self.clock = clock
+        self.node_id = node_id
+        self.name = os.path.basename(offer['name']) or self.id
+        self.size = offer['size']
+        self.chunk_size = offer['chunk_size']
+        self.total = offer['total']
+        self.sha256 = offer['sha256']
+        self.directory = directory
+        self.path = None  # Picked when the file is complete
+        self.part_path = os.path.join(directory, f".{self.id}.part")
+        self.file = None
+        self._open()
+        self.received = bytearray(self.total)
+        self.count = 0
+        self.cum = 0
+        self.unacked = 0
+        self.first_unacked_at = None
+        self.state = 'receiving'
+        self.started_at = clock()
+        self.last_progress = self.started_at  # Last new chunk or (re-)offer
+        self.finished_at = None
+
+    def _open(self):
+        mode = 'r+b' if os.path.exists(self.part_path) else 'w+b'
+        self.file = open(self.part_path, mode)
+        self.file.truncate(self.size)
+
+    def stall(self):
+        """Stop waiting for chunks, keeping the .part file and bitmap for a resume"""
+        self.state = 'stalled'
+        self.file.close()
+
+    def resume(self, now):
+        """Pick a stalled transfer up again after a re-offer"""
+        self._open()
+        self.state = 'receiving'
+        self.last_progress = now
+
+    def on_chunk(self, index, data, now):
+        """Store a chunk; returns True when an ack should go out now"""
+        if self.state != 'receiving':
+            return True
+        if type(index) is not int or not 0 <= index < self.total or len(data) > self.chunk_size:
+            return False
+        if self.received[index]:
+            return True  # Duplicate: our ack was probably lost
+        self.file.seek(index * self.chunk_size)
+        self.file.write(data)
+        self.received[index] = 1
+        self.count += 1
+        self.last_progress = now
+        # Out-of-order arrivals are acked at once so the sender spots losses quickly
+        out_of_order = index != self.cum
+        while self.cum < self.total and self.received[self.cum]:
+            self.cum += 1
+        self.unacked += 1
+        if self.first_unacked_at is None:
+            self.first_unacked_at = now
+        return self.unacked >= ACK_EVERY or out_of_order or self.count == self.total
+
+    def ack_due(self, now):
+        return self.first_unacked_at is not None and now - self.first_unacked_at >= ACK_DELAY
+
+    def ack(self):
+        self.unacked = 0
+        self.first_unacked_at = None
+        sack = []
+        pos = self.cum
+        while len(sack) < MAX_SACK_RANGES:
+            start = self.received.find(1, pos)
+            if start < 0:
+                break
+            end = self.received.find(0, start)
+            end = self.total if end < 0 else end
+            sack.append([start, end])
+            pos = end
+        return {
+            'type': 'file_ack',
+            'transfer': self.id,
+            'cum': self.cum,
+            'sack': sack,
+            'state': self.state
+        }
+
+    @property
+    def complete(self):
+        return self.count == self.total
+
+    def finish(self):
+        """Verify the checksum and move the file into place (runs off the loop)"""
+        try:
+            self.file.close()
+            if file_sha256(self.part_path) != self.sha256:
+                self.state = 'failed'
+                logger.error(f"Checksum mismatch for {self.name}, discarding")
+                os.remove(self.part_path)
+            else:
+                self.path = reserve_path(self.directory, self.name)
+                os.replace(self.part_path, self.path)
+                self.state = 'done'
+                logger.info(f"Received {os.path.basename(self.path)} ({self.size} bytes) "
+                            f"from {self.node_id}")
+        except OSError as e:
+            logger.error(f"Could not store {self.name}: {e}")
+            self.abort()
+        self.finished_at = self.clock()
+
+    def abort(self):
+        """Give up: close and delete the .part file"""
+        self.state = 'failed'
+        self.finished_at = self.clock()
+        try:
+            self.file.close()
+            os.remove(self.part_path)
+        except OSError:
+            pass
+
+    def status(self):
+        elapsed = (self.finished_at or self.clock()) - self.started_at
+        done_bytes = min(self.size, self.count * self.chunk_size)
+        return {
+            'id': self.id,
+            'direction': 'in',
+            'peer': self.node_id,
+            'name': self.name,
+            'size': self.size,
+            'state': self.state,
+            'progress': self.count / self.total,
+            'rate_bps': done_bytes / elapsed if elapsed > 0 else 0
+        }
+
+class FileTransferManager:
+    """Chunked, resumable file transfers between directly reachable nodes.
+
+    Everything except send_file() and get_status() runs on the engine loop.
+    Transfers to a peer that drops out of the node table pause, and resume
+    from the receiver's ack state (re-offer, then only the missing chunks)
+    once the peer is seen again. On the receiving side, a transfer that
+    makes no progress for IDLE_TIMEOUT stalls: the timer stops, but the
+    .part file and bitmap stay until STALLED_KEEP, so the sender's
+    re-offer resumes it however long the peer was gone. Offers are
+    checked with validate_offer() before anything touches the disk, and
+    chunks and acks are only taken from the transfer's peer. Finished
+    transfers are dropped from the tables after FINISHED_KEEP. The tick
+    timer only runs while a transfer is active, so idle nodes don't wake
+    up every TICK_INTERVAL.
+    """
+
+    TICK_INTERVAL = 0.01
+
+    def __init__(self, mesh, download_dir):
+        self.mesh = mesh
+        self.clock = mesh.clock
+        self.download_dir = download_dir
+        self.outgoing = {}
+        self.incoming = {}
+        self._ticking = False
+
+    def start(self):
+        if self._active():
+            self._arm()
+
+    def _active(self):
+        return (any(t.state == 'receiving' for t in self.incoming.values()) or
+                any(t.state in ('offering', 'sending') for t in self.outgoing.values()))
+
+    def _arm(self):
+        if not self._ticking and self.mesh.engine:
+            self._ticking = True
+            self.mesh.engine.call_later(self.TICK_INTERVAL, self._run_tick)
+
+    def _run_tick(self):
+        self._ticking = False
+        if not self.mesh.running:
+            return
+        try:
+            self.tick()
+        except Exception as e:
+            logger.error(f"Error in transfer tick: {e}")
+        if self._active():
+            self._arm()
+
+    def send_file(self, node_id, path):
+        """Start sending path to node_id; returns the transfer ID"""
+        transfer = OutgoingTransfer(os.urandom(8).hex(), node_id, path, file_sha256(path),
+                                    clock=self.clock)
+        self.mesh.engine.call_soon(self._add_outgoing, transfer)
+        return transfer.id
+
+    def _add_outgoing(self, transfer):
+        self._prune()
+        self.outgoing[transfer.id] = transfer
+        self._arm()
+        logger.info(f"Sending {transfer.name} ({transfer.size} bytes) to {transfer.node_id}")
+
+    def handle(self, message, addr, sender=None):
+        """Handle a transfer message sealed by the node whose hash is sender"""
+        kind = message['type']
+        if kind == 'file_chunk':
+            self._on_chunk(message, sender)
+        elif kind == 'file_ack':
+            transfer = self.outgoing.get(message['transfer'])
+            if transfer is None or node_hash(transfer.node_id) != sender:
+                return
+            if not valid_ack(message, transfer.total):
+                logger.debug(f"Malformed ack for {transfer.name} from {transfer.node_id}")
+                return
+            if transfer.state in ('offering', 'sending'):
+                transfer.state = 'sending'
+                transfer.on_ack(message, self.clock())
+                if transfer.complete or message.get('state') == 'done':
+                    self._finish_outgoing(transfer, 'done')
+                elif message.get('state') == 'failed':
+                    self._finish_outgoing(transfer, 'failed')
+        elif kind == 'file_offer':
+            self._on_offer(message, sender)
+
+    def _on_offer(self, offer, sender):
+        try:
+            validate_offer(offer)
+            if not isinstance(offer.get('from'), str) or node_hash(offer['from']) != sender:
+                raise ValueError("Offer must name the node that sent it")
+        except ValueError as e:
+            logger.warning(f"Rejected file offer from {offer.get('from')}: {e}")
+            return
+        self._prune()
+        transfer = self.incoming.get(offer['transfer'])
+        if transfer is None:
+            os.makedirs(self.download_dir, exist_ok=True)
+            transfer = IncomingTransfer(offer, offer.get('from'), self.download_dir, self.clock)
+            self.incoming[transfer.id] = transfer
+            logger.info(f"Receiving {transfer.name} ({transfer.size} bytes) from {transfer.node_id}")
+            self._arm()
+        elif transfer.node_id != offer['from']:
+            return
+        elif transfer.state == 'receiving':
+            transfer.last_progress = self.clock()
+        elif transfer.state == 'stalled':
+            try:
+                transfer.resume(self.clock())
+            except OSError as e:
+                logger.error(f"Could not resume {transfer.name}: {e}")
+                transfer.abort()
+            else:
+                logger.info(f"Resuming {transfer.name} from {transfer.node_id}")
+                self._arm()
+        # (Re-)offer doubles as the resume handshake: answer with what we have
+        self._send_ack(transfer)
+
+    def _on_chunk(self, message, sender):
+        transfer = self.incoming.get(message['transfer'])
+        if transfer is None or node_hash(transfer.node_id) != sender:
+            return
+        data = message['data']
+        if isinstance(data, str):  # JSON-only peers send base64
+            data = base64.b64decode(data)
+        if transfer.on_chunk(message['index'], data, self.clock()):
+            if transfer.complete and transfer.state == 'receiving':
+                transfer.state = 'verifying'
+                threading.Thread(target=self._finish_incoming, args=(transfer,), daemon=True).start()
+            else:
+                self._send_ack(transfer)
+
+    def _finish_incoming(self, transfer):
+        try:
+            transfer.finish()
+        except Exception as e:
+            logger.error(f"Error finishing {transfer.name}: {e}")
+            transfer.abort()
+        self.mesh.engine.call_soon(self._send_ack, transfer)
+
+    def _send_ack(self, transfer):
+        self.mesh.send_to_node(transfer.node_id, transfer.ack())
+
+    def _finish_outgoing(self, transfer, state):
+        transfer.state = state
+        transfer.finished_at = self.clock()
+        transfer.close()
+        logger.info(f"Transfer {transfer.name} to {transfer.node_id}: {state}")
+
+    def peer_appeared(self, node_id):
+        for transfer in self.outgoing.values():
+            if transfer.node_id == node_id and transfer.state == 'paused':
+                transfer.restart()
+                self._arm()
+                logger.info(f"Resuming {transfer.name} to {node_id}")
+
+    def tick(self):
+        now = self.clock()
+        for transfer in self.incoming.values():
+            if transfer.state != 'receiving':
+                continue
+            if now - transfer.last_progress > IDLE_TIMEOUT:
+                transfer.stall()
+                logger.warning(f"Stalled {transfer.name} from {transfer.node_id}: "
+                               f"no progress for {IDLE_TIMEOUT}s, waiting for a re-offer")
+            elif transfer.ack_due(now):
+                self._send_ack(transfer)
+        for transfer in list(self.outgoing.values()):
+            if transfer.state in ('offering', 'sending') and transfer.node_id not in self.mesh.nodes:
+                transfer.state = 'paused'
+                logger.info(f"Pausing {transfer.name}: {transfer.node_id} out of range")
+            elif transfer.state == 'offering':
+                self._tick_offer(transfer, now)
+            elif transfer.state == 'sending':
+                self._tick_send(transfer, now)
+        self._prune()
+
+    def _tick_offer(self, transfer, now):
+        if now - transfer.offer_sent_at < transfer.rto:
+            return
+        if transfer.offer_attempts >= OFFER_RETRIES:
+            self._finish_outgoing(transfer, 'failed')
+            return
+        transfer.offer_attempts += 1
+        transfer.offer_sent_at = now
+        self.mesh.send_to_node(transfer.node_id, dict(transfer.offer(), **{'from': self.mesh.node_id}))
+
+    def _tick_send(self, transfer, now):
+        transfer.expire(now)
+        # Pace at cwnd per srtt, allowing at most one window of credit to build up
+        elapsed = now - transfer.last_tick
+        transfer.last_tick = now
+        rate = transfer.cwnd / (transfer.srtt or transfer.rto)
+        transfer.send_credit = min(transfer.cwnd, transfer.send_credit + elapsed * rate)
+        while transfer.send_credit >= 1 and len(transfer.in_flight) < int(transfer.cwnd):
+            chunk = transfer.next_chunk()
+            if chunk is None:
+                break
+            index, retransmitted = chunk
+            self.mesh.send_chunk(transfer.node_id, transfer.id, index, transfer.read_chunk(index))
+            transfer.record_send(index, now, retransmitted)
+            transfer.send_credit -= 1
+
+    def _prune(self):
+        """Forget finished transfers, and give up on ones whose peer stayed away too long"""
+        now = self.clock()
+        for transfer in self.incoming.values():
+            if transfer.state == 'stalled' and now - transfer.last_progress > STALLED_KEEP:
+                transfer.abort()
+        for transfer in self.outgoing.values():
+            if transfer.state == 'paused' and now - transfer.last_ack_at > STALLED_KEEP:
+                self._finish_outgoing(transfer, 'failed')
+        for table in (self.incoming, self.outgoing):
+            for transfer_id, transfer in list(table.items()):
+                if transfer.finished_at is not None and now - transfer.finished_at > FINISHED_KEEP:
+                    del table[transfer_id]
+
+    def get_status(self):
+        transfers = list(self.outgoing.values()) + list(self.incoming.values())
+        return [transfer.status() for transfer in transfers]
@@ -0,0 +1,59 @@
+import random
+import socket
+import time
+from .engine import MeshEngine
+
+BROADCAST = '<broadcast>'
+
+class UDPTransport:
+    """The real network: one UDP socket with broadcast enabled.
+
+    A transport decides how datagrams leave and arrive, which engine drives
+    the node and what clock it runs on. MeshNetwork only talks to it through
+    port, socket, clock, random, create_engine(), heard(), stripe(), sendto()
+    and close(), so a simulated transport (see sim.py) can stand in for it.
+    """
+
+    MAX_PORTS = 100  # Ports tried from start_port upwards
+
+    def __init__(self, start_port=5000):
+        self.start_port = start_port
+        self.port = self._find_available_port()
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        self.socket.bind(('0.0.0.0', self.port))
+        self.clock = time.time
+        self.random = random.Random()
+
+    def _find_available_port(self):
+        """Find first available port starting from start_port"""
+        port = self.start_port
+        max_port = self.start_port + self.MAX_PORTS
+
+        while port < max_port:
+            try:
+                with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                    s.bind(('0.0.0.0', port))
+                    return port
+            except OSError:
+                port += 1
+
+        raise RuntimeError(f"No available ports found between {self.start_port} and {max_port}")
+
+    def create_engine(self, mesh):
+        return MeshEngine(mesh)
+
+    def heard(self, sender, addr, link, authenticated):
+        """Address to know sender by after a decoded frame from addr (one link: addr itself)"""
+        return addr
+
+    def stripe(self, addr):
+        """Address for the next bulk datagram to the peer at addr (one link: addr itself)"""
+        return addr
+
+    def sendto(self, data, addr):
+        """Send outside the engine (before start or after stop)"""
+        self.socket.sendto(data, addr)
+
+    def close(self):
+        self.socket.close()
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import struct
+import threading
+
+MAGIC = 0xB5
+VERSION = 1
+
+# Codec names advertised in beacons, in order of preference
+CODEC_BINARY = 'bin1'
+CODEC_JSON = 'json'
+
+TYPE_DISCOVERY = 1
+TYPE_MESSAGE = 2
+TYPE_CHUNK = 3
+
+FLAG_LOCATION = 0x01
+FLAG_NAME = 0x02
+FLAG_JSON_OK = 0x04  # Sender also understands JSON
+FLAG_PUBKEY = 0x08  # Beacon carries the sender's X25519 public key
+FLAG_HOLD = 0x10  # Beacon carries the sender's hold time
+FLAG_TELEMETRY = 0x20  # Beacon carries the sender's health summary
+
+COORD_SCALE = 10_000_000  # Fixed-point lat/lon, 1e-7 degree (~1 cm) resolution
+
+_HEADER = struct.Struct('!BBBB8s')  # magic, version, type, flags, node hash
+_BEACON = struct.Struct('!HI')  # port, timestamp (s)
+_COORDS = struct.Struct('!ii')
+_NAME_LEN = struct.Struct('!B')
+_CHUNK = struct.Struct('!8sI')  # transfer ID, chunk index
+_HOLD = struct.Struct('!H')  # hold time, 1/10 s; trailing, so older decoders skip it
+_TELEMETRY = struct.Struct('!BBBb')  # cpu %, memory %, battery %, temperature °C; after hold
+NO_BATTERY = 0xFF
+NO_TEMP = -128
+PUBKEY_SIZE = 32
+
+ID_SIZE = 8
+
+class WireError(ValueError):
+    """Raised for datagrams that can't be decoded"""
+
+class UnknownNode(WireError):
+    """Raised when a binary frame references a node ID we haven't learned yet"""
+
+def node_hash(node_id):
+    """8-byte wire identity for a node ID string"""
+    return hashlib.blake2b(node_id.encode(), digest_size=ID_SIZE).digest()
+
+class WireCodec:
+    """Versioned binary wire format with a JSON fallback.
+
+    Binary frames start with MAGIC and carry node IDs as 8-byte hashes
+    (interned: the full name only travels in some beacons and is remembered
+    by receivers), the timestamp as whole seconds and coordinates as 1e-7
+    degree fixed point. JSON datagrams are recognised by their leading '{'
+    so nodes running the old format keep working. Frames may be decoded
+    on several ingress workers at once; the name table is locked for
+    writes and read with single dict lookups.
+    """
+
+    MAX_NAMES = 4096  # Bound on the learned hash -> node ID table
+
+    def __init__(self, node_id):
+        self.node_id = node_id
+        self.node_hash = node_hash(node_id)
+        self._names = {self.node_hash: node_id}
+        self._lock = threading.Lock()
+
+    def learn(self, node_id):
+        key = node_hash(node_id)
+        if key not in self._names:
+            with self._lock:
+                if key not in self._names:
+                    if len(self._names) >= self.MAX_NAMES:
+                        # Forget the oldest entry; it is re-learned from the next named beacon
+                        self._names.pop(next(iter(self._names)))
+                    self._names[key] = node_id
+        return key
+
+    def lookup(self, key):
+        name = self._names.get(key)
+        if name is None:
+            raise UnknownNode(f"Unknown node {key.hex()}")
+        return name
+
+    def encode_beacon(self, port, timestamp, location=None, include_name=True, public_key=None,
+                      hold=None, telemetry=None):
+        flags = FLAG_JSON_OK
+        if location:
+            flags |= FLAG_LOCATION
+        if include_name:
+            flags |= FLAG_NAME
+        if public_key:
+            flags |= FLAG_PUBKEY
+        if hold:
+            flags |= FLAG_HOLD
+        if telemetry:
+            flags |= FLAG_TELEMETRY
+        parts = [_HEADER.pack(MAGIC, VERSION, TYPE_DISCOVERY, flags, self.node_hash),
+                 _BEACON.pack(port, int(timestamp) & 0xFFFFFFFF)]
+        if location:
+            parts.append(_COORDS.pack(round(location['lat'] * COORD_SCALE),
+                                      round(location['lon'] * COORD_SCALE)))
+        if include_name:
+            name = self.node_id.encode()[:255]
+            parts.append(_NAME_LEN.pack(len(name)) + name)
+        if public_key:
+            parts.append(public_key)
+        if hold:
+            parts.append(_HOLD.pack(min(0xFFFF, round(hold * 10))))
+        if telemetry:
+            battery, temp = telemetry.get('battery'), telemetry.get('temp')
+            parts.append(_TELEMETRY.pack(
+                max(0, min(100, telemetry['cpu'])), max(0, min(100, telemetry['memory'])),
+                NO_BATTERY if battery is None else max(0, min(100, battery)),
+                NO_TEMP if temp is None else max(-127, min(127, temp))))
+        return b''.join(parts)
+
+    def encode_message(self, message):
+        """Binary frame around a compact JSON body for application messages"""
+        body = json.dumps(message, separators=(',', ':')).encode()
+        return _HEADER.pack(MAGIC, VERSION, TYPE_MESSAGE, FLAG_JSON_OK, self.node_hash) + body
+
+    def encode_chunk(self, transfer_id, index, data):
+        """Binary frame for one file chunk; data travels raw, not base64"""
+        return (_HEADER.pack(MAGIC, VERSION, TYPE_CHUNK, FLAG_JSON_OK, self.node_hash)
+                + _CHUNK.pack(bytes.fromhex(transfer_id), index) + data)
+
+    @staticmethod
+    def encode_json(message):
+        return json.dumps(message, separators=(',', ':')).encode()
+
+    def decode(self, data):
+        """Decode a binary or JSON datagram into the dict shape used by MeshNetwork"""
+        if not data:
+            raise WireError("Empty datagram")
+        if data[0] != MAGIC:
+            try:
+                message = json.loads(data)
+            except (ValueError, RecursionError) as e:  # UnicodeDecodeError is a ValueError
+                raise WireError(f"Invalid JSON datagram: {e}") from None
+            if not isinstance(message, dict) or not isinstance(message.get('type'), str):
+                raise WireError("JSON datagram is not a typed object")
+            return message
+        if len(data) < _HEADER.size:
+            raise WireError("Truncated header")
+        _, version, msg_type, flags, key = _HEADER.unpack_from(data)
+        if version != VERSION:
+            raise WireError(f"Unsupported wire version {version}")
+        offset = _HEADER.size
+        if msg_type == TYPE_DISCOVERY:
+            return self._decode_beacon(data, offset, flags, key)
+        if msg_type == TYPE_MESSAGE:
+            try:
+                message = json.loads(data[offset:])
+            except (ValueError, RecursionError) as e:
+                raise WireError(f"Invalid message body: {e}") from None
+            if not isinstance(message, dict) or not isinstance(message.get('type'), str):
+                raise WireError("Message body is not a typed object")
+            sender = self._names.get(key)
+            if sender is not None:
+                message.setdefault('sender', sender)
+            return message
+        if msg_type == TYPE_CHUNK:
+            if len(data) < offset + _CHUNK.size:
+                raise WireError("Truncated chunk")
+            transfer_id, index = _CHUNK.unpack_from(data, offset)
+            return {
+                'type': 'file_chunk',
+                'transfer': transfer_id.hex(),
+                'index': index,
+                'data': data[offset + _CHUNK.size:]
+            }
+        raise WireError(f"Unknown frame type {msg_type}")
+
+    def _decode_beacon(self, data, offset, flags, key):
+        try:
+            port, timestamp = _BEACON.unpack_from(data, offset)
+            offset += _BEACON.size
+            location = None
+            if flags & FLAG_LOCATION:
+                lat, lon = _COORDS.unpack_from(data, offset)
+                offset += _COORDS.size
+                location = {'lat': lat / COORD_SCALE, 'lon': lon / COORD_SCALE}
+            if flags & FLAG_NAME:
+                (length,) = _NAME_LEN.unpack_from(data, offset)
+                offset += _NAME_LEN.size
+                name = data[offset:offset + length].decode()
+                if node_hash(name) != key:
+                    raise WireError("Node ID does not match its hash")
+                self.learn(name)
+                offset += length
+            public_key = None
+            if flags & FLAG_PUBKEY:
+                public_key = data[offset:offset + PUBKEY_SIZE]
+                if len(public_key) != PUBKEY_SIZE:
+                    raise WireError("Truncated public key")
+                offset += PUBKEY_SIZE
+            hold = None
+            if flags & FLAG_HOLD:
+                (hold,) = _HOLD.unpack_from(data, offset)
+                offset += _HOLD.size
+                hold /= 10
+            telemetry = None
+            if flags & FLAG_TELEMETRY:
+                cpu, memory, battery, temp = _TELEMETRY.unpack_from(data, offset)
+                telemetry = {
+                    'cpu': cpu,
+                    'memory': memory,
+                    'battery': None if battery == NO_BATTERY else battery,
+                    'temp': None if temp == NO_TEMP else temp
+                }
+        except (struct.error, UnicodeDecodeError) as e:
+            raise WireError(f"Truncated beacon: {e}") from None
+        codecs = [CODEC_BINARY, CODEC_JSON] if flags & FLAG_JSON_OK else [CODEC_BINARY]
+        beacon = {
+            'type': 'discovery',
+            'node_id': self.lookup(key),
+            'port': port,
+            'timestamp': timestamp,
+            'location': location,
+            'codecs': codecs
+        }
+        if public_key:
+            beacon['pubkey'] = public_key
+        if hold:
+            beacon['hold'] = hold
+        if telemetry:
+            beacon['telemetry'] = telemetry
+        return beacon
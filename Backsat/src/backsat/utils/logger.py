@@ -1,16 +1,74 @@
 import logging
-from rich.logging import RichHandler
-from rich.console import Console
+import threading
+import time
 
-console = Console()
+_configured = False
+_configure_lock = threading.Lock()
+
+class RateLimitFilter(logging.Filter):
+    """Lets at most BURST records per call site through every INTERVAL seconds.
+
+    Hot paths (decode errors, full send buffers) can fail thousands of times
+    a second; formatting and printing each one would cost more than the
+    failure. The first record let through after a quiet window says how
+    many were suppressed. Only the levels hot paths use are limited: they
+    fail at ERROR and trace at DEBUG. Info lines (nodes joining and leaving),
+    warnings (SOS, rejected peers) and critical records always pass.
+    """
+
+    INTERVAL = 10.0  # Seconds
+    BURST = 5  # Records per call site per interval
+    LEVELS = (logging.DEBUG, logging.ERROR)  # Levels that are rate limited
+
+    def __init__(self, interval=None, burst=None):
+        super().__init__()
+        self.interval = interval or self.INTERVAL
+        self.burst = burst or self.BURST
+        self._sites = {}  # {(path, line): [window start, records, suppressed]}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno not in self.LEVELS:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.interval:
+                suppressed = site[2] if site else 0
+                self._sites[key] = [now, 1, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+                return True
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+            site[2] += 1
+            return False
+
+def configure(level="INFO", rich=True):
+    """Install the root log handler; only the first call (or get_logger) has any effect.
+
+    rich=False logs plain lines and never imports rich, for headless nodes
+    where its import time and memory matter.
+    """
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        _configured = True
+        if rich:
+            from rich.console import Console
+            from rich.logging import RichHandler
+            handler = RichHandler(console=Console(), rich_tracebacks=True)
+            handler.setFormatter(logging.Formatter("%(message)s", datefmt="[%X]"))
+        else:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s",
+                                                   datefmt="%H:%M:%S"))
+        handler.addFilter(RateLimitFilter())
+        logging.basicConfig(level=level, handlers=[handler])
 
 def get_logger(name):
-    logging.basicConfig(
-        level="INFO",
-        format="%(message)s",
-        datefmt="[%X]",
-        handlers=[RichHandler(console=console, rich_tracebacks=True)]
-    )
-    
-    logger = logging.getLogger(name)
-    return logger 
\ No newline at end of file
+    configure()
+    return logging.getLogger(name)
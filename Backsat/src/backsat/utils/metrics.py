@@ -0,0 +1,215 @@
+import bisect
+import math
+import threading
+import time
+
+# Seconds; spans a fast decode (tens of µs) to a stalled handler
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+class Counter:
+    """Monotonically increasing count; safe from any thread"""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+class Histogram:
+    """Observations counted into fixed buckets; safe from any thread"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)  # Last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """Context manager observing the seconds spent in its block"""
+        return _Timer(self)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (None when empty)"""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for bound, count in zip(self.bounds + (math.inf,), counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return math.inf
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+class _Family:
+    """One metric name: a single child, one child per label value, or a callback"""
+
+    def __init__(self, name, help, kind, labels, make, collect):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.label_names = labels
+        self.make = make
+        self.collect = collect
+        self.children = {}  # {label values: Counter | Histogram}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """The child for these label values (keep it: lookups cost a lock)"""
+        values = tuple(str(v) for v in values)
+        if len(values) != len(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}")
+        with self._lock:
+            child = self.children.get(values)
+            if child is None:
+                child = self.children[values] = self.make()
+            return child
+
+    def values(self):
+        """{label values: Counter | Histogram | number}"""
+        if self.collect is None:
+            with self._lock:
+                return dict(self.children)
+        value = self.collect()
+        if value is None:
+            return {}
+        if not isinstance(value, dict):
+            return {(): value}
+        return {k if isinstance(k, tuple) else (str(k),): v for k, v in value.items()}
+
+class MetricsRegistry:
+    """Named counters, histograms and callback gauges for one node.
+
+    Hot paths hold on to the Counter/Histogram they update, so recording
+    costs one lock and an add. Values that components already keep (queue
+    depths, drop counters) are registered as callbacks and read only when
+    someone scrapes: render() produces the Prometheus text format and
+    snapshot() a compact dict for the dashboard.
+    """
+
+    def __init__(self, prefix='backsat_'):
+        self.prefix = prefix
+        self._families = {}  # {name: _Family}
+        self._lock = threading.Lock()
+
+    def _family(self, name, help, kind, labels, make=None, collect=None):
+        name = self.prefix + name
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = _Family(name, help, kind, tuple(labels), make, collect)
+            elif family.kind != kind or family.label_names != tuple(labels):
+                raise ValueError(f"Metric {name} is already registered as a different {family.kind}")
+            elif collect is not None:
+                family.collect = collect  # Re-registered, e.g. by a restarted component
+            return family
+
+    def counter(self, name, help, labels=()):
+        """A Counter, or with labels a family whose .labels(...) gives one"""
+        family = self._family(name, help, 'counter', labels, make=Counter)
+        return family.labels() if not labels else family
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        """A Histogram, or with labels a family whose .labels(...) gives one"""
+        family = self._family(name, help, 'histogram', labels, make=lambda: Histogram(buckets))
+        return family.labels() if not labels else family
+
+    def collect(self, name, help, fn, kind='gauge', labels=()):
+        """Register fn() -> number or {label value(s): number}, read at scrape time"""
+        self._family(name, help, kind, labels, collect=fn)
+
+    def _collected(self):
+        with self._lock:
+            families = list(self._families.values())
+        for family in families:
+            try:
+                values = family.values()
+            except Exception:
+                continue  # A component that is gone or not started yet
+            yield family, values
+
+    @staticmethod
+    def _labels(names, values, extra=None):
+        pairs = list(zip(names, values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+    @staticmethod
+    def _number(value):
+        if value == math.inf:
+            return '+Inf'
+        return repr(float(value)) if isinstance(value, float) else str(value)
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        lines = []
+        for family, values in self._collected():
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for label_values, value in sorted(values.items()):
+                if isinstance(value, Histogram):
+                    with value._lock:
+                        counts, total, sum_ = list(value.counts), value.count, value.sum
+                    cumulative = 0
+                    for bound, count in zip(value.bounds + (math.inf,), counts):
+                        cumulative += count
+                        labels = self._labels(family.label_names, label_values, ('le', self._number(bound)))
+                        lines.append(f"{family.name}_bucket{labels} {cumulative}")
+                    labels = self._labels(family.label_names, label_values)
+                    lines.append(f"{family.name}_sum{labels} {self._number(sum_)}")
+                    lines.append(f"{family.name}_count{labels} {total}")
+                else:
+                    if isinstance(value, Counter):
+                        value = value.value
+                    labels = self._labels(family.label_names, label_values)
+                    lines.append(f"{family.name}{labels} {self._number(value)}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """{name: value, {label: value} or histogram summary}, prefix stripped"""
+        result = {}
+        for family, values in self._collected():
+            entries = {}
+            for label_values, value in values.items():
+                if isinstance(value, Histogram):
+                    # JSON has no infinity: None means beyond the last bucket
+                    value = {'count': value.count, 'sum': round(value.sum, 6),
+                             **{name: None if q == math.inf else q for name, q in
+                                (('p50', value.quantile(0.5)), ('p99', value.quantile(0.99)))}}
+                elif isinstance(value, Counter):
+                    value = value.value
+                entries['/'.join(label_values)] = value
+            name = family.name[len(self.prefix):]
+            result[name] = entries[''] if list(entries) == [''] else entries
+        return result
@@ -0,0 +1,112 @@
+import os
+import sys
+import threading
+import time
+
+class SamplingProfiler:
+    """Statistical profiler for a running node: off until started.
+
+    A background thread snapshots every other thread's stack each INTERVAL
+    and counts identical stacks, so the cost is one stack walk per thread
+    per sample rather than a hook on every call. Threads parked in a lock,
+    condition or selector wait count as idle, so percentages are of the
+    time threads spent running. Under eventlet/gevent only real OS threads
+    are seen (the hub shows up as one thread). Results come out as the most
+    sampled functions or as folded stacks for flamegraph.pl / speedscope.
+    """
+
+    INTERVAL = 0.005  # Seconds between samples
+    MAX_DEPTH = 48  # Frames kept per stack, innermost first
+    MAX_STACKS = 20000  # Distinct stacks kept; the rest are counted as 'other'
+    IDLE_MODULES = ('threading.py', 'selectors.py', 'queue.py')  # Innermost frame here: waiting
+
+    def __init__(self, interval=None):
+        self.interval = interval or self.INTERVAL
+        self._stacks = {}  # {(thread name, frames...): samples}
+        self._lock = threading.Lock()
+        self.samples = 0
+        self.busy = 0  # Thread stacks counted, over all samples
+        self.idle = 0
+        self.started = None
+        self.elapsed = 0.0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """Start sampling from scratch; no-op if already running"""
+        if self.running:
+            return
+        with self._lock:
+            self._stacks = {}
+            self.samples = 0
+            self.busy = 0
+            self.idle = 0
+        self.elapsed = 0.0
+        self.started = time.time()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self.thread.join(timeout=2)
+        self.elapsed = time.time() - self.started
+
+    def _run(self):
+        me = threading.get_ident()
+        while self.running:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, frame in frames.items():
+                    if ident == me:
+                        continue
+                    if os.path.basename(frame.f_code.co_filename) in self.IDLE_MODULES:
+                        self.idle += 1
+                        continue
+                    self.busy += 1
+                    stack = []
+                    while frame is not None and len(stack) < self.MAX_DEPTH:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                        frame = frame.f_back
+                    stack.append(names.get(ident, str(ident)))
+                    key = tuple(reversed(stack))
+                    if key not in self._stacks and len(self._stacks) >= self.MAX_STACKS:
+                        key = (key[0], 'other')
+                    self._stacks[key] = self._stacks.get(key, 0) + 1
+                self.samples += 1
+            time.sleep(self.interval)
+
+    def top(self, limit=25):
+        """Most sampled functions: self (innermost) and total (anywhere on the stack)"""
+        own, total = {}, {}
+        with self._lock:
+            stacks = list(self._stacks.items())
+            busy = self.busy
+        for stack, count in stacks:
+            own[stack[-1]] = own.get(stack[-1], 0) + count
+            for function in set(stack[1:]):
+                total[function] = total.get(function, 0) + count
+        ranked = sorted(own, key=own.get, reverse=True)[:limit]
+        return [{'function': function, 'self': own[function], 'total': total.get(function, own[function]),
+                 'self_pct': round(100 * own[function] / max(busy, 1), 1)} for function in ranked]
+
+    def folded(self):
+        """One 'thread;outer;...;inner count' line per stack"""
+        with self._lock:
+            stacks = list(self._stacks.items())
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(stacks))
+
+    def get_stats(self):
+        return {
+            'running': self.running,
+            'samples': self.samples,
+            'busy': self.busy,
+            'idle': self.idle,
+            'interval': self.interval,
+            'seconds': round(time.time() - self.started if self.running else self.elapsed, 1),
+            'stacks': len(self._stacks)
+        }
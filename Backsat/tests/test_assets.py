@@ -0,0 +1,58 @@
+import hashlib
+import io
+import urllib.request
+import pytest
+from src.backsat.core import assets
+
+@pytest.fixture
+def asset_dirs(tmp_path, monkeypatch):
+    web = tmp_path / 'web'
+    (web / 'vendor').mkdir(parents=True)
+    (web / 'dashboard.js').write_text('console.log("hi")')
+    monkeypatch.setattr(assets, 'ASSET_DIR', str(web))
+    monkeypatch.setattr(assets, 'VENDOR_DIR', str(web / 'vendor'))
+    monkeypatch.setattr(assets, 'DIST_DIR', str(tmp_path / 'dist'))
+    return web / 'vendor'
+
+def offline(url, timeout=None):
+    raise OSError('offline')
+
+def serve(files):
+    """urlopen stand-in serving {url: bytes}"""
+    return lambda url, timeout=None: io.BytesIO(files[url])
+
+def test_missing_vendor_libraries_fail_loudly(asset_dirs, monkeypatch):
+    monkeypatch.setattr(urllib.request, 'urlopen', offline)
+    with pytest.raises(RuntimeError, match='--fetch'):
+        assets.AssetBundle().load()
+
+def test_missing_libraries_are_fetched_on_load(asset_dirs, monkeypatch):
+    files = {url: f'/* {name} */'.encode() for name, (url, _) in assets.VENDOR.items()}
+    monkeypatch.setattr(assets, 'VENDOR', {name: (url, hashlib.sha256(files[url]).hexdigest())
+                                           for name, (url, _) in assets.VENDOR.items()})
+    monkeypatch.setattr(urllib.request, 'urlopen', serve(files))
+    bundle = assets.AssetBundle().load()
+    assert all(bundle.url(name).startswith('/assets/') for name in assets.VENDOR)
+
+def test_download_not_matching_its_pin_is_rejected(asset_dirs, monkeypatch):
+    url = 'https://cdn.example/lib.js'
+    monkeypatch.setattr(assets, 'VENDOR', {'lib.js': (url, hashlib.sha256(b'genuine').hexdigest())})
+    monkeypatch.setattr(urllib.request, 'urlopen', serve({url: b'tampered'}))
+    with pytest.raises(RuntimeError, match='expected'):
+        assets.fetch_vendor()
+    assert not (asset_dirs / 'lib.js').exists()
+
+def test_cdn_only_when_allowed(asset_dirs):
+    bundle = assets.AssetBundle(allow_cdn=True).load()
+    assert bundle.url('chart.umd.js') == assets.VENDOR['chart.umd.js'][0]
+    assert bundle.url('dashboard.js').startswith('/assets/dashboard.')
+
+def test_vendored_libraries_are_served_locally(asset_dirs):
+    for name in assets.VENDOR:
+        (asset_dirs / name).write_text(f'/* {name} */')
+    bundle = assets.AssetBundle().load()
+    for name in assets.VENDOR:
+        url = bundle.url(name)
+        assert url.startswith('/assets/')
+        path, _, encoding = bundle.resolve(url[len('/assets/'):], ('gzip',))
+        assert encoding == 'gzip' and path.endswith('.gz')
@@ -0,0 +1,163 @@
+import os
+import pytest
+from src.backsat.network.crypto import (SessionKeys, KeyMismatch, ReplayedFrame, ReplayWindow,
+                                        SEAL_OVERHEAD, SEALED_MAGIC)
+from src.backsat.network.sim import SimNetwork
+from src.backsat.network.wire import WireCodec, WireError
+
+def paired():
+    a, b = SessionKeys('node_a'), SessionKeys('node_b')
+    assert a.learn('node_b', b.public_key)
+    assert b.learn('node_a', a.public_key)
+    return a, b
+
+def test_seal_open_round_trip():
+    a, b = paired()
+    sealed = a.seal('node_b', b'hello mesh')
+    assert len(sealed) == len(b'hello mesh') + SEAL_OVERHEAD
+    assert b.open(sealed) == b'hello mesh'
+    assert a.open(b.seal('node_a', b'reply')) == b'reply'
+
+def test_no_key_no_seal():
+    a = SessionKeys('node_a')
+    assert a.seal('node_b', b'x') is None
+    with pytest.raises(WireError):
+        a.open(bytes([SEALED_MAGIC]) + bytes(63))
+
+def test_tampered_datagram_fails():
+    a, b = paired()
+    sealed = bytearray(a.seal('node_b', b'hello mesh'))
+    sealed[-20] ^= 1
+    with pytest.raises(WireError):
+        b.open(bytes(sealed))
+    with pytest.raises(WireError):
+        b.open(bytes(sealed[:SEAL_OVERHEAD - 1]))
+
+def test_replayed_datagram_is_rejected():
+    a, b = paired()
+    first, second = a.seal('node_b', b'one'), a.seal('node_b', b'two')
+    assert b.open(second) == b'two'
+    assert b.open(first) == b'one'  # Reordered, but not seen before
+    with pytest.raises(ReplayedFrame):
+        b.open(first)
+    assert b.get_stats()['replays'] == 1
+
+def test_replay_window_drops_counters_that_are_too_old():
+    window = ReplayWindow(b'key')
+    assert window.accept(10 ** 12)
+    assert window.accept(10 ** 12 - ReplayWindow.SIZE + 1)
+    assert not window.accept(10 ** 12 - ReplayWindow.SIZE)
+    assert window.accept(10 ** 12 + 1)
+    assert not window.accept(10 ** 12)
+
+def test_replay_is_rejected_after_the_peer_comes_back():
+    a, b = paired()
+    sealed = a.seal('node_b', b'once')
+    assert b.open(sealed) == b'once'
+    b.forget('node_a')
+    b.learn('node_a', a.public_key)  # Same key, so the same session key
+    with pytest.raises(ReplayedFrame):
+        b.open(sealed)
+    assert b.open(a.seal('node_b', b'fresh')) == b'fresh'
+
+def test_directions_use_distinct_nonces():
+    a, b = paired()
+    to_b, to_a = a.seal('node_b', b'x'), b.seal('node_a', b'x')
+    nonce = slice(SEAL_OVERHEAD - 16 - 12, SEAL_OVERHEAD - 16)
+    assert to_b[nonce][0] != to_a[nonce][0]
+
+def test_first_key_is_pinned():
+    a, b = paired()
+    impostor = SessionKeys('node_b')
+    with pytest.raises(KeyMismatch):
+        a.learn('node_b', impostor.public_key)
+    assert not a.learn('node_b', b.public_key)
+    assert b.open(a.seal('node_b', b'still b')) == b'still b'
+    assert a.get_stats()['key_mismatches'] == 1
+
+def test_forget_allows_a_new_key():
+    a, b = paired()
+    a.forget('node_b')
+    assert not a.has_session('node_b')
+    replacement = SessionKeys('node_b')
+    assert a.learn('node_b', replacement.public_key)
+
+def test_cipher_cache_is_bounded():
+    a = SessionKeys('node_a')
+    a.MAX_CIPHERS = 4
+    peers = {f'peer_{i}': SessionKeys(f'peer_{i}') for i in range(10)}
+    for name, peer in peers.items():
+        a.learn(name, peer.public_key)
+        peer.learn('node_a', a.public_key)
+        assert peer.open(a.seal(name, name.encode())) == name.encode()
+    assert a.get_stats()['cached_ciphers'] == 4
+
+@pytest.fixture
+def meshes(tmp_path):
+    sim = SimNetwork(seed=1)
+    a = sim.add_node(node_id='a', download_dir=str(tmp_path / 'a'))
+    b = sim.add_node(node_id='b', download_dir=str(tmp_path / 'b'))
+    received = []
+    b.add_message_handler(lambda payload, envelope: received.append(payload))
+    a.start()
+    b.start()
+    sim.run(5)
+    yield sim, a, b, received
+    a.stop()
+    b.stop()
+
+def sos_envelope(origin):
+    return {'type': 'routed', 'id': os.urandom(8).hex(), 'origin': origin, 'dest': None,
+            'ttl': 3, 'hops': 0, 'payload': {'type': 'sos', 'text': 'help'}}
+
+def test_sealed_routed_message_is_delivered(meshes):
+    sim, a, b, received = meshes
+    a.router.send({'type': 'sos', 'text': 'help'})
+    sim.run(1)
+    assert received == [{'type': 'sos', 'text': 'help'}]
+
+def test_plaintext_routed_message_is_dropped(meshes):
+    sim, a, b, received = meshes
+    forged = WireCodec('mallory')
+    b._on_datagram(forged.encode_json(sos_envelope('a')), ('10.9.9.9', 5000))
+    b._on_datagram(forged.encode_message(sos_envelope('a')), ('10.9.9.9', 5000))
+    for kind in ('file_offer', 'history_digest', 'chat'):
+        b._on_datagram(forged.encode_json({'type': kind}), ('10.9.9.9', 5000))
+    assert received == []
+    assert b.metrics.snapshot()['mesh_decode_errors_total'] == 5
+
+def test_impostor_beacon_is_ignored(meshes):
+    sim, a, b, received = meshes
+    ip = b.nodes['a'].ip
+    impostor = SessionKeys('a')
+    forged = WireCodec('a').encode_beacon(6000, 1, public_key=impostor.public_key)
+    b._on_datagram(forged, ('10.9.9.9', 6000))
+    assert b.nodes['a'].ip == ip
+    assert b.get_session_stats()['key_mismatches'] == 1
+    a.router.send({'type': 'sos', 'text': 'still a'})
+    sim.run(1)
+    assert received == [{'type': 'sos', 'text': 'still a'}]
+
+def test_replayed_sealed_frame_is_dropped(meshes):
+    sim, a, b, received = meshes
+    sealed = a.sessions.seal('b', a.codec.encode_message(sos_envelope('a')))
+    b._on_datagram(sealed, b.nodes['a'].addr)
+    b._on_datagram(sealed, b.nodes['a'].addr)
+    assert len(received) == 1
+    assert b.get_session_stats()['replays'] == 1
+
+def test_sealed_binary_frame_must_name_its_sealer(meshes):
+    sim, a, b, received = meshes
+    b.codec.learn('c')
+    sealed = a.sessions.seal('b', WireCodec('c').encode_message(sos_envelope('a')))
+    with pytest.raises(WireError):
+        b._decode(sealed)
+
+def test_only_sealed_frames_move_a_known_peer(meshes):
+    sim, a, b, received = meshes
+    addr = b.nodes['a'].addr
+    beacon = a.codec.encode_beacon(6000, 1, public_key=a.sessions.public_key)
+    b._on_datagram(beacon, ('10.9.9.9', 6000))
+    assert b.nodes['a'].addr == addr
+    b._on_datagram(a.sessions.seal('b', a.codec.encode_message({'type': 'probe_ack'})), ('10.9.9.9', 6000))
+    assert b.nodes['a'].addr == ('10.9.9.9', 6000)
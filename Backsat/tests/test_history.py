@@ -0,0 +1,105 @@
+import pytest
+from src.backsat.network.crypto import SEAL_OVERHEAD
+from src.backsat.network.history import MessageHistory, clean_digest
+from src.backsat.network.sim import SimNetwork
+
+def entry(stream, seq, channel='chat'):
+    return {'type': 'chat', 'channel': channel, 'stream': stream, 'seq': seq, 'ts': 0, 'text': 'hi'}
+
+def test_version_vector_marks():
+    history = MessageHistory('a', clock=lambda: 100)
+    assert history.add(entry('b@1', 1))
+    assert history.add(entry('b@1', 3))
+    assert not history.add(entry('b@1', 1))
+    assert history.digest() == {'chat': {'b@1': 1}}
+    history.add(entry('b@1', 2))
+    assert history.digest() == {'chat': {'b@1': 3}}
+    missing = history.missing({'chat': {'b@1': 1}}, limit=10)
+    assert sorted(payload['seq'] for payload in missing['chat']) == [2, 3]
+
+@pytest.mark.parametrize('digest', [[1], 'x', {'chat': []}, {'chat': {'s': 'nope'}},
+                                    {'chat': {'s': -1}}, {'chat': {'s': True}},
+                                    {f'c{i}': {} for i in range(100)}])
+def test_bad_digests_are_rejected(digest):
+    with pytest.raises(ValueError):
+        clean_digest(digest)
+
+def test_good_digest_passes():
+    assert clean_digest(None) == {}
+    assert clean_digest({'chat': {'a@1': 4}}) == {'chat': {'a@1': 4}}
+
+STREAMS = 400
+
+@pytest.fixture
+def meshes(tmp_path):
+    sim = SimNetwork(seed=5)
+    a = sim.add_node(node_id='a', download_dir=str(tmp_path / 'a'))
+    b = sim.add_node(node_id='b', download_dir=str(tmp_path / 'b'))
+    for mesh in (a, b):
+        for i in range(STREAMS):
+            mesh.history.add(entry(f'node_with_a_long_name_{i:04d}@1718000000', 1))
+    yield sim, a, b
+    a.stop()
+    b.stop()
+
+def test_large_digest_fits_datagrams(meshes):
+    sim, a, b = meshes
+    parts = b.history_sync._split(b.history.digest())
+    assert len(parts) > 1
+    assert sum(len(part['chat']) for part in parts) == STREAMS
+    for index, part in enumerate(parts):
+        frame = b.codec.encode_message({'type': 'history_digest', 'from': 'b', 'id': '0011aabb',
+                                        'part': index, 'parts': len(parts), 'digest': part})
+        assert len(frame) + SEAL_OVERHEAD < 1400
+
+def test_split_digest_sync_sends_only_whats_missing(meshes):
+    sim, a, b = meshes
+    a.history.add(entry('late@1', 1))
+    received = []
+    b.add_message_handler(lambda payload, envelope: received.append(payload))
+    a.start()
+    b.start()
+    sim.run(10)
+    assert [payload['stream'] for payload in received] == ['late@1']
+    assert a.history_sync.get_stats()['sent'] == 1
+    assert b.history_sync.get_stats()['sent'] == 0
+
+def test_malformed_sync_messages_are_ignored(meshes):
+    sim, a, b = meshes
+    sync = b.history_sync
+    sync.handle({'type': 'history_digest', 'from': 'a', 'digest': [1]}, None)
+    sync.handle({'type': 'history_digest', 'from': 'a', 'digest': {}, 'part': 5, 'parts': 2}, None)
+    sync.handle({'type': 'history_entries', 'channel': 'chat', 'entries': 'nope'}, None)
+    sync.handle({'type': 'history_entries', 'channel': 'chat',
+                 'entries': [{'channel': 'chat', 'stream': 3, 'seq': 'x'}]}, None)
+    assert sync.get_stats()['rejected'] == 3
+    assert sync.get_stats()['received'] == 0
+
+def test_only_known_channels_are_kept(tmp_path):
+    spill = tmp_path / 'history'
+    history = MessageHistory('a', clock=lambda: 100, spill_dir=str(spill), max_messages=1)
+    assert not history.add(entry('b@1', 1, channel='../../x'))
+    assert not history.add({'channel': 'chat', 'stream': ['b@1'], 'seq': 1})
+    assert not history.add({'channel': 'chat', 'stream': 'b@1', 'seq': '2'})
+    history.add(entry('b@1', 1, channel='sos'))
+    history.add(entry('b@1', 2, channel='sos'))  # Spills the first
+    assert set(history.digest()) == {'sos'}
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['history']
+    assert sorted(path.name for path in spill.iterdir()) == ['sos']
+    with pytest.raises(ValueError):
+        history.stamp('../x', {})
+
+def floor_from(sync, sender, stream, seq):
+    sync.handle({'type': 'history_entries', 'from': sender, 'channel': 'chat',
+                 'entries': [], 'floor': {stream: seq}}, None)
+
+def test_floor_only_from_owner_or_up_to_advertised_mark(meshes):
+    sim, a, b = meshes
+    sync = b.history_sync
+    floor_from(sync, 'a', 'victim@1', 1000)
+    assert 'victim@1' not in b.history.digest()['chat']
+    sync._advertise('a', {'chat': {'victim@1': 7}})
+    floor_from(sync, 'a', 'victim@1', 1000)
+    assert b.history.digest()['chat']['victim@1'] == 7
+    floor_from(sync, 'victim', 'victim@1', 20)
+    assert b.history.digest()['chat']['victim@1'] == 20
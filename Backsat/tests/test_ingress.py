@@ -0,0 +1,23 @@
+import time
+from src.backsat.network.ingress import BatchedIngress
+from src.backsat.network.sim import SimNetwork
+
+def test_hostile_datagrams_do_not_kill_workers(tmp_path):
+    sim = SimNetwork(seed=1)
+    mesh = sim.add_node(node_id='a', download_dir=str(tmp_path))
+    mesh.start()
+    ingress = BatchedIngress(mesh, workers=2)
+    ingress.start()
+    try:
+        # Deep nesting makes json.loads raise RecursionError, not WireError
+        hostile = [(b'[' * 3000, ('10.9.9.9', 5000)), (b'\xff' * 64, ('10.9.9.9', 5000))]
+        for _ in range(4):
+            ingress.queue.put_batch(hostile)
+        deadline = time.monotonic() + 2
+        while ingress.decode_errors < 8 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert ingress.decode_errors == 8
+        assert [worker.is_alive() for worker in ingress.workers] == [True, True]
+    finally:
+        mesh.stop()
+        ingress.stop()
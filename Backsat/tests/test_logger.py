@@ -0,0 +1,16 @@
+import logging
+from src.backsat.utils.logger import RateLimitFilter
+
+def record(level, lineno=10):
+    return logging.LogRecord('backsat.network.mesh', level, 'mesh.py', lineno, 'msg', None, None)
+
+def test_errors_are_limited_per_call_site():
+    limiter = RateLimitFilter(interval=60, burst=3)
+    passed = [limiter.filter(record(logging.ERROR)) for _ in range(10)]
+    assert passed == [True] * 3 + [False] * 7
+    assert limiter.filter(record(logging.ERROR, lineno=11))
+
+def test_info_and_warnings_always_pass():
+    limiter = RateLimitFilter(interval=60, burst=3)
+    for level in (logging.INFO, logging.WARNING, logging.CRITICAL):
+        assert all(limiter.filter(record(level)) for _ in range(10))
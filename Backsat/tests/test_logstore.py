@@ -0,0 +1,55 @@
+import sqlite3
+from src.backsat.core.logstore import EmergencyLogStore
+
+def sos(lat, lon):
+    return {'type': 'sos', 'location': {'lat': lat, 'lon': lon}, 'details': {'text': 'help'}}
+
+def test_close_commits_queued_events(tmp_path):
+    path = str(tmp_path / 'emergency.db')
+    store = EmergencyLogStore(path, flush_interval=60)
+    store.append(sos(45.0, 9.0))
+    store.close()
+    store.close()
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 1
+
+def test_query_near_and_pages(tmp_path):
+    store = EmergencyLogStore(str(tmp_path / 'emergency.db'))
+    for i in range(5):
+        store.append(sos(45.0 + i * 0.01, 9.0))
+    store.append(sos(46.0, 9.0))
+    store.flush()
+    page = store.query(near=(45.0, 9.0, 5.0), limit=2)
+    assert len(page['logs']) == 2 and page['next_cursor'] is not None
+    rest = store.query(near=(45.0, 9.0, 5.0), cursor=page['next_cursor'])
+    assert len(rest['logs']) == 3 and rest['next_cursor'] is None
+    assert store.tail(after_id=5)['logs'][0]['location'] == {'lat': 46.0, 'lon': 9.0}
+    store.close()
+
+def test_legacy_import_skips_malformed_lines(tmp_path):
+    legacy = tmp_path / 'emergency.log'
+    legacy.write_text('\n'.join([
+        '{"timestamp": "2024-05-01T12:00:00", "type": "sos", "location": {"lat": 45.0, "lon": 9.0}}',
+        '{"timestamp": 1714564800, "type": "sos"}',
+        '{"timestamp": ["2024"], "type": "sos"}',
+        '{"timestamp": {"year": 2024}, "type": "sos"}',
+        '{"timestamp": "2024-05-01T12:00:00", "type": 7}',
+        '[1, 2]',
+        'not json',
+    ]) + '\n')
+    store = EmergencyLogStore(str(tmp_path / 'emergency.db'), legacy_log=str(legacy))
+    assert store.legacy_skipped == 5
+    logs = list(store.scan())
+    assert [log['timestamp'][:4] for log in logs] == ['2024', '2024']
+    assert (tmp_path / 'emergency.log.imported').exists()
+    store.close()
+
+def test_scan_returns_every_event_oldest_first(tmp_path):
+    store = EmergencyLogStore(str(tmp_path / 'emergency.db'))
+    for i in range(1500):
+        store.append(sos(45.0, 9.0 + i * 1e-6))
+    store.flush()
+    logs = list(store.scan(event_type='sos'))
+    assert len(logs) == 1500
+    assert [log['id'] for log in logs] == sorted(log['id'] for log in logs)
+    store.close()
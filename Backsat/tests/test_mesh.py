@@ -0,0 +1,34 @@
+from src.backsat.network.mesh import MeshNetwork
+from src.backsat.network.sim import SimNetwork
+from src.backsat.network.wire import WireCodec
+
+def test_clean_telemetry_bounds_and_drops_fields():
+    clean = MeshNetwork._clean_telemetry({'cpu': 250, 'memory': 41.6, 'battery': '<img src=x onerror=alert(1)>',
+                                          'temp': -400, 'html': '<script>'})
+    assert clean == {'cpu': 100, 'memory': 42, 'battery': None, 'temp': -127}
+    assert MeshNetwork._clean_telemetry({'cpu': True, 'memory': float('nan')})['cpu'] is None
+    assert MeshNetwork._clean_telemetry(['cpu']) is None
+
+def test_beacon_telemetry_is_sanitized(tmp_path):
+    sim = SimNetwork(seed=1)
+    mesh = sim.add_node(node_id='b', download_dir=str(tmp_path))
+    mesh.start()
+    beacon = {'type': 'discovery', 'node_id': 'c', 'port': 5000,
+              'telemetry': {'cpu': '<b>9</b>', 'memory': 12, 'battery': None, 'temp': 30.2, 'extra': 1}}
+    mesh._on_datagram(WireCodec('c').encode_json(beacon), ('10.9.9.9', 5000))
+    assert mesh.nodes['c'].telemetry == {'cpu': None, 'memory': 12, 'battery': None, 'temp': 30}
+    mesh.stop()
+
+def test_routine_beacons_are_not_logged_at_info(tmp_path, caplog):
+    sim = SimNetwork(seed=1)
+    mesh = sim.add_node(node_id='b', download_dir=str(tmp_path))
+    mesh.start()
+    mesh.update_location(45.0, 9.0)
+    codec = WireCodec('c')
+    caplog.set_level('INFO', logger='src.backsat.network.mesh')
+    for lat in (45.001, 45.001, 45.001, 45.002):
+        beacon = {'type': 'discovery', 'node_id': 'c', 'port': 5000, 'location': {'lat': lat, 'lon': 9.0}}
+        mesh._on_datagram(codec.encode_json(beacon), ('10.9.9.9', 5000))
+    messages = [r.getMessage() for r in caplog.records if r.name.endswith('mesh') and 'Node c' in r.getMessage()]
+    assert messages == ['Node c joined at 0.1km', 'Node c moved to 0.2km']
+    mesh.stop()
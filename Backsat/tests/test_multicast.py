@@ -0,0 +1,102 @@
+import socket
+import sys
+import pytest
+from src.backsat.network.mesh import MeshNetwork
+from src.backsat.network.transport import UDPTransport
+
+multicast = pytest.importorskip('src.backsat.network.multicast')
+
+class RecordingSocket:
+    def __init__(self):
+        self.options = []
+        self.sent = []
+
+    def setsockopt(self, level, option, value):
+        self.options.append((option, value))
+
+    def sendto(self, data, addr):
+        self.sent.append(addr)
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def transport(monkeypatch):
+    interfaces = []
+    monkeypatch.setattr(multicast, 'list_interfaces', lambda names=None: list(interfaces))
+    transport = multicast.MulticastTransport(start_port=47000)
+    transport.close()
+    transport.sock4, transport.sock6 = RecordingSocket(), None
+    yield transport, interfaces
+
+def memberships(sock):
+    return [option for option, _ in sock.options
+            if option in (socket.IP_ADD_MEMBERSHIP, socket.IP_DROP_MEMBERSHIP)]
+
+def test_address_change_rejoins(transport):
+    transport, interfaces = transport
+    interfaces.append(multicast.Interface('wlan0', 3, '192.168.1.10', '192.168.1.255'))
+    transport.refresh_interfaces()
+    assert memberships(transport.sock4) == [socket.IP_ADD_MEMBERSHIP]
+    transport.refresh_interfaces()
+    assert memberships(transport.sock4) == [socket.IP_ADD_MEMBERSHIP]
+
+    interfaces[0] = multicast.Interface('wlan0', 3, '192.168.1.77', '192.168.1.255')
+    transport.refresh_interfaces()
+    assert memberships(transport.sock4) == [socket.IP_ADD_MEMBERSHIP, socket.IP_DROP_MEMBERSHIP,
+                                            socket.IP_ADD_MEMBERSHIP]
+    assert transport.interfaces[3].ipv4 == '192.168.1.77'
+
+    transport.sock4.options.clear()
+    transport._multicast(b'beacon')
+    assert (socket.IP_MULTICAST_IF, socket.inet_aton('192.168.1.77')) in transport.sock4.options
+
+    interfaces.clear()
+    transport.refresh_interfaces()
+    assert transport.interfaces == {}
+    assert memberships(transport.sock4)[-1] == socket.IP_DROP_MEMBERSHIP
+
+def test_broadcast_fallback_without_netifaces(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'netifaces', None)
+    monkeypatch.delitem(sys.modules, 'src.backsat.network.multicast')
+    mesh = MeshNetwork(start_port=47100, link_mode='multicast')
+    try:
+        assert type(mesh.transport) is UDPTransport
+    finally:
+        mesh.transport.close()
+
+def test_only_authenticated_frames_record_paths(transport):
+    transport, interfaces = transport
+    interfaces.extend([multicast.Interface('eth0', 2, '10.0.0.1', '10.0.0.255', speed=1000),
+                       multicast.Interface('wlan0', 3, '192.168.1.10', '192.168.1.255', speed=54)])
+    transport.refresh_interfaces()
+    victim, wifi, wired = b'v' * 8, ('192.168.1.20', 5000), ('10.0.0.66', 5000)
+    assert transport.heard(victim, wifi, (3, wifi), authenticated=True) == wifi
+    # A forged beacon on the faster link claims the victim's hash
+    assert transport.heard(victim, wired, (2, wired), authenticated=False) == wifi
+    assert list(transport.paths[victim]) == [wifi]
+    transport.sendto(b'x', wifi)
+    assert transport.sock4.sent[-1] == wifi
+    # Random hashes that never authenticate leave no trace
+    for i in range(100):
+        transport.heard(i.to_bytes(8, 'big'), wired, (2, wired), authenticated=False)
+    assert list(transport.paths) == [victim]
+
+def test_path_table_is_capped(transport, monkeypatch):
+    transport, interfaces = transport
+    interfaces.append(multicast.Interface('eth0', 2, '10.0.0.1', '10.0.0.255'))
+    transport.refresh_interfaces()
+    monkeypatch.setattr(transport, 'MAX_PEERS', 4)
+    monkeypatch.setattr(transport, 'MAX_PATHS', 2)
+    for i in range(10):
+        addr = ('10.0.0.100', 6000 + i)
+        transport.heard(i.to_bytes(8, 'big'), addr, (2, addr), authenticated=True)
+        addr = ('10.0.0.101', 6000 + i)
+        transport.heard(b'p' * 8, addr, (2, addr), authenticated=True)
+    assert len(transport.paths) == 4
+    assert len(transport.paths[b'p' * 8]) == 2
+
+def test_link_local_fallback_keeps_scope(transport):
+    transport, _ = transport
+    assert multicast._sockaddr(('fe80::1%1', 5000)) == ('fe80::1', 5000, 0, 1)
+    assert multicast._sockaddr(('10.0.0.2', 5000)) == ('10.0.0.2', 5000)
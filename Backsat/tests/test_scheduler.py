@@ -0,0 +1,88 @@
+import pytest
+import threading
+import time
+from src.backsat.network.scheduler import (TokenBucket, OutboundScheduler, classify, PRIORITY_SOS,
+                                           PRIORITY_CONTROL, PRIORITY_CHAT, PRIORITY_BULK)
+
+def test_bucket_rate_and_burst():
+    bucket = TokenBucket(rate=1000, burst=500, now=0)
+    assert bucket.delay(400, 0) == 0
+    assert bucket.delay(400, 0) == 0.3
+    assert bucket.delay(400, 0.3) == 0
+    assert bucket.delay(100, 100) == 0
+    assert bucket.tokens == 400  # Refill stops at burst
+
+def test_oversized_datagram_passes_when_full_and_leaves_debt():
+    bucket = TokenBucket(rate=1000, burst=500, now=0)
+    assert bucket.delay(2000, 0) == 0
+    assert bucket.tokens == -1500
+    # Paid back before the next one: 1.5 s of debt plus the next datagram's share
+    assert bucket.delay(2000, 1.0) == 1.0
+    assert bucket.delay(2000, 2.0) == 0
+
+def test_classify():
+    assert classify({'type': 'routed', 'payload': {'type': 'sos'}}) == PRIORITY_SOS
+    assert classify({'type': 'routed', 'payload': {'type': 'chat'}}) == PRIORITY_CHAT
+    assert classify({'type': 'file_chunk'}) == PRIORITY_BULK
+    assert classify({'type': 'file_ack'}) == PRIORITY_CONTROL
+
+class Recorder:
+    def __init__(self):
+        self.sent = []
+        self.event = threading.Event()
+
+    def send(self, data, addr):
+        self.sent.append(data)
+        self.event.set()
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+def test_oversized_chat_datagram_is_not_stuck():
+    recorder = Recorder()
+    scheduler = OutboundScheduler(None, recorder.send, use_sendmmsg=False)
+    scheduler.start()
+    try:
+        big = b'x' * (OutboundScheduler.RATES[PRIORITY_CHAT][1] + 4096)
+        scheduler.submit(big, ('10.0.0.2', 5000), PRIORITY_CHAT)
+        scheduler.submit(b'after', ('10.0.0.2', 5000), PRIORITY_CHAT)
+        assert wait_for(lambda: len(recorder.sent) == 2)
+        assert recorder.sent == [big, b'after']
+    finally:
+        scheduler.stop()
+
+def test_sos_goes_first():
+    recorder = Recorder()
+    scheduler = OutboundScheduler(None, recorder.send, use_sendmmsg=False)
+    for i in range(100):
+        scheduler.submit(b'chunk', (f'10.0.0.{i % 4}', 5000), PRIORITY_BULK)
+    scheduler.submit(b'sos', ('10.0.0.9', 5000), PRIORITY_SOS)
+    scheduler.start()
+    try:
+        assert wait_for(lambda: len(recorder.sent) == 101)
+        assert recorder.sent[0] == b'sos'
+    finally:
+        scheduler.stop()
+
+def test_requeue_keeps_queue_time_and_limits():
+    scheduler = OutboundScheduler(None, Recorder().send, use_sendmmsg=False)
+    scheduler.QUEUE_LIMITS = (2, 2, 2, 2)
+    scheduler.submit(b'sos', ('10.0.0.9', 5000), PRIORITY_SOS)
+    queued_at = scheduler._queues[PRIORITY_SOS][('10.0.0.9', 5000)][0][2]
+    batch, _ = scheduler._take(queued_at + 1.0)
+    scheduler._requeue(batch)  # Socket buffer was full
+    batch, _ = scheduler._take(queued_at + 3.0)
+    assert batch[0][1] == b'sos'
+    assert scheduler.get_stats()['sos_wait_max'] == pytest.approx(3.0)
+    scheduler._requeue(batch)
+    scheduler.submit(b'later', ('10.0.0.9', 5000), PRIORITY_SOS)
+    batch, _ = scheduler._take(queued_at + 4.0)
+    for data in (b'a', b'b'):
+        scheduler.submit(data, ('10.0.0.9', 5000), PRIORITY_SOS)
+    scheduler._requeue(batch)
+    stats = scheduler.get_stats()
+    assert stats['queued']['sos'] == 2
+    assert stats['dropped']['sos'] == 2
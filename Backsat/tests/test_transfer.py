@@ -0,0 +1,164 @@
+import hashlib
+import os
+import pytest
+from src.backsat.network.sim import SimNetwork
+from src.backsat.network.transfer import (IncomingTransfer, validate_offer, valid_ack,
+                                          IDLE_TIMEOUT, STALLED_KEEP, FINISHED_KEEP)
+from src.backsat.network.wire import node_hash
+
+def make_offer(**overrides):
+    offer = {'type': 'file_offer', 'transfer': '0123456789abcdef', 'name': 'map.png',
+             'size': 10000, 'chunk_size': 960, 'total': 11, 'sha256': 'ab' * 32, 'from': 'a'}
+    offer.update(overrides)
+    return offer
+
+def test_valid_offer():
+    validate_offer(make_offer())
+    validate_offer(make_offer(size=0, total=1))
+
+@pytest.mark.parametrize('overrides', [
+    {'transfer': '/../../../tmp/pwned'},
+    {'transfer': '0123456789ABCDEF'},
+    {'transfer': '0123456789abcdef0'},
+    {'transfer': 7},
+    {'name': '..'},
+    {'name': None},
+    {'sha256': 'nope'},
+    {'size': -1},
+    {'size': 2 ** 40, 'total': 2 ** 40 // 960 + 1},
+    {'size': 10000.0},
+    {'chunk_size': 1, 'total': 10000},
+    {'chunk_size': 65536, 'total': 1},
+    {'total': 10 ** 9},
+    {'total': 10},
+])
+def test_invalid_offers(overrides):
+    with pytest.raises(ValueError):
+        validate_offer(make_offer(**overrides))
+
+def test_chunks_outside_the_file_are_ignored(tmp_path):
+    incoming = IncomingTransfer(make_offer(), 'a', str(tmp_path))
+    assert not incoming.on_chunk(11, b'x', 0)
+    assert not incoming.on_chunk(-1, b'x', 0)
+    assert not incoming.on_chunk(0, b'x' * 961, 0)
+    assert incoming.count == 0
+    incoming.abort()
+    assert os.listdir(tmp_path) == []
+
+@pytest.mark.parametrize('ack', [
+    {'cum': -1, 'sack': []},
+    {'cum': 12, 'sack': []},
+    {'cum': '3', 'sack': []},
+    {'cum': 0, 'sack': [[-3, 2]]},
+    {'cum': 0, 'sack': [[4, 4]]},
+    {'cum': 0, 'sack': [[4, 12]]},
+    {'cum': 0, 'sack': [[4]]},
+    {'cum': 0, 'sack': [[0, 1]] * 17},
+])
+def test_invalid_acks(ack):
+    assert not valid_ack(ack, 11)
+
+def test_valid_ack():
+    assert valid_ack({'cum': 11, 'sack': []}, 11)
+    assert valid_ack({'cum': 2, 'sack': [[4, 6], [8, 11]]}, 11)
+
+def complete_transfer(tmp_path, data, name):
+    offer = make_offer(size=len(data), total=1, sha256=hashlib.sha256(data).hexdigest(), name=name)
+    incoming = IncomingTransfer(offer, 'a', str(tmp_path))
+    incoming.on_chunk(0, data, 0)
+    incoming.finish()
+    return incoming
+
+def test_finished_file_does_not_overwrite_existing_download(tmp_path):
+    (tmp_path / 'map.png').write_bytes(b'old')
+    incoming = complete_transfer(tmp_path, b'new', 'map.png')
+    assert incoming.state == 'done'
+    assert (tmp_path / 'map.png').read_bytes() == b'old'
+    assert (tmp_path / 'map (1).png').read_bytes() == b'new'
+
+def test_failed_rename_fails_the_transfer(tmp_path, monkeypatch):
+    def fail(src, dst):
+        raise OSError("disk full")
+    monkeypatch.setattr(os, 'replace', fail)
+    incoming = complete_transfer(tmp_path, b'payload', 'map.png')
+    assert incoming.state == 'failed'
+    assert not os.path.exists(incoming.part_path)
+
+@pytest.fixture
+def meshes(tmp_path):
+    sim = SimNetwork(seed=3)
+    a = sim.add_node(node_id='a', download_dir=str(tmp_path / 'a'))
+    b = sim.add_node(node_id='b', download_dir=str(tmp_path / 'b'))
+    a.start()
+    b.start()
+    sim.run(5)
+    yield sim, a, b, tmp_path
+    a.stop()
+    b.stop()
+
+def test_transfer_over_the_mesh(meshes):
+    sim, a, b, tmp_path = meshes
+    source = tmp_path / 'source.bin'
+    source.write_bytes(os.urandom(50_000))
+    a.send_file('b', str(source))
+    for _ in range(100):
+        sim.run(0.5)
+        if b.transfers.incoming and list(b.transfers.incoming.values())[0].state == 'done':
+            break
+    sim.run(1)  # Final ack
+    assert (tmp_path / 'b' / 'source.bin').read_bytes() == source.read_bytes()
+    assert [t['state'] for t in a.get_transfer_status()] == ['done']
+
+def test_traversal_offer_touches_nothing(meshes, tmp_path):
+    sim, a, b, _ = meshes
+    a.send_to_node('b', make_offer(transfer='/../../../' + str(tmp_path / 'pwned')))
+    sim.run(1)
+    assert b.transfers.incoming == {}
+    assert not any(name.endswith('.part') for _, _, files in os.walk(tmp_path) for name in files)
+
+def test_offer_from_someone_else_is_dropped(meshes):
+    sim, a, b, _ = meshes
+    a.send_to_node('b', make_offer(**{'from': 'c'}))
+    sim.run(1)
+    assert b.transfers.incoming == {}
+
+def test_chunk_from_another_node_is_ignored(meshes):
+    sim, a, b, _ = meshes
+    a.send_to_node('b', make_offer())
+    sim.run(1)
+    incoming = b.transfers.incoming['0123456789abcdef']
+    chunk = {'type': 'file_chunk', 'transfer': incoming.id, 'index': 0, 'data': b'x'}
+    b.transfers.handle(chunk, ('127.0.0.1', 1), node_hash('c'))
+    assert incoming.count == 0
+    b.transfers.handle(chunk, ('127.0.0.1', 1), node_hash('a'))
+    assert incoming.count == 1
+
+def test_stalled_transfer_keeps_its_part_file_and_resumes(meshes):
+    sim, a, b, tmp_path = meshes
+    a.send_to_node('b', make_offer())
+    sim.run(1)
+    incoming = b.transfers.incoming['0123456789abcdef']
+    b.transfers.handle({'type': 'file_chunk', 'transfer': incoming.id, 'index': 3, 'data': b'x' * 960},
+                       ('127.0.0.1', 1), node_hash('a'))
+    sim.run(IDLE_TIMEOUT + 1)
+    assert incoming.state == 'stalled'
+    assert os.path.exists(incoming.part_path)
+    assert not b.transfers._active()
+    a.send_to_node('b', make_offer())  # The sender's re-offer after a long outage
+    sim.run(1)
+    assert incoming.state == 'receiving'
+    assert incoming.received[3] and incoming.count == 1
+
+def test_old_transfers_are_pruned(meshes):
+    sim, a, b, _ = meshes
+    a.send_to_node('b', make_offer())
+    sim.run(1)
+    incoming = b.transfers.incoming['0123456789abcdef']
+    sim.run(IDLE_TIMEOUT + 1)
+    incoming.last_progress -= STALLED_KEEP
+    b.transfers._prune()
+    assert incoming.state == 'failed'
+    assert not os.path.exists(incoming.part_path)
+    incoming.finished_at -= FINISHED_KEEP + 1
+    b.transfers._prune()
+    assert b.transfers.incoming == {}
@@ -0,0 +1,86 @@
+import pytest
+from src.backsat.network.wire import WireCodec, WireError, UnknownNode, node_hash, ID_SIZE
+
+LOCATION = {'lat': 45.4642035, 'lon': 9.1899815}
+
+@pytest.fixture
+def codecs():
+    return WireCodec('node_sender_1'), WireCodec('node_receiver_2')
+
+def test_named_beacon_round_trip(codecs):
+    sender, receiver = codecs
+    public_key = bytes(range(32))
+    frame = sender.encode_beacon(5000, 1718000000, LOCATION, public_key=public_key, hold=12.3)
+    beacon = receiver.decode(frame)
+    assert beacon['node_id'] == 'node_sender_1'
+    assert beacon['port'] == 5000
+    assert beacon['timestamp'] == 1718000000
+    assert beacon['location'] == pytest.approx(LOCATION)
+    assert beacon['pubkey'] == public_key
+    assert beacon['hold'] == 12.3
+
+def test_unnamed_beacon_needs_a_learned_name(codecs):
+    sender, receiver = codecs
+    frame = sender.encode_beacon(5000, 1, include_name=False)
+    with pytest.raises(UnknownNode):
+        receiver.decode(frame)
+    receiver.decode(sender.encode_beacon(5000, 1))
+    assert receiver.decode(frame)['node_id'] == 'node_sender_1'
+
+def test_beacon_telemetry_trailer(codecs):
+    sender, receiver = codecs
+    telemetry = {'cpu': 250, 'memory': 42, 'battery': None, 'temp': -300}
+    beacon = receiver.decode(sender.encode_beacon(5000, 1, telemetry=telemetry))
+    assert beacon['telemetry'] == {'cpu': 100, 'memory': 42, 'battery': None, 'temp': -127}
+    assert 'hold' not in beacon
+
+def test_name_must_match_hash(codecs):
+    sender, receiver = codecs
+    frame = bytearray(sender.encode_beacon(5000, 1))
+    frame[4:12] = node_hash('someone_else')
+    with pytest.raises(WireError):
+        receiver.decode(bytes(frame))
+
+def test_truncated_beacon(codecs):
+    sender, receiver = codecs
+    frame = sender.encode_beacon(5000, 1, LOCATION, public_key=bytes(32))
+    for length in (1, 12, 20, len(frame) - 1):
+        with pytest.raises(WireError):
+            receiver.decode(frame[:length])
+
+def test_message_and_chunk_round_trip(codecs):
+    sender, receiver = codecs
+    receiver.decode(sender.encode_beacon(5000, 1))
+    message = receiver.decode(sender.encode_message({'type': 'chat', 'text': 'ciao'}))
+    assert message == {'type': 'chat', 'text': 'ciao', 'sender': 'node_sender_1'}
+    chunk = receiver.decode(sender.encode_chunk('00112233aabbccdd', 7, b'\x00\xff' * 10))
+    assert chunk == {'type': 'file_chunk', 'transfer': '00112233aabbccdd', 'index': 7,
+                     'data': b'\x00\xff' * 10}
+
+def test_json_fallback(codecs):
+    sender, receiver = codecs
+    message = {'type': 'discovery', 'node_id': 'legacy', 'port': 5000}
+    assert receiver.decode(sender.encode_json(message)) == message
+
+@pytest.mark.parametrize('data', [b'', b'{nope', b'[1, 2]', b'"text"', b'{"no_type": 1}',
+                                  b'\xb5\x01\x02\x04' + bytes(8) + b'[]',
+                                  b'\xb5\x09\x01\x04' + bytes(8)])
+def test_malformed_datagrams(codecs, data):
+    with pytest.raises(WireError):
+        codecs[1].decode(data)
+
+def test_name_table_is_bounded():
+    codec = WireCodec('me')
+    codec.MAX_NAMES = 8
+    for i in range(20):
+        codec.learn(f'node_{i}')
+    assert len(codec._names) == 8
+    assert codec.lookup(node_hash('node_19')) == 'node_19'
+
+@pytest.mark.parametrize('body', [b'[' * 100_000, b'{"type": "\xff\xfe"}', b'\xff\xfe\x00'])
+def test_hostile_json_raises_wire_error(codecs, body):
+    sender, receiver = codecs
+    with pytest.raises(WireError):
+        receiver.decode(body)
+    with pytest.raises(WireError):
+        receiver.decode(sender.encode_message({'type': 'chat'})[:4 + ID_SIZE] + body)